@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+
+from cache import create_backend, mark_invalidated, may_store
+
+# ----------------------------------------------------------------------------#
+# Show calendar.
+# ----------------------------------------------------------------------------#
+
+# Shows are counted per day or per week (starting on Monday, as date_trunc
+# does) and per city, venue or genre. A bucket is closed once its period is
+# over: its counts only change when a past show is added or removed, or when
+# a venue or an artist changes, so closed buckets are cached and the
+# database only counts the buckets still open.
+
+BUCKETS = {
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+}
+
+GROUPS = ('city', 'venue', 'genre')
+
+
+def bucket_start(value, bucket):
+    """Start of the bucket holding a date or a datetime, as a date."""
+    if isinstance(value, datetime):
+        value = value.date()
+    if bucket == 'week':
+        value -= timedelta(days=value.weekday())
+    return value
+
+
+def bucket_starts(start, end, bucket):
+    """Starts of the buckets covering [start, end), whole buckets included."""
+    starts = []
+    current = bucket_start(start, bucket)
+    while datetime.combine(current, datetime.min.time()) < end:
+        starts.append(current)
+        current += BUCKETS[bucket]
+    return starts
+
+
+def parse_period(value):
+    # date_trunc gives timestamps, SQLite's date() gives strings
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class CalendarCache:
+    """Counts of the closed buckets, keyed by bucket, grouping and start.
+
+    Every key holds a generation counter: invalidate() retires them all.
+    """
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.backend is None:
+            self.backend = create_backend(app.config, 'calendar', app.config.get('CALENDAR_CACHE_SIZE'))
+
+    @staticmethod
+    def make_key(generation, bucket, group, start):
+        return 'calendar:{}:{}:{}:{}'.format(generation, bucket, group, start.isoformat())
+
+    def get_many(self, bucket, group, starts):
+        """(generation, {start: counts}) of the cached buckets among starts.
+
+        The counts computed for the missing buckets are stored with that
+        generation, so that counts overtaken by an invalidation are never read.
+        """
+        generation = self.backend.get_counter('generation')
+        cached = {}
+        for start in starts:
+            counts = self.backend.get(self.make_key(generation, bucket, group, start))
+            if counts is not None:
+                cached[start] = counts
+        return generation, cached
+
+    def set_many(self, generation, bucket, group, counts_by_start):
+        if not may_store(self.backend):
+            return
+        for start, counts in counts_by_start.items():
+            self.backend.set(self.make_key(generation, bucket, group, start), counts)
+
+    def invalidate(self):
+        self.backend.incr('generation')
+        mark_invalidated(self.backend)
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:  # the standard json module is used without it
+    orjson = None
+
+# ----------------------------------------------------------------------------#
+# JSON API.
+# ----------------------------------------------------------------------------#
+
+# The /api/v1 responses are built from plain rows, selected with only the
+# columns of the requested fields (?fields=id,name) rather than from loaded
+# entities, and serialized by orjson when it is installed.
+
+MIMETYPE = 'application/json'
+
+
+def serialize_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def dumps(data):
+    """JSON document of data, as bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=serialize_value, separators=(',', ':')).encode('utf-8')
+
+
+def parse_fields(value, available):
+    """Fields of a comma separated ?fields= value, in order; all of them when it is empty."""
+    if not value:
+        return list(available)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise ValueError('Unknown fields: {}'.format(', '.join(unknown)))
+    return list(dict.fromkeys(fields))
+
+
+class Resource:
+    """Fields of an API resource, each a column expression over the same FROM clause.
+
+    sort holds the columns of the keyset order of the listings; converters
+    turn the selected value of a field into its JSON value.
+    """
+
+    def __init__(self, source, columns, sort, converters=None):
+        self.source = source
+        self.columns = columns
+        self.sort = sort
+        self.converters = converters or {}
+
+    @staticmethod
+    def sort_label(index):
+        return '_sort_{}'.format(index)
+
+    def select(self, fields):
+        # The sort columns are selected as well, as the page cursors are made of them
+        return select(*[self.columns[field].label(field) for field in fields],
+                      *[column.label(self.sort_label(index)) for index, column in enumerate(self.sort)]) \
+            .select_from(self.source)
+
+    def sort_key(self, row):
+        return [row._mapping[self.sort_label(index)] for index in range(len(self.sort))]
+
+    def serialize(self, row, fields):
+        data = {}
+        for field in fields:
+            value = row._mapping[field]
+            converter = self.converters.get(field)
+            data[field] = converter(value) if converter is not None and value is not None else value
+        return data
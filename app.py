@@ -2,20 +2,38 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import hmac
 import json
+from datetime import datetime, timedelta
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, \
+    stream_with_context
 from flask_migrate import Migrate
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
-from sqlalchemy import or_
-from sqlalchemy.exc import SQLAlchemyError
-
+from sqlalchemy import and_, event, exists, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload, load_only, selectinload, \
+    make_transient_to_detached
+
+from aggregation import BUCKETS, GROUPS, CalendarCache, bucket_starts, parse_period
+import api
+from availability import Schedule, free_windows
+from cache import LRUCache, ResponseCache
+import exporter
+from formatting import DatetimeFormatter, parse_datetime, utcnow
+from fragments import FragmentCache
 from forms import *
+from nplusone import NPlusOneDetector
+from pagination import paginate
+from pooling import engine_options, pool_status, render_pool_metrics
+from profiling import RequestProfiler
+from recommendations import Recommender, RecommendationsUnavailable
+from routing import RoutingSQLAlchemy
+from search import NameSearch
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -24,7 +42,13 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+db = RoutingSQLAlchemy(app)
+response_cache = ResponseCache(app)
+fragment_cache = FragmentCache(app)
+calendar_cache = CalendarCache(app)
+profiler = RequestProfiler(app)
+nplusone = NPlusOneDetector(app)
 
 # COMPLETED: connect to a local postgresql database
 
@@ -55,9 +79,13 @@ artist_genres = db.Table('Artist_Genres',
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (db.Index('ix_Venue_name_id', 'name', 'id'),
+                      db.Index('ix_Venue_name_trgm', 'name',
+                               postgresql_using='gin',
+                               postgresql_ops={'name': 'gin_trgm_ops'}))
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
@@ -78,14 +106,21 @@ class Venue(db.Model):
                             backref='venue',
                             cascade='all, delete-orphan',
                             passive_deletes=True)
+    # Show counters, maintained by the show providers
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # COMPLETED: implement any missing fields, as a database migration using Flask-Migrate
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (db.Index('ix_Artist_name_id', 'name', 'id'),
+                      db.Index('ix_Artist_name_trgm', 'name',
+                               postgresql_using='gin',
+                               postgresql_ops={'name': 'gin_trgm_ops'}))
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
@@ -105,13 +140,29 @@ class Artist(db.Model):
     shows = db.relationship('Show',
                             backref='artist',
                             cascade='all, delete-orphan', passive_deletes=True)
+    # Show counters, maintained by the show providers
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+def default_show_end_time(context):
+    start_time = context.get_current_parameters()['start_time']
+    return start_time + timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
 
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    # On PostgreSQL the migration also adds exclusion constraints keeping the
+    # shows of a venue, and those of an artist, from overlapping
+    __table_args__ = (db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+                      db.Index('ix_Show_start_time_venue_id_artist_id', 'start_time', 'venue_id', 'artist_id'),
+                      db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+                      db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+                      db.CheckConstraint('end_time >= start_time', name='ck_Show_end_time'))
 
     id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.DateTime())
+    start_time = db.Column(db.DateTime(), nullable=False)
+    end_time = db.Column(db.DateTime(), nullable=False, default=default_show_end_time)
     # Relationships
     venue_id = db.Column(db.Integer,
                          db.ForeignKey('Venue.id', ondelete="cascade"),
@@ -144,6 +195,9 @@ class Venue_Seeking(db.Model):
 
 class Genre(db.Model):
     __tablename__ = 'Genre'
+    __table_args__ = (db.Index('ix_Genre_name_trgm', 'name',
+                               postgresql_using='gin',
+                               postgresql_ops={'name': 'gin_trgm_ops'}),)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True, index=True)
@@ -151,6 +205,7 @@ class Genre(db.Model):
 
 class Address(db.Model):
     __tablename__ = 'Address'
+    __table_args__ = (db.UniqueConstraint('name', 'city_id', name='uq_Address_name_city_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -163,6 +218,10 @@ class Address(db.Model):
 
 class City(db.Model):
     __tablename__ = 'City'
+    __table_args__ = (db.UniqueConstraint('name', 'state_id', name='uq_City_name_state_id'),
+                      db.Index('ix_City_name_trgm', 'name',
+                               postgresql_using='gin',
+                               postgresql_ops={'name': 'gin_trgm_ops'}))
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -196,53 +255,197 @@ migrate = Migrate(app, db)
 
 
 # ----------------------------------------------------------------------------#
-# Filters.
+# Loader profiles.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+# Backrefs (Show.venue, Venue.address, ...) only exist once the mappers are configured
+configure_mappers()
+
+# Relationships loaded up front by each page, so a page view runs a fixed
+# number of queries instead of one lazy load per relationship and per row.
+loader_profiles = {
+    'venue_detail': [
+        joinedload(Venue.address).joinedload(Address.city).joinedload(City.state),
+        joinedload(Venue.seeking_talent),
+        selectinload(Venue.genres),
+        selectinload(Venue.shows).joinedload(Show.artist),
+    ],
+    'venue_edit': [
+        joinedload(Venue.address).joinedload(Address.city).joinedload(City.state),
+        joinedload(Venue.seeking_talent),
+        selectinload(Venue.genres),
+    ],
+    'venue_listing': [
+        load_only(Venue.id, Venue.name, Venue.upcoming_shows_count),
+    ],
+    'artist_detail': [
+        joinedload(Artist.city).joinedload(City.state),
+        joinedload(Artist.seeking_venue),
+        selectinload(Artist.genres),
+        selectinload(Artist.shows).joinedload(Show.venue),
+    ],
+    'artist_edit': [
+        joinedload(Artist.city).joinedload(City.state),
+        joinedload(Artist.seeking_venue),
+        selectinload(Artist.genres),
+    ],
+    'artist_listing': [
+        load_only(Artist.id, Artist.name, Artist.upcoming_shows_count),
+    ],
+    'show_listing': [
+        joinedload(Show.artist),
+        joinedload(Show.venue),
+    ],
+}
+
+
+def load_profile(query, profile):
+    return query.options(*loader_profiles[profile])
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+# ----------------------------------------------------------------------------#
+# Search.
+# ----------------------------------------------------------------------------#
 
+venue_search = NameSearch(db, Venue, app)
+artist_search = NameSearch(db, Artist, app)
 
-def find_by_prop(item_arg, items_list, prop):
-    return next((item for item in items_list if getattr(item, prop) == item_arg), None)
 
+# ----------------------------------------------------------------------------#
+# Recommendations.
+# ----------------------------------------------------------------------------#
 
-def reduce_venues_by_city(venues):
-    cities = []
-    for venue in venues:
-        city = find_by_prop(venue.address.city.id, cities, 'id')
-        if (city):
-            city.venues.append(venue)
-        else:
-            cities.append(venue.address.city)
-            venue.address.city.venues = [venue]
-    return cities
+def find_recommendation_features(side, ids=None):
+    # (id, city_id, state_id, genre_ids, seeking) of the venues or the artists
+    if side == 'venue':
+        query = db.session.query(Venue.id, City.id, City.state_id, Talent_Seeking.id) \
+            .join(Address, Address.id == Venue.address_id) \
+            .join(City, City.id == Address.city_id) \
+            .outerjoin(Talent_Seeking, Talent_Seeking.venue_id == Venue.id)
+        owner_column, genre_table, genre_owner_column = Venue.id, venue_genres, venue_genres.c.venue_id
+    else:
+        query = db.session.query(Artist.id, City.id, City.state_id, Venue_Seeking.id) \
+            .join(City, City.id == Artist.city_id) \
+            .outerjoin(Venue_Seeking, Venue_Seeking.artist_id == Artist.id)
+        owner_column, genre_table, genre_owner_column = Artist.id, artist_genres, artist_genres.c.artist_id
+    genres = db.session.query(genre_owner_column, genre_table.c.genre_id)
+    if ids is not None:
+        query = query.filter(owner_column.in_(ids))
+        genres = genres.filter(genre_owner_column.in_(ids))
+
+    genre_ids = {}
+    for item_id, genre_id in genres:
+        genre_ids.setdefault(item_id, []).append(genre_id)
+    return [(item_id, city_id, state_id, genre_ids.get(item_id, []), seeking_id is not None)
+            for item_id, city_id, state_id, seeking_id in query]
+
+
+def find_show_bookings(venue_ids=None, artist_ids=None):
+    # (venue_id, artist_id, shows) of every pair booked together, upcoming
+    # shows included: a show does not change the scores when it goes by
+    query = db.session.query(Show.venue_id, Show.artist_id, func.count(Show.id)) \
+        .filter(Show.venue_id.isnot(None), Show.artist_id.isnot(None)) \
+        .group_by(Show.venue_id, Show.artist_id)
+    if venue_ids is not None or artist_ids is not None:
+        query = query.filter(or_(Show.venue_id.in_(venue_ids or ()), Show.artist_id.in_(artist_ids or ())))
+    return query.all()
+
+
+recommender = Recommender(app, find_recommendation_features, find_show_bookings)
 
 
-def count_upcomping_shows(shows):
-    count = 0
-    for show in shows:
-        if show.start_time > datetime.now():
-            count += 1
-    return count
+# ----------------------------------------------------------------------------#
+# Response cache.
+# ----------------------------------------------------------------------------#
+
+def invalidate_show_owner_pages(model, model_id, counterpart_ids=None):
+    # A venue or an artist appears on its listing, on its own page, on the
+    # shows listing and on the pages of the other side of its shows.
+    if model is Venue:
+        listing, endpoint, arg = 'venues', 'show_venue', 'venue_id'
+        counterpart_endpoint, counterpart_arg = 'show_artist', 'artist_id'
+    else:
+        listing, endpoint, arg = 'artists', 'show_artist', 'artist_id'
+        counterpart_endpoint, counterpart_arg = 'show_venue', 'venue_id'
+    if counterpart_ids is None:
+        counterpart_ids = find_show_counterpart_ids(model, model_id)
+
+    fragment_cache.bump(model.__tablename__.lower(), model_id)
+    # Its name, city and genres are part of the counts of past periods
+    calendar_cache.invalidate()
+    recommender.mark_dirty(model.__tablename__.lower(), model_id)
+    response_cache.invalidate(listing)
+    response_cache.invalidate(endpoint, **{arg: model_id})
+    response_cache.invalidate('shows')
+    for counterpart_id in counterpart_ids:
+        response_cache.invalidate(counterpart_endpoint, **{counterpart_arg: counterpart_id})
+
+
+def invalidate_show_pages(show):
+    fragment_cache.bump('show', show.id)
+    if show.start_time < utcnow():
+        calendar_cache.invalidate()
+    recommender.mark_dirty('venue', show.venue_id)
+    recommender.mark_dirty('artist', show.artist_id)
+    response_cache.invalidate('shows')
+    response_cache.invalidate('show_venue', venue_id=show.venue_id)
+    response_cache.invalidate('show_artist', artist_id=show.artist_id)
+
+
+def invalidate_show_batch_pages(venue_ids, artist_ids, past=False):
+    # New shows only: there are no cached fragments of them to retire
+    if past:
+        calendar_cache.invalidate()
+    response_cache.invalidate('shows')
+    for venue_id in venue_ids:
+        response_cache.invalidate('show_venue', venue_id=venue_id)
+        recommender.mark_dirty('venue', venue_id)
+    for artist_id in artist_ids:
+        response_cache.invalidate('show_artist', artist_id=artist_id)
+        recommender.mark_dirty('artist', artist_id)
+
+
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+datetime_formatter = DatetimeFormatter(cache_size=app.config['DATETIME_FORMAT_CACHE_SIZE'])
+
+
+def format_datetime(value, format='medium'):
+    return datetime_formatter(value, format)
+
+
+app.jinja_env.filters['datetime'] = format_datetime
+
+
+def reduce_venues_by_area(rows):
+    # Groups the venues of one page, which is ordered by venue name: a city
+    # whose venues span several pages is listed on each of them.
+    areas = {}
+    for row in rows:
+        area = areas.get(row.city_id)
+        if not area:
+            area = areas[row.city_id] = {
+                "city": row.city_name,
+                "state": row.state_name,
+                "venues": []
+            }
+        area["venues"].append({
+            "id": row.venue_id,
+            "name": row.venue_name,
+            "num_upcoming_shows": row.num_upcoming_shows
+        })
+    return list(areas.values())
 
 
 def format_venues(venues):
     formatted_venues = []
     for venue in venues:
-        num_upcoming_shows = count_upcomping_shows(venue.shows)
         formatted_venues.append({
             "id": venue.id,
             "name": venue.name,
-            "num_upcoming_shows": num_upcoming_shows
+            "num_upcoming_shows": venue.upcoming_shows_count
         })
     return formatted_venues
 
@@ -259,8 +462,9 @@ def filter_shows(shows):
         "past_shows": [],
         "upcoming_shows": []
     }
+    now = utcnow()
     for show in shows:
-        if show.start_time > datetime.now():
+        if show.start_time > now:
             shows_result["upcoming_shows"].append(show)
         else:
             shows_result["past_shows"].append(show)
@@ -275,13 +479,14 @@ def format_shows(shows):
 
     for show in shows:
         formatted_shows.append({
+            "id": show.id,
             "artist_id": show.artist_id,
             "artist_name": show.artist.name,
             "artist_image_link": show.artist.image_link,
-            "venue_id": show.venue.id,
+            "venue_id": show.venue_id,
             "venue_name": show.venue.name,
             "venue_image_link": show.venue.image_link,
-            "start_time": str(show.start_time)
+            "start_time": show.start_time
         })
     return formatted_shows
 
@@ -291,11 +496,10 @@ def format_artists(artists):
     if not artists:
         return formatted_artists
     for artist in artists:
-        num_upcoming_shows = count_upcomping_shows(artist.shows)
         formatted_artists.append({
             "id": artist.id,
             "name": artist.name,
-            "num_upcoming_shows": num_upcoming_shows
+            "num_upcoming_shows": artist.upcoming_shows_count
         })
     return formatted_artists
 
@@ -304,147 +508,549 @@ def format_artists(artists):
 # Providers.
 # ----------------------------------------------------------------------------#
 
+def find_venues_by_area():
+    return db.session \
+        .query(City.id.label('city_id'),
+               City.name.label('city_name'),
+               State.name.label('state_name'),
+               Venue.id.label('venue_id'),
+               Venue.name.label('venue_name'),
+               Venue.upcoming_shows_count.label('num_upcoming_shows')) \
+        .select_from(Venue) \
+        .join(Address, Address.id == Venue.address_id) \
+        .join(City, City.id == Address.city_id) \
+        .join(State, State.id == City.state_id)
+
+
+def find_shows(search_term, start_time=None, end_time=None, limit=None):
+    # Shows whose artist, venue, city or genres match the term, optionally
+    # restricted to a start time range, in a single query. The artist and the
+    # venue come from the same joins that are used to filter.
+    query = Show.query \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Address, Address.id == Venue.address_id) \
+        .join(City, City.id == Address.city_id) \
+        .options(contains_eager(Show.artist), contains_eager(Show.venue))
+
+    if search_term:
+        search = "%{}%".format(search_term)
+        matching_genres = db.session.query(Genre.id).filter(Genre.name.ilike(search))
+        query = query.filter(or_(
+            Artist.name.ilike(search),
+            Venue.name.ilike(search),
+            City.name.ilike(search),
+            exists().where(and_(artist_genres.c.artist_id == Show.artist_id,
+                                artist_genres.c.genre_id.in_(matching_genres))),
+            exists().where(and_(venue_genres.c.venue_id == Show.venue_id,
+                                venue_genres.c.genre_id.in_(matching_genres)))
+        ))
+    if start_time:
+        query = query.filter(Show.start_time >= start_time)
+    if end_time:
+        query = query.filter(Show.start_time < end_time)
+
+    return query \
+        .order_by(Show.start_time, Show.id) \
+        .limit(limit) \
+        .all()
+
+
+def show_counter_column(model, start_time):
+    if start_time > utcnow():
+        return model.upcoming_shows_count
+    return model.past_shows_count
+
+
+def count_show(show, delta=1):
+    # Incremental update of the counters of the venue and the artist of a show.
+    for model, model_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        column = show_counter_column(model, show.start_time)
+        model.query \
+            .filter_by(id=model_id) \
+            .update({column: column + delta}, synchronize_session=False)
+
+
+def refresh_show_counters(model, ids=None):
+    # Recounts the shows of the given venues or artists (all of them when ids is None).
+    # The counts are computed by correlated subqueries, so this is a single UPDATE.
+    now = utcnow()
+    show_owner_id, _ = find_show_owner_columns(model)
+
+    def count_shows(condition):
+        return db.session \
+            .query(func.count(Show.id)) \
+            .filter(show_owner_id == model.id, condition) \
+            .scalar_subquery()
+
+    query = model.query
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return
+        query = query.filter(model.id.in_(ids))
+    query.update({
+        model.upcoming_shows_count: count_shows(Show.start_time > now),
+        model.past_shows_count: count_shows(Show.start_time <= now)
+    }, synchronize_session=False)
+
+
+def parse_show_row(item):
+    # A show of a batch: an object, or an [artist_id, venue_id, start_time] triple
+    if isinstance(item, list) and len(item) == 3:
+        item = dict(zip(('artist_id', 'venue_id', 'start_time'), item))
+    if not isinstance(item, dict):
+        raise ValueError('Expected an object with artist_id, venue_id and start_time')
+    try:
+        artist_id, venue_id = int(item['artist_id']), int(item['venue_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('artist_id and venue_id must be integers')
+    try:
+        start_time = parse_datetime(item['start_time'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('start_time must be an ISO 8601 date')
+    if not item.get('end_time'):
+        end_time = start_time + timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+    else:
+        try:
+            end_time = parse_datetime(item['end_time'])
+        except (TypeError, ValueError):
+            raise ValueError('end_time must be an ISO 8601 date')
+    if not start_time < end_time <= start_time + timedelta(hours=app.config['SHOW_MAX_DURATION_HOURS']):
+        raise ValueError('A show ends after it starts, within {} hours'.format(app.config['SHOW_MAX_DURATION_HOURS']))
+    return {"artist_id": artist_id, "venue_id": venue_id, "start_time": start_time, "end_time": end_time}
+
+
+def find_existing_ids(model, ids):
+    return {model_id for model_id, in db.session.query(model.id).filter(model.id.in_(ids))}
+
+
+def show_overlap_condition(start_time, end_time):
+    # Shows overlapping [start_time, end_time). On PostgreSQL the range operator
+    # is served by the GiST indexes of the exclusion constraints; elsewhere the
+    # (venue_id, start_time) and (artist_id, start_time) indexes are scanned
+    # from the earliest start of a show still running at start_time.
+    if db.engine.dialect.name == 'postgresql':
+        return func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start_time, end_time))
+    max_duration = timedelta(hours=app.config['SHOW_MAX_DURATION_HOURS'])
+    return and_(Show.start_time > start_time - max_duration,
+                Show.start_time < end_time,
+                Show.end_time > start_time)
+
+
+def find_show_conflicts(rows):
+    # Errors of the rows (by index) booking a venue or an artist while it
+    # has a show, in the database or earlier in the batch. One query fetches
+    # the shows of the venues and artists of the batch over its time span.
+    max_duration = timedelta(hours=app.config['SHOW_MAX_DURATION_HOURS'])
+    venues, artists = {}, {}
+    booked = db.session \
+        .query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(show_overlap_condition(min(row["start_time"] for row in rows.values()),
+                                       max(row["end_time"] for row in rows.values())),
+                or_(Show.venue_id.in_({row["venue_id"] for row in rows.values()}),
+                    Show.artist_id.in_({row["artist_id"] for row in rows.values()}))) \
+        .all()
+    for show in booked:
+        venues.setdefault(show.venue_id, Schedule(max_duration)).add(show.start_time, show.end_time)
+        artists.setdefault(show.artist_id, Schedule(max_duration)).add(show.start_time, show.end_time)
+
+    conflicts = {}
+    for index, row in rows.items():
+        venue = venues.setdefault(row["venue_id"], Schedule(max_duration))
+        artist = artists.setdefault(row["artist_id"], Schedule(max_duration))
+        errors = []
+        booking = venue.conflict(row["start_time"], row["end_time"])
+        if booking:
+            errors.append('Venue {} is booked at that time by {}'.format(row["venue_id"], booking))
+        booking = artist.conflict(row["start_time"], row["end_time"])
+        if booking:
+            errors.append('Artist {} is booked at that time by {}'.format(row["artist_id"], booking))
+        if errors:
+            conflicts[index] = errors
+        else:
+            venue.add(row["start_time"], row["end_time"], 'row {}'.format(index))
+            artist.add(row["start_time"], row["end_time"], 'row {}'.format(index))
+    return conflicts
+
+
+def show_period(bucket):
+    # Start of the day or of the week (Monday) of the shows
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(bucket, Show.start_time)
+    if bucket == 'week':
+        return func.date(Show.start_time, 'weekday 0', '-6 days')
+    return func.date(Show.start_time)
+
+
+def find_calendar_counts(start_time, end_time, bucket, group):
+    # Shows of [start_time, end_time) counted by period and by city, venue or
+    # genre (those of the artists), in one GROUP BY over the start_time indexes
+    period = show_period(bucket)
+    query = db.session.query(period.label('period')).select_from(Show)
+    if group == 'city':
+        columns = [City.name.label('city'), State.name.label('state')]
+        query = query \
+            .join(Venue, Venue.id == Show.venue_id) \
+            .join(Address, Address.id == Venue.address_id) \
+            .join(City, City.id == Address.city_id) \
+            .join(State, State.id == City.state_id)
+    elif group == 'venue':
+        columns = [Venue.id.label('venue_id'), Venue.name.label('venue_name')]
+        query = query.join(Venue, Venue.id == Show.venue_id)
+    else:
+        columns = [Genre.name.label('genre')]
+        query = query \
+            .join(artist_genres, artist_genres.c.artist_id == Show.artist_id) \
+            .join(Genre, Genre.id == artist_genres.c.genre_id)
+    rows = query \
+        .add_columns(*columns, func.count(Show.id).label('count')) \
+        .filter(Show.start_time >= start_time, Show.start_time < end_time) \
+        .group_by(period, *columns) \
+        .order_by(period, func.count(Show.id).desc(), *columns) \
+        .all()
+
+    counts = {}
+    for row in rows:
+        item = dict(row._mapping)
+        counts.setdefault(parse_period(item.pop('period')), []).append(item)
+    return counts
+
+
+def find_calendar(start_time, end_time, bucket, group):
+    # (start, counts) of every bucket covering [start_time, end_time). Closed
+    # buckets come from the cache; a single query counts the others, from the
+    # first one missing to the end of the range.
+    starts = bucket_starts(start_time, end_time, bucket)
+    today = utcnow().date()
+    closed = [start for start in starts if start + BUCKETS[bucket] <= today]
+    generation, cached = calendar_cache.get_many(bucket, group, closed)
+
+    missing = [start for start in starts if start not in cached]
+    if missing:
+        query_start = datetime.combine(missing[0], datetime.min.time())
+        query_end = datetime.combine(starts[-1] + BUCKETS[bucket], datetime.min.time())
+        counts = find_calendar_counts(query_start, query_end, bucket, group)
+        computed = {start: counts.get(start, []) for start in missing}
+        calendar_cache.set_many(generation, bucket, group,
+                                {start: computed[start] for start in closed if start in computed})
+        cached.update(computed)
+    return [(start, cached[start]) for start in starts]
+
+
+def find_free_windows(owner_column, owner_id, start_time, end_time, min_duration=None):
+    # Windows of [start_time, end_time) without a show of the venue or the artist
+    bookings = db.session \
+        .query(Show.start_time, Show.end_time) \
+        .filter(owner_column == owner_id, show_overlap_condition(start_time, end_time)) \
+        .order_by(Show.start_time) \
+        .all()
+    return free_windows(bookings, start_time, end_time, min_duration)
+
+
+def find_show_owner_columns(model):
+    # Show columns pointing to the given side of a show and to the other side.
+    if model is Venue:
+        return Show.venue_id, Show.artist_id
+    return Show.artist_id, Show.venue_id
+
+
+def find_show_counterpart_ids(model, model_id):
+    # Ids of the artists booked by a venue, or of the venues booking an artist.
+    owner_id, counterpart_id = find_show_owner_columns(model)
+    rows = db.session \
+        .query(counterpart_id) \
+        .filter(owner_id == model_id) \
+        .distinct() \
+        .all()
+    return [row[0] for row in rows]
+
+
+def delete_show_owner(instance):
+    # Deleting a venue or an artist deletes its shows, so the counters
+    # of the other side of those shows are refreshed in the same transaction.
+    model = type(instance)
+    counterpart = Artist if model is Venue else Venue
+    owner_id, counterpart_id = find_show_owner_columns(model)
+    counterpart_ids = find_show_counterpart_ids(model, instance.id)
+    Show.query \
+        .filter(owner_id == instance.id) \
+        .delete(synchronize_session=False)
+    db.session.delete(instance)
+    db.session.flush()
+    refresh_show_counters(counterpart, counterpart_ids)
+    return counterpart_ids
+
+
+def rollover_show_counters(since, now=None):
+    # Moves the shows started in (since, now] from the upcoming to the past counters.
+    # Counters are recomputed, so overlapping windows between runs are harmless.
+    now = now or utcnow()
+    started = and_(Show.start_time > since, Show.start_time <= now)
+    venue_ids = db.session.query(Show.venue_id).filter(started).distinct().all()
+    artist_ids = db.session.query(Show.artist_id).filter(started).distinct().all()
+    refresh_show_counters(Venue, [row[0] for row in venue_ids])
+    refresh_show_counters(Artist, [row[0] for row in artist_ids])
+    return len(venue_ids), len(artist_ids)
+
+
+def aggregate_genre_names(association, owner_column, owner_id):
+    # Genre names of each row joined into one column, as read back by the importer
+    if db.engine.dialect.name == 'postgresql':
+        names = func.string_agg(Genre.name, exporter.GENRES_SEPARATOR)
+    else:
+        names = func.group_concat(Genre.name, exporter.GENRES_SEPARATOR)
+    return db.session \
+        .query(names) \
+        .select_from(association) \
+        .join(Genre, Genre.id == association.c.genre_id) \
+        .filter(owner_column == owner_id) \
+        .scalar_subquery()
+
+
+def find_export_query(entity):
+    # One flat row per venue, artist or show, with the columns of exporter.FIELDS
+    if entity == 'venues':
+        return db.session \
+            .query(Venue.id, Venue.name, Address.name.label('address'),
+                   City.name.label('city'), State.name.label('state'),
+                   Venue.phone, Venue.image_link, Venue.website, Venue.facebook_link,
+                   aggregate_genre_names(venue_genres, venue_genres.c.venue_id, Venue.id).label('genres'),
+                   Talent_Seeking.description.label('seeking_description')) \
+            .join(Address, Address.id == Venue.address_id) \
+            .join(City, City.id == Address.city_id) \
+            .join(State, State.id == City.state_id) \
+            .outerjoin(Talent_Seeking, Talent_Seeking.venue_id == Venue.id) \
+            .order_by(Venue.id)
+    if entity == 'artists':
+        return db.session \
+            .query(Artist.id, Artist.name,
+                   City.name.label('city'), State.name.label('state'),
+                   Artist.phone, Artist.image_link, Artist.website, Artist.facebook_link,
+                   aggregate_genre_names(artist_genres, artist_genres.c.artist_id, Artist.id).label('genres'),
+                   Venue_Seeking.description.label('seeking_description')) \
+            .join(City, City.id == Artist.city_id) \
+            .join(State, State.id == City.state_id) \
+            .outerjoin(Venue_Seeking, Venue_Seeking.artist_id == Artist.id) \
+            .order_by(Artist.id)
+    return db.session \
+        .query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .order_by(Show.id)
+
+
+def iter_export_rows(entity):
+    # Fetched in batches through a server-side cursor (stream_results), so
+    # memory does not grow with the table.
+    query = find_export_query(entity).yield_per(app.config['EXPORT_BATCH_SIZE'])
+    for row in query:
+        yield row._mapping
+
+
+def split_genre_names(names):
+    return names.split(exporter.GENRES_SEPARATOR)
+
+
+def find_api_resource(entity):
+    # Fields of the /api/v1 resources, over the tables rather than the models:
+    # rows are read as they are, without building entities.
+    venue, artist, show = Venue.__table__, Artist.__table__, Show.__table__
+    address, city, state = Address.__table__, City.__table__, State.__table__
+    if entity == 'venues':
+        return api.Resource(
+            venue.join(address, address.c.id == venue.c.address_id)
+                 .join(city, city.c.id == address.c.city_id)
+                 .join(state, state.c.id == city.c.state_id),
+            {
+                "id": venue.c.id,
+                "name": venue.c.name,
+                "address": address.c.name,
+                "city": city.c.name,
+                "state": state.c.name,
+                "phone": venue.c.phone,
+                "website": venue.c.website,
+                "facebook_link": venue.c.facebook_link,
+                "image_link": venue.c.image_link,
+                "genres": aggregate_genre_names(venue_genres, venue_genres.c.venue_id, venue.c.id),
+                "upcoming_shows_count": venue.c.upcoming_shows_count,
+                "past_shows_count": venue.c.past_shows_count,
+            },
+            [venue.c.name, venue.c.id],
+            {"genres": split_genre_names}
+        )
+    if entity == 'artists':
+        return api.Resource(
+            artist.join(city, city.c.id == artist.c.city_id)
+                  .join(state, state.c.id == city.c.state_id),
+            {
+                "id": artist.c.id,
+                "name": artist.c.name,
+                "city": city.c.name,
+                "state": state.c.name,
+                "phone": artist.c.phone,
+                "website": artist.c.website,
+                "facebook_link": artist.c.facebook_link,
+                "image_link": artist.c.image_link,
+                "genres": aggregate_genre_names(artist_genres, artist_genres.c.artist_id, artist.c.id),
+                "upcoming_shows_count": artist.c.upcoming_shows_count,
+                "past_shows_count": artist.c.past_shows_count,
+            },
+            [artist.c.name, artist.c.id],
+            {"genres": split_genre_names}
+        )
+    return api.Resource(
+        show.join(venue, venue.c.id == show.c.venue_id)
+            .join(artist, artist.c.id == show.c.artist_id),
+        {
+            "id": show.c.id,
+            "start_time": show.c.start_time,
+            "end_time": show.c.end_time,
+            "venue_id": show.c.venue_id,
+            "venue_name": venue.c.name,
+            "venue_image_link": venue.c.image_link,
+            "artist_id": show.c.artist_id,
+            "artist_name": artist.c.name,
+            "artist_image_link": artist.c.image_link,
+        },
+        [show.c.start_time, show.c.id]
+    )
+
+
+# Genre, State and City are small, nearly static tables: their ids are cached
+# by name, and cached rows are attached to the session without being loaded.
+genre_ids = LRUCache(app.config['REFERENCE_CACHE_SIZE'])
+state_ids = LRUCache(app.config['REFERENCE_CACHE_SIZE'])
+city_ids = LRUCache(app.config['REFERENCE_CACHE_SIZE'])
+
+
+@event.listens_for(db.session, 'after_rollback')
+def clear_reference_caches(session):
+    # Ids read inside a rolled back transaction may belong to rows that no longer exist
+    for cache in (genre_ids, state_ids, city_ids):
+        cache.clear()
+
+
+def attach_reference(model, **columns):
+    # Persistent instance for a known row, taken from the identity map or
+    # attached as is; columns not given are loaded on first access.
+    instance = model(**columns)
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
+
+
+def find_city_id(city, state):
+    city_id = city_ids.get((city, state))
+    if city_id is None:
+        row = db.session \
+            .query(City.id) \
+            .join(State, State.id == City.state_id) \
+            .filter(City.name == city, State.name == state) \
+            .first()
+        if row:
+            city_id = row.id
+            city_ids.set((city, state), city_id)
+    return city_id
+
+
+def insert_ignoring_conflicts(table, index_elements):
+    # INSERT ... ON CONFLICT DO NOTHING, or a plain INSERT on the other dialects
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    return table.insert()
+
+
+def upsert_id(model, index_elements, **values):
+    # Id of the row with the given values, inserted when missing with a single
+    # INSERT ... ON CONFLICT DO NOTHING, which is safe under concurrent submissions.
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    statement = insert_ignoring_conflicts(table, index_elements).values(**values)
+    if dialect == 'postgresql':
+        row_id = db.session.execute(statement.returning(table.c.id)).scalar()
+        if row_id is not None:
+            return row_id
+    elif dialect == 'sqlite' or db.session.query(table.c.id).filter_by(**values).first() is None:
+        db.session.execute(statement)
+    # The row already existed, or the dialect has no RETURNING
+    return db.session.query(table.c.id).filter_by(**values).scalar()
+
+
+def find_state_id_or_create(state):
+    state_id = state_ids.get(state)
+    if state_id is None:
+        state_id = upsert_id(State, ['name'], name=state)
+        state_ids.set(state, state_id)
+    return state_id
+
+
+def find_city_id_or_create(city, state):
+    city_id = city_ids.get((city, state))
+    if city_id is None:
+        state_id = find_state_id_or_create(state)
+        city_id = upsert_id(City, ['name', 'state_id'], name=city, state_id=state_id)
+        city_ids.set((city, state), city_id)
+    return city_id
+
+
 def find_address_or_create(address, city, state, commit=True):
-    new_address = find_address(address, city, state)
-    if not new_address:
-        new_address = create_address(address, city, state)
+    city_id = find_city_id_or_create(city, state)
+    address_id = upsert_id(Address, ['name', 'city_id'], name=address, city_id=city_id)
+    address_instance = attach_reference(Address, id=address_id, name=address, city_id=city_id)
     if commit:
         db.session.commit()
-    return new_address
+    return address_instance
 
 
 def find_city_or_create(city, state, commit=True):
-    new_city = find_city(city, state)
-    if not new_city:
-        new_city = create_city(city, state)
+    city_id = find_city_id_or_create(city, state)
+    city_instance = attach_reference(City, id=city_id, name=city)
     if commit:
         db.session.commit()
-    return new_city
-
-
-def find_city(city, state):
-    city_instance = City \
-        .query \
-        .filter_by(name=city) \
-        .join(State, State.name == state) \
-        .first()
     return city_instance
 
 
-def create_city(city, state, commit=True):
-    state_instance = State \
-        .query \
-        .filter_by(name=state) \
-        .first()
-
-    if not state_instance:
-        new_city = City(name=city)
-        new_state = State(name=state)
-
-        new_city.state = new_state
-
-        db.session.add(new_state)
-        if commit:
-            db.session.commit()
-        return new_city
-
-    city_instance = City.query \
-        .filter_by(name=city) \
-        .join(State, State.name == state) \
-        .first()
-
-    if not city_instance:
-        new_city = City(name=city)
-        new_city.state = state_instance
-        db.session.add(new_city)
-        if commit:
-            db.session.commit()
-        return new_city
-
-    return city_instance
-
-
-def find_address(address, city, state):
-    address_instance = Address \
-        .query \
-        .filter_by(name=address) \
-        .join(City, City.name == city) \
-        .join(State, State.name == state) \
-        .first()
-    return address_instance
-
-
-def create_address(address, city, state, commit=True):
-    state_instance = State \
-        .query \
-        .filter_by(name=state) \
-        .first()
-
-    if not state_instance:
-        new_address = Address(name=address)
-        new_city = City(name=city)
-        new_state = State(name=state)
-
-        new_address.city = new_city
-        new_city.state = new_state
-
-        db.session.add(new_state)
-        db.session.commit()
-        return new_address
-
-    city_instance = City.query \
-        .filter_by(name=city) \
-        .join(State, State.name == state) \
-        .first()
-
-    if not city_instance:
-        new_address = Address(name=address)
-        new_city = City(name=city)
-        new_address.city = new_city
-        new_city.state = state_instance
-        db.session.add(new_city)
-        db.session.commit()
-        return new_address
-
-    new_address = Address(name=address)
-    new_address.city = city_instance
-    db.session.add(new_address)
-    db.session.commit()
-    return new_address
+def find_city(city, state):
+    city_id = find_city_id(city, state)
+    if city_id is None:
+        return None
+    return attach_reference(City, id=city_id, name=city)
 
 
 def find_genres_or_create(genres, commit=True):
     if not genres:
         return []
 
-    filter_args = or_(*map(lambda genre_name: Genre.name == genre_name, genres))
-    genres_instance = Genre.query.filter(filter_args).all()
-
-    for genre in genres:
-        has_genre = find_by_prop(genre, genres_instance, 'name')
-        if not has_genre:
-            new_genre = create_genre(genre, False)
-            genres_instance.append(new_genre)
+    genres_ids = {genre: genre_ids.get(genre) for genre in genres}
+
+    def find_missing_genres():
+        missing_genres = [genre for genre, genre_id in genres_ids.items() if genre_id is None]
+        if missing_genres:
+            rows = db.session \
+                .query(Genre.id, Genre.name) \
+                .filter(Genre.name.in_(missing_genres)) \
+                .all()
+            for row in rows:
+                genres_ids[row.name] = row.id
+                genre_ids.set(row.name, row.id)
+        return [genre for genre, genre_id in genres_ids.items() if genre_id is None]
+
+    new_genres = find_missing_genres()
+    if new_genres:
+        # All the new genres in one statement, then read back with the others
+        db.session.execute(insert_ignoring_conflicts(Genre.__table__, ['name']),
+                           [{"name": genre} for genre in new_genres])
+        find_missing_genres()
+
+    genres_instance = [attach_reference(Genre, id=genre_id, name=genre)
+                       for genre, genre_id in genres_ids.items()]
 
     if commit:
         db.session.commit()
     return genres_instance
 
 
-def create_genre(genre, commit=True):
-    genre_instance = Genre \
-        .query \
-        .filter_by(name=genre) \
-        .first()
-    if genre_instance:
-        return genre_instance
-    new_genre = Genre(name=genre)
-    db.session.add(new_genre)
-    if commit:
-        db.session.commit()
-    return new_genre
-
-
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
@@ -457,21 +1063,31 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-    venues = Venue.query.all()
-    cities = reduce_venues_by_city(venues)
+def get_page_args():
+    limit = request.args.get('limit', app.config['PAGE_SIZE'], type=int)
+    return {
+        "after": request.args.get('after'),
+        "before": request.args.get('before'),
+        "limit": max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+    }
 
-    data = []
 
-    for city in cities:
-        formatedVenues = format_venues(city.venues)
-        data.append({
-            "city": city.name,
-            "state": city.state.name,
-            "venues": formatedVenues
-        })
-    return render_template('pages/venues.html', areas=data)
+def paginate_or_abort(query, columns, **kwargs):
+    try:
+        return paginate(query, columns, **get_page_args(), **kwargs)
+    except ValueError:
+        abort(400)
+
+
+@app.route('/venues')
+@response_cache.cached
+def venues():
+    page = paginate_or_abort(find_venues_by_area(),
+                             [Venue.name, Venue.id],
+                             key=lambda row: [row.venue_name, row.venue_id])
+    data = reduce_venues_by_area(page["items"])
+    fragment_cache.prefetch([('venue', venue["id"]) for area in data for venue in area["venues"]])
+    return render_template('pages/venues.html', areas=data, page=page)
 
 
 @app.route('/venues/search', methods=['POST'])
@@ -480,8 +1096,9 @@ def search_venues():
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     search_term = request.form.get('search_term', '')
-    search = "%{}%".format(search_term)
-    venues = Venue.query.filter(Venue.name.ilike(search)).all()
+    venues = venue_search.search(load_profile(Venue.query, 'venue_listing'),
+                                 search_term,
+                                 app.config['SEARCH_RESULTS_LIMIT'])
     response = {
         "count": len(venues),
         "data": format_venues(venues)
@@ -491,18 +1108,19 @@ def search_venues():
 
 
 @app.route('/venues/<int:venue_id>')
+@response_cache.cached
 def show_venue(venue_id):
     print('Show venue by id', venue_id)
     # shows the venue page with the given venue_id
     # COMPLETED: replace with real venue data from the venues table, using venue_id
 
-    venue = Venue.query.get(venue_id)
+    venue = load_profile(Venue.query, 'venue_detail').get(venue_id)
     if not venue:
         return abort(404)
 
     filtered_shows = filter_shows(venue.shows)
     past_shows = format_shows(filtered_shows["past_shows"])
-    upcoming_shows = format_shows(filtered_shows["past_shows"])
+    upcoming_shows = format_shows(filtered_shows["upcoming_shows"])
 
     data = {
         "id": venue.id,
@@ -555,6 +1173,10 @@ def create_venue_submission():
     try:
         db.session.add(venue)
         db.session.commit()
+        venue_search.update(venue.id, venue.name)
+        fragment_cache.bump('venue', venue.id)
+        recommender.mark_dirty('venue', venue.id)
+        response_cache.invalidate('venues')
         # on successful db insert, flash success
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except SQLAlchemyError as e:
@@ -572,10 +1194,15 @@ def delete_venue(venue_id):
 
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
+    venue = Venue.query.get(venue_id)
+    if not venue:
+        return abort(404)
+
     try:
-        venue = Venue.query.get(venue_id)
-        db.session.delete(venue)
+        artist_ids = delete_show_owner(venue)
         db.session.commit()
+        venue_search.remove(venue.id)
+        invalidate_show_owner_pages(Venue, venue_id, artist_ids)
 
         # on successful db insert, flash success
         flash('Venue ' + venue_id + ' was successfully deleted!')
@@ -588,11 +1215,13 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached
 def artists():
     # COMPLETED: replace with real data returned from querying the database
-    artists = Artist.query.all()
-    data = format_artists(artists)
-    return render_template('pages/artists.html', artists=data)
+    page = paginate_or_abort(load_profile(Artist.query, 'artist_listing'), [Artist.name, Artist.id])
+    data = format_artists(page["items"])
+    fragment_cache.prefetch([('artist', artist["id"]) for artist in data])
+    return render_template('pages/artists.html', artists=data, page=page)
 
 
 @app.route('/artists/search', methods=['POST'])
@@ -601,8 +1230,9 @@ def search_artists():
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     search_term = request.form.get('search_term', '')
-    search = "%{}%".format(search_term)
-    artists = Artist.query.filter(Artist.name.ilike(search)).all()
+    artists = artist_search.search(load_profile(Artist.query, 'artist_listing'),
+                                   search_term,
+                                   app.config['SEARCH_RESULTS_LIMIT'])
     response = {
         "count": len(artists),
         "data": format_artists(artists)
@@ -612,17 +1242,18 @@ def search_artists():
 
 
 @app.route('/artists/<int:artist_id>')
+@response_cache.cached
 def show_artist(artist_id):
     # shows the venue page with the given venue_id
     # COMPLETED: replace with real venue data from the venues table, using venue_id
 
-    artist = Artist.query.get(artist_id)
+    artist = load_profile(Artist.query, 'artist_detail').get(artist_id)
     if not artist:
         return abort(404)
 
     filtered_shows = filter_shows(artist.shows)
     past_shows = format_shows(filtered_shows["past_shows"])
-    upcoming_shows = format_shows(filtered_shows["past_shows"])
+    upcoming_shows = format_shows(filtered_shows["upcoming_shows"])
 
     data = {
         "id": artist.id,
@@ -645,13 +1276,32 @@ def show_artist(artist_id):
     return render_template('pages/show_artist.html', artist=data)
 
 
+@app.route('/artists/<artist_id>', methods=['POST'])
+def delete_artist(artist_id):
+    artist = Artist.query.get(artist_id)
+    if not artist:
+        return abort(404)
+
+    try:
+        venue_ids = delete_show_owner(artist)
+        db.session.commit()
+        artist_search.remove(artist.id)
+        invalidate_show_owner_pages(Artist, artist_id, venue_ids)
+
+        flash('Artist ' + artist_id + ' was successfully deleted!')
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        flash('An error occurred. Artist ' + artist_id + ' could not be deleted.')
+    return render_template('pages/home.html')
+
+
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
 
-    artist = Artist.query.get(artist_id)
+    artist = load_profile(Artist.query, 'artist_edit').get(artist_id)
 
     if not artist:
         return abort(404)
@@ -698,6 +1348,8 @@ def edit_artist_submission(artist_id):
         # artist.seeking_venue = request.form.get('image_link', '')
         db.session.add(artist)
         db.session.commit()
+        artist_search.update(artist.id, artist.name)
+        invalidate_show_owner_pages(Artist, artist_id)
 
         # on successful db insert, flash success
         flash('Artist ' + str(artist_id) + ' was successfully edited!')
@@ -712,7 +1364,7 @@ def edit_artist_submission(artist_id):
 def edit_venue(venue_id):
     form = VenueForm()
 
-    venue_instance = Venue.query.get(venue_id)
+    venue_instance = load_profile(Venue.query, 'venue_edit').get(venue_id)
 
     if not venue_instance:
         return abort(404)
@@ -757,11 +1409,13 @@ def edit_venue_submission(venue_id):
         # venue.image_link = request.form.get('image_link', '') # View not implemented
 
         venue.genres = find_genres_or_create(genres, False)
-        venue.city = find_city_or_create(city, state, False)
+        venue.address = find_address_or_create(request.form.get('address', ''), city, state, False)
 
         # artist.seeking_venue = request.form.get('image_link', '') # View not implemented
         db.session.add(venue)
         db.session.commit()
+        venue_search.update(venue.id, venue.name)
+        invalidate_show_owner_pages(Venue, venue_id)
 
         # on successful db insert, flash success
         flash('Venue ' + str(venue_id) + ' was successfully edited!')
@@ -804,6 +1458,10 @@ def create_artist_submission():
         # artist.seeking_venue = request.form.get('image_link', '')
         db.session.add(artist)
         db.session.commit()
+        artist_search.update(artist.id, artist.name)
+        fragment_cache.bump('artist', artist.id)
+        recommender.mark_dirty('artist', artist.id)
+        response_cache.invalidate('artists')
 
         # on successful db insert, flash success
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
@@ -819,14 +1477,16 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@response_cache.cached
 def shows():
     # displays list of shows at /shows
     # COMPLETED: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    shows = Show.query.all()
-    data = format_shows(shows)
-
-    return render_template('pages/shows.html', shows=data)
+    page = paginate_or_abort(load_profile(Show.query, 'show_listing'), [Show.start_time, Show.id])
+    data = format_shows(page["items"])
+    fragment_cache.prefetch([('show', show["id"], 'artist', show["artist_id"], 'venue', show["venue_id"])
+                             for show in data])
+    return render_template('pages/shows.html', shows=data, page=page)
 
 
 @app.route('/shows/create')
@@ -839,14 +1499,23 @@ def create_shows():
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
     try:
-        show = Show()
-        show.venue_id = request.form.get('venue_id', None)
-        show.artist_id = request.form.get('artist_id', None)
-        show.start_time = dateutil.parser.isoparse(request.form.get('start_time', None))
+        row = parse_show_row(request.form)
+    except ValueError as error:
+        flash('Show could not be listed: {}.'.format(error))
+        return render_template('pages/home.html')
+    conflicts = find_show_conflicts({0: row})
+    if conflicts:
+        flash('Show could not be listed: {}.'.format('; '.join(conflicts[0])))
+        return render_template('pages/home.html')
+
+    try:
+        show = Show(**row)
         # called to create new shows in the db, upon submitting new show listing form
         # COMPLETED: insert form data as a new Show record in the db, instead
         db.session.add(show)
+        count_show(show)
         db.session.commit()
+        invalidate_show_pages(show)
         # on successful db insert, flash success
         flash('Show was successfully listed!')
     except SQLAlchemyError as e:
@@ -858,17 +1527,244 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
+@app.route('/shows/batch', methods=['POST'])
+def create_show_batch():
+    # Creates the shows of a JSON list in one transaction, all of them or
+    # none: a rejected batch comes back with the errors of each faulty row.
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return api_error(400, 'Expected a JSON list of shows')
+    if len(items) > app.config['SHOW_BATCH_MAX_SIZE']:
+        return api_error(400, 'At most {} shows per batch'.format(app.config['SHOW_BATCH_MAX_SIZE']))
+
+    rows = {}
+    errors = {}
+    for index, item in enumerate(items):
+        try:
+            rows[index] = parse_show_row(item)
+        except ValueError as error:
+            errors[index] = [str(error)]
+
+    venue_ids = {row["venue_id"] for row in rows.values()}
+    artist_ids = {row["artist_id"] for row in rows.values()}
+    if rows:
+        known_venues = find_existing_ids(Venue, venue_ids)
+        known_artists = find_existing_ids(Artist, artist_ids)
+        for index, row in rows.items():
+            if row["venue_id"] not in known_venues:
+                errors.setdefault(index, []).append('Unknown venue {}'.format(row["venue_id"]))
+            if row["artist_id"] not in known_artists:
+                errors.setdefault(index, []).append('Unknown artist {}'.format(row["artist_id"]))
+        for index, conflicts in find_show_conflicts(rows).items():
+            errors.setdefault(index, []).extend(conflicts)
+
+    if errors:
+        return api_response({
+            "created": 0,
+            "errors": [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+        }, 400)
+
+    try:
+        # A single INSERT with one VALUES tuple per show
+        db.session.execute(Show.__table__.insert().values(list(rows.values())))
+        refresh_show_counters(Venue, venue_ids)
+        refresh_show_counters(Artist, artist_ids)
+        db.session.commit()
+    except IntegrityError:
+        # A show booked by another request since the check (exclusion constraints)
+        db.session.rollback()
+        return api_error(409, 'A venue or an artist of the batch was booked in the meantime.')
+    except SQLAlchemyError:
+        db.session.rollback()
+        return api_error(500, 'An error occurred. The shows could not be listed.')
+
+    past = any(row["start_time"] < utcnow() for row in rows.values())
+    invalidate_show_batch_pages(venue_ids, artist_ids, past)
+    return api_response({"created": len(rows)}, 201)
+
+
 @app.route('/shows/search', methods=['POST'])
 def search_shows():
     search_term = request.form.get('search_term', '')
-    search = search_term
-    shows = Show.query.all()
+    start_date = request.form.get('start_date', '')
+    end_date = request.form.get('end_date', '')
+    try:
+        start_time = parse_datetime(start_date) if start_date else None
+        end_time = parse_datetime(end_date) if end_date else None
+    except ValueError:
+        return abort(400)
+    if end_time and len(end_date) == len('YYYY-MM-DD'):
+        # A plain end date includes the shows of that whole day
+        end_time += timedelta(days=1)
+
+    shows = find_shows(search_term, start_time, end_time, app.config['SEARCH_RESULTS_LIMIT'])
     response = {
         "count": len(shows),
         "data": format_shows(shows)
     }
     return render_template('pages/show.html', results=response,
-                           search_term=search_term)
+                           search_term=search_term,
+                           start_date=start_date,
+                           end_date=end_date)
+
+
+#  Monitoring
+#  ----------------------------------------------------------------
+
+@app.route('/_metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        abort(404)
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode(), 'Bearer {}'.format(token).encode()):
+        return Response('Unauthorized', status=401, headers={"WWW-Authenticate": 'Bearer'})
+    text = profiler.metrics.render() + render_pool_metrics(db.engine.pool)
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/_ready')
+def ready():
+    # Fails when the pool is close to exhaustion, so that the load balancer
+    # sends the traffic to other workers, or when the database is unreachable.
+    pool = pool_status(db.engine.pool)
+    data = {"database": "ok", "pool": pool}
+    if pool and pool["saturation"] >= app.config['READY_MAX_POOL_SATURATION']:
+        data["database"] = "saturated"
+    else:
+        try:
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('SELECT 1')
+        except SQLAlchemyError:
+            data["database"] = "unavailable"
+    status = 200 if data["database"] == "ok" else 503
+    return Response(json.dumps(data), status=status, mimetype='application/json')
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@app.route('/export/<any(venues, artists, shows):entity>.<any(jsonl, csv):fmt>')
+def export(entity, fmt):
+    lines = exporter.serialize(iter_export_rows(entity), entity, fmt)
+    return Response(stream_with_context(lines),
+                    mimetype=exporter.FORMATS[fmt],
+                    headers={"Content-Disposition": "attachment; filename={}.{}".format(entity, fmt)})
+
+
+#  API
+#  ----------------------------------------------------------------
+
+def api_response(data, status=200):
+    return Response(api.dumps(data), status=status, mimetype=api.MIMETYPE)
+
+
+def api_error(status, message):
+    return api_response({"error": message}, status)
+
+
+@app.route('/api/v1/<any(venues, artists, shows):entity>')
+def api_list(entity):
+    resource = find_api_resource(entity)
+    try:
+        fields = api.parse_fields(request.args.get('fields'), resource.columns)
+        page = paginate(resource.select(fields), resource.sort,
+                        **get_page_args(),
+                        key=resource.sort_key,
+                        fetch=lambda statement: db.session.execute(statement).all())
+    except ValueError as error:
+        return api_error(400, str(error))
+    return api_response({
+        "data": [resource.serialize(row, fields) for row in page["items"]],
+        "next_cursor": page["next_cursor"],
+        "prev_cursor": page["prev_cursor"]
+    })
+
+
+@app.route('/api/v1/<any(venues, artists, shows):entity>/<int:item_id>')
+def api_detail(entity, item_id):
+    resource = find_api_resource(entity)
+    try:
+        fields = api.parse_fields(request.args.get('fields'), resource.columns)
+    except ValueError as error:
+        return api_error(400, str(error))
+    row = db.session.execute(resource.select(fields).where(resource.columns["id"] == item_id)).first()
+    if row is None:
+        return api_error(404, 'Not found')
+    return api_response({"data": resource.serialize(row, fields)})
+
+
+@app.route('/api/v1/shows/calendar')
+def api_calendar():
+    # Shows per ?bucket= (day or week) and ?by= (city, venue or genre) between
+    # ?from= and ?to= (ISO 8601, the last CALENDAR_DAYS by default), in whole buckets
+    bucket = request.args.get('bucket', 'day')
+    group = request.args.get('by', 'city')
+    if bucket not in BUCKETS or group not in GROUPS:
+        return api_error(400, 'bucket is one of {}, by one of {}'.format(', '.join(BUCKETS), ', '.join(GROUPS)))
+    try:
+        end_time = parse_datetime(request.args['to']) if request.args.get('to') \
+            else utcnow()
+        start_time = parse_datetime(request.args['from']) if request.args.get('from') \
+            else end_time - timedelta(days=app.config['CALENDAR_DAYS'])
+    except ValueError:
+        return api_error(400, 'from and to must be ISO 8601 dates')
+    if not start_time < end_time <= start_time + timedelta(days=app.config['CALENDAR_MAX_DAYS']):
+        return api_error(400, 'to must be after from, within {} days'.format(app.config['CALENDAR_MAX_DAYS']))
+
+    calendar = find_calendar(start_time, end_time, bucket, group)
+    return api_response({
+        "bucket": bucket,
+        "by": group,
+        "data": [{"start": start.isoformat(), "counts": counts} for start, counts in calendar]
+    })
+
+
+@app.route('/api/v1/<any(venues, artists):entity>/<int:item_id>/availability')
+def api_availability(entity, item_id):
+    # Free windows of a venue or an artist between ?from= and ?to= (ISO 8601,
+    # from now for AVAILABILITY_DAYS by default), at least ?min_minutes= long
+    model, owner_column = (Venue, Show.venue_id) if entity == 'venues' else (Artist, Show.artist_id)
+    try:
+        start_time = parse_datetime(request.args['from']) if request.args.get('from') \
+            else utcnow().replace(second=0, microsecond=0)
+        end_time = parse_datetime(request.args['to']) if request.args.get('to') \
+            else start_time + timedelta(days=app.config['AVAILABILITY_DAYS'])
+    except ValueError:
+        return api_error(400, 'from and to must be ISO 8601 dates')
+    if not start_time < end_time <= start_time + timedelta(days=app.config['AVAILABILITY_MAX_DAYS']):
+        return api_error(400, 'to must be after from, within {} days'.format(app.config['AVAILABILITY_MAX_DAYS']))
+    min_minutes = request.args.get('min_minutes', 0, type=int)
+
+    if db.session.query(model.id).filter(model.id == item_id).first() is None:
+        return api_error(404, 'Not found')
+    windows = find_free_windows(owner_column, item_id, start_time, end_time, timedelta(minutes=min_minutes))
+    return api_response({
+        "data": [{"start_time": window_start, "end_time": window_end} for window_start, window_end in windows]
+    })
+
+
+@app.route('/api/v1/<any(venues, artists):entity>/<int:item_id>/recommendations')
+def api_recommendations(entity, item_id):
+    # Best artists seeking venues for a venue, or venues seeking talent for
+    # an artist, at most ?limit= (RECOMMENDATIONS_K) of them
+    side, other_model = ('venue', Artist) if entity == 'venues' else ('artist', Venue)
+    limit = request.args.get('limit', app.config['RECOMMENDATIONS_K'], type=int)
+    try:
+        recommendations = recommender.recommend(side, item_id, max(limit, 0))
+    except RecommendationsUnavailable:
+        response = api_error(503, 'The recommendations are being computed')
+        response.headers['Retry-After'] = '5'
+        return response
+    if recommendations is None:
+        return api_error(404, 'Not found')
+
+    names = dict(db.session.query(other_model.id, other_model.name)
+                 .filter(other_model.id.in_([other_id for other_id, _ in recommendations])))
+    return api_response({
+        "data": [{"id": other_id, "name": names.get(other_id), "score": round(score, 4)}
+                 for other_id, score in recommendations]
+    })
 
 
 @app.errorhandler(404)
@@ -0,0 +1,299 @@
+import asyncio
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template, request_started
+from sqlalchemy import select
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException, NotFound
+
+from formatting import utcnow
+from app import app, response_cache, Venue, Artist, Show, Genre, Address, City, State, \
+    Talent_Seeking, Venue_Seeking, venue_genres, artist_genres
+
+# ----------------------------------------------------------------------------#
+# ASGI entry point.
+# ----------------------------------------------------------------------------#
+
+# `uvicorn asgi:application` serves the venue and artist pages with async
+# handlers on an async engine, running their independent queries
+# concurrently; every other route goes to the Flask app through asgiref's
+# WSGI adapter, in a thread pool. Templates are still rendered by Flask, in
+# a request context that is only pushed between awaits: Flask contexts are
+# not task local. The same contexts are pushed for each step, so that the
+# before and after request hooks, g and the session see a single request.
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(config):
+    uri = config.get('ASYNC_DATABASE_URI')
+    if uri:
+        return uri
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    return str(url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]))
+
+
+def async_engine_options(config, uri):
+    if make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+    options = {
+        "pool_size": config['DB_POOL_SIZE'],
+        "max_overflow": config['DB_MAX_OVERFLOW'],
+        "pool_timeout": config['DB_POOL_TIMEOUT'],
+        "pool_recycle": config['DB_POOL_RECYCLE'],
+        "pool_pre_ping": config['DB_POOL_PRE_PING'],
+    }
+    if config.get('DB_STATEMENT_TIMEOUT'):
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(config['DB_STATEMENT_TIMEOUT'])}}
+    return options
+
+
+database_uri = async_database_uri(app.config)
+engine = create_async_engine(database_uri, **async_engine_options(app.config, database_uri))
+
+
+async def fetch_all(statement):
+    # Each query takes its own connection, so that gathered queries run concurrently
+    async with engine.connect() as connection:
+        result = await connection.execute(statement)
+        return result.all()
+
+
+# ----------------------------------------------------------------------------#
+# Pages.
+# ----------------------------------------------------------------------------#
+
+def format_show_rows(rows):
+    shows = {"past_shows": [], "upcoming_shows": []}
+    now = utcnow()
+    for row in rows:
+        show = {
+            "id": row.id,
+            "artist_id": row.artist_id,
+            "artist_name": row.artist_name,
+            "artist_image_link": row.artist_image_link,
+            "venue_id": row.venue_id,
+            "venue_name": row.venue_name,
+            "venue_image_link": row.venue_image_link,
+            "start_time": row.start_time
+        }
+        shows["upcoming_shows" if row.start_time > now else "past_shows"].append(show)
+    return shows
+
+
+def select_shows(condition):
+    return select(Show.id, Show.start_time, Show.artist_id, Show.venue_id,
+                  Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'),
+                  Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link')) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .where(condition) \
+        .order_by(Show.id)
+
+
+def select_genres(association, owner_column, owner_id):
+    return select(Genre.name) \
+        .join(association, association.c.genre_id == Genre.id) \
+        .where(owner_column == owner_id) \
+        .order_by(Genre.id)
+
+
+async def show_venue(venue_id):
+    venues, genres, show_rows = await asyncio.gather(
+        fetch_all(select(Venue.id, Venue.name, Venue.phone, Venue.website, Venue.facebook_link,
+                         Venue.image_link, Address.name.label('address'), City.name.label('city'),
+                         State.name.label('state'), Talent_Seeking.id.label('seeking_id'),
+                         Talent_Seeking.description.label('seeking_description'))
+                  .join(Address, Address.id == Venue.address_id)
+                  .join(City, City.id == Address.city_id)
+                  .join(State, State.id == City.state_id)
+                  .outerjoin(Talent_Seeking, Talent_Seeking.venue_id == Venue.id)
+                  .where(Venue.id == venue_id)),
+        fetch_all(select_genres(venue_genres, venue_genres.c.venue_id, venue_id)),
+        fetch_all(select_shows(Show.venue_id == venue_id)),
+    )
+    if not venues:
+        raise NotFound()
+    venue = venues[0]
+    shows = format_show_rows(show_rows)
+
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "image_link": venue.image_link,
+        "genres": [genre.name for genre in genres],
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "seeking_talent": venue.seeking_id is not None,
+        "seeking_description": venue.seeking_description,
+        "past_shows": shows["past_shows"],
+        "upcoming_shows": shows["upcoming_shows"],
+        "past_shows_count": len(shows["past_shows"]),
+        "upcoming_shows_count": len(shows["upcoming_shows"])
+    }
+    return 'pages/show_venue.html', {"venue": data}
+
+
+async def show_artist(artist_id):
+    artists, genres, show_rows = await asyncio.gather(
+        fetch_all(select(Artist.id, Artist.name, Artist.phone, Artist.website, Artist.facebook_link,
+                         Artist.image_link, City.name.label('city'), State.name.label('state'),
+                         Venue_Seeking.id.label('seeking_id'),
+                         Venue_Seeking.description.label('seeking_description'))
+                  .join(City, City.id == Artist.city_id)
+                  .join(State, State.id == City.state_id)
+                  .outerjoin(Venue_Seeking, Venue_Seeking.artist_id == Artist.id)
+                  .where(Artist.id == artist_id)),
+        fetch_all(select_genres(artist_genres, artist_genres.c.artist_id, artist_id)),
+        fetch_all(select_shows(Show.artist_id == artist_id)),
+    )
+    if not artists:
+        raise NotFound()
+    artist = artists[0]
+    shows = format_show_rows(show_rows)
+
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "image_link": artist.image_link,
+        "genres": [genre.name for genre in genres],
+        "city": artist.city,
+        "state": artist.state,
+        "seeking_venue": artist.seeking_id is not None,
+        "seeking_description": artist.seeking_description,
+        "past_shows": shows["past_shows"],
+        "upcoming_shows": shows["upcoming_shows"],
+        "past_shows_count": len(shows["past_shows"]),
+        "upcoming_shows_count": len(shows["upcoming_shows"])
+    }
+    return 'pages/show_artist.html', {"artist": data}
+
+
+# Flask endpoints served by the async handlers
+async_views = {
+    'show_venue': show_venue,
+    'show_artist': show_artist,
+}
+
+
+# ----------------------------------------------------------------------------#
+# Application.
+# ----------------------------------------------------------------------------#
+
+class AsyncApplication:
+    """ASGI application dispatching with the Flask URL map."""
+
+    def __init__(self, flask_app, views):
+        self.app = flask_app
+        self.views = views
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    def match(self, scope):
+        adapter = self.app.url_map.bind(scope.get('server', ('localhost',))[0] or 'localhost')
+        try:
+            return adapter.match(scope['path'], scope['method'])
+        except HTTPException:
+            return None, None
+
+    @staticmethod
+    def environ(scope):
+        # As asgiref's adapter builds it; the async views read no body
+        root_path = scope.get('root_path', '')
+        environ = {
+            "REQUEST_METHOD": scope['method'],
+            "SCRIPT_NAME": root_path.encode('utf-8').decode('latin-1'),
+            "PATH_INFO": scope['path'][len(root_path):].encode('utf-8').decode('latin-1'),
+            "QUERY_STRING": scope['query_string'].decode('ascii'),
+            "SERVER_NAME": scope.get('server', ('localhost', 80))[0],
+            "SERVER_PORT": str(scope.get('server', ('localhost', 80))[1]),
+            "SERVER_PROTOCOL": 'HTTP/{}'.format(scope['http_version']),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get('scheme', 'http'),
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        if scope.get('client'):
+            environ["REMOTE_ADDR"] = scope['client'][0]
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            value = value.decode('latin-1')
+            environ[name] = environ[name] + ',' + value if name in environ else value
+        return environ
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        endpoint, view_args = self.match(scope) if scope['type'] == 'http' else (None, None)
+        if endpoint not in self.views:
+            return await self.wsgi(scope, receive, send)
+        response = await self.dispatch(scope, self.views[endpoint], view_args)
+        await send({
+            "type": 'http.response.start',
+            "status": response.status_code,
+            "headers": [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers.items()],
+        })
+        await send({"type": 'http.response.body', "body": response.get_data()})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({"type": 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({"type": 'lifespan.shutdown.complete'})
+                return
+
+    async def dispatch(self, scope, view, view_args):
+        # Mirrors Flask.full_dispatch_request, with the view awaited outside the contexts.
+        # Popping them runs the teardown functions after each step, which also
+        # releases the scoped session that the tasks of this thread share.
+        app_context = self.app.app_context()
+        request_context = self.app.request_context(self.environ(scope))
+        with app_context, request_context:
+            self.app.try_trigger_before_first_request_functions()
+            request_started.send(self.app)
+            response = self.app.preprocess_request()
+            cached = not response_cache.bypassed()
+            if response is None and cached:
+                key, entry = response_cache.lookup(view_args)
+                if entry is not None:
+                    response = response_cache.respond(entry)
+            if response is not None:
+                return self.app.finalize_request(response)
+
+        try:
+            template, context = await view(**view_args)
+        except HTTPException as error:
+            with app_context, request_context:
+                return self.app.finalize_request(self.app.handle_user_exception(error))
+
+        with app_context, request_context:
+            response = self.app.make_response(render_template(template, **context))
+            if cached:
+                entry = response_cache.store(key, response)
+                if entry is not None:
+                    response = response_cache.respond(entry)
+            return self.app.finalize_request(response)
+
+
+application = AsyncApplication(app, async_views)
@@ -0,0 +1,54 @@
+from bisect import bisect_left, insort
+
+# ----------------------------------------------------------------------------#
+# Availability.
+# ----------------------------------------------------------------------------#
+
+# A venue or an artist is booked from the start to the end of each of its
+# shows, [start_time, end_time). Two bookings of the same venue or of the
+# same artist may not overlap: PostgreSQL enforces it with exclusion
+# constraints, and the controllers check it before inserting.
+
+
+class Schedule:
+    """Bookings of a venue or an artist, sorted by start time.
+
+    max_duration bounds the length of a booking, so that the bookings
+    overlapping a window are found between two bisections.
+    """
+
+    def __init__(self, max_duration):
+        self.max_duration = max_duration
+        self.bookings = []
+
+    def add(self, start, end, label='an existing show'):
+        insort(self.bookings, (start, end, label))
+
+    def conflict(self, start, end):
+        """Label of a booking overlapping [start, end), None when it is free."""
+        first = bisect_left(self.bookings, (start - self.max_duration,))
+        last = bisect_left(self.bookings, (end,))
+        for booked_start, booked_end, label in self.bookings[first:last]:
+            if booked_end > start and booked_start < end:
+                return label
+        return None
+
+
+def free_windows(bookings, start, end, min_duration=None):
+    """[start, end) windows free of the (start, end) bookings, which are sorted by start.
+
+    Windows shorter than min_duration are left out.
+    """
+    windows = []
+    cursor = start
+    for booked_start, booked_end in bookings:
+        if booked_start > cursor:
+            windows.append((cursor, min(booked_start, end)))
+        cursor = max(cursor, booked_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        windows.append((cursor, end))
+    if min_duration:
+        windows = [window for window in windows if window[1] - window[0] >= min_duration]
+    return [window for window in windows if window[1] > window[0]]
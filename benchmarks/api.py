@@ -0,0 +1,33 @@
+from app import app
+from benchmarks import controllers
+
+# ----------------------------------------------------------------------------#
+# JSON API benchmark.
+# ----------------------------------------------------------------------------#
+
+# Each /api/v1 route against the HTML page carrying the same data, with the
+# controllers benchmark (response cache disabled).
+
+PAIRS = (
+    ('venues', 'api_venues'),
+    ('show_venue', 'api_venue'),
+    ('artists', 'api_artists'),
+    ('show_artist', 'api_artist'),
+    ('shows', 'api_shows'),
+)
+
+
+def run(requests=100):
+    """(html, api, html result, api result) for each pair of routes."""
+    report = controllers.run(requests, only=[name for pair in PAIRS for name in pair])
+    return [(html, json, report["results"][html], report["results"][json]) for html, json in PAIRS]
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        results = run()
+    for html, json, html_result, json_result in results:
+        print('{:<12} {:8.2f}ms {:5.1f} queries {:8.1f}KB | {:<12} {:8.2f}ms {:5.1f} queries {:8.1f}KB  x{:.1f}'.format(
+            html, html_result["mean_ms"], html_result["queries_mean"], html_result["peak_memory_kb"],
+            json, json_result["mean_ms"], json_result["queries_mean"], json_result["peak_memory_kb"],
+            html_result["mean_ms"] / json_result["mean_ms"]))
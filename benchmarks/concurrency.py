@@ -0,0 +1,111 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, db, Venue, Artist
+
+# ----------------------------------------------------------------------------#
+# Concurrency benchmark.
+# ----------------------------------------------------------------------------#
+
+# Requests the venue and artist pages with many requests in flight, through
+# the WSGI app in a thread pool (one thread per request in flight, as a
+# threaded worker would) and through the ASGI app on one event loop, and
+# reports the throughput of both. Run it on the database the app is
+# configured with, loaded by `python manage.py generate`.
+
+CONCURRENCY = (1, 10, 100)
+
+
+def find_paths(count):
+    venues = [venue_id for venue_id, in db.session.query(Venue.id).order_by(Venue.id).limit(count)]
+    artists = [artist_id for artist_id, in db.session.query(Artist.id).order_by(Artist.id).limit(count)]
+    db.session.remove()
+    if not venues or not artists:
+        raise RuntimeError('No venues or artists: run `python manage.py generate` first')
+    return ['/venues/{}'.format(venue_id) for venue_id in venues] + \
+           ['/artists/{}'.format(artist_id) for artist_id in artists]
+
+
+def run_wsgi(paths, concurrency):
+    client = app.test_client()
+
+    def send(path):
+        with app.app_context():
+            status = client.get(path).status_code
+            db.session.remove()
+        return status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(send, paths))
+
+
+def run_asgi(paths, concurrency):
+    import asgi
+
+    async def send(path, slots):
+        scope = {
+            "type": 'http',
+            "method": 'GET',
+            "path": path,
+            "query_string": b'',
+            "headers": [],
+            "server": ('localhost', 80),
+            "scheme": 'http',
+            "http_version": '1.1',
+            "root_path": '',
+        }
+        messages = []
+
+        async def receive():
+            return {"type": 'http.request', "body": b''}
+
+        async def record(message):
+            messages.append(message)
+
+        async with slots:
+            await asgi.application(scope, receive, record)
+        return messages[0]["status"]
+
+    async def send_all():
+        slots = asyncio.Semaphore(concurrency)
+        try:
+            return await asyncio.gather(*[send(path, slots) for path in paths])
+        finally:
+            await asgi.engine.dispose()
+
+    return asyncio.run(send_all())
+
+
+def measure(runner, paths, concurrency):
+    started = time.perf_counter()
+    statuses = runner(paths, concurrency)
+    elapsed = time.perf_counter() - started
+    if set(statuses) != {200}:
+        raise RuntimeError('Unexpected statuses: {}'.format(sorted(set(statuses))))
+    return len(paths) / elapsed
+
+
+def run(requests=1000, concurrency=CONCURRENCY, pages=50):
+    """Requests per second of each mode, per number of requests in flight."""
+    paths = find_paths(pages)
+    paths = [paths[index % len(paths)] for index in range(requests)]
+    cache_enabled = app.config['RESPONSE_CACHE_ENABLED']
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    try:
+        # Warm up the templates and the connection pools
+        measure(run_wsgi, paths[:10], 1)
+        measure(run_asgi, paths[:10], 1)
+        return {level: {"wsgi": measure(run_wsgi, paths, level),
+                        "asgi": measure(run_asgi, paths, level)}
+                for level in concurrency}
+    finally:
+        app.config['RESPONSE_CACHE_ENABLED'] = cache_enabled
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        results_by_level = run()
+    for level, results in results_by_level.items():
+        print('{:>4} in flight  wsgi {:8.1f} req/s  asgi {:8.1f} req/s  x{:.2f}'.format(
+            level, results["wsgi"], results["asgi"], results["asgi"] / results["wsgi"]))
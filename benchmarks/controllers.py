@@ -0,0 +1,219 @@
+import itertools
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import app, db, Venue, Artist, Show
+
+# ----------------------------------------------------------------------------#
+# Controllers benchmark.
+# ----------------------------------------------------------------------------#
+
+# Every controller is requested through the test client, each request starting
+# from an empty session like a request served by a worker. Latency is measured
+# on its own; memory is measured on separate requests, as tracemalloc slows
+# down everything it traces.
+
+PERCENTILES = (50, 95, 99)
+
+# Requests traced by tracemalloc per controller
+MEMORY_SAMPLES = 3
+
+
+def percentile(values, rank):
+    # Nearest rank on sorted values
+    index = max(0, -(-len(values) * rank // 100) - 1)
+    return sorted(values)[index]
+
+
+def first_row(model):
+    instance = model.query.order_by(model.id).first()
+    if instance is None:
+        raise RuntimeError('No {} rows: run `python manage.py generate` first'.format(model.__tablename__))
+    return instance
+
+
+def profile_form(instance, number):
+    return {
+        "name": 'Benchmark {} {}'.format(type(instance).__name__, number),
+        "phone": instance.phone or '',
+        "website": instance.website or '',
+        "facebook_link": instance.facebook_link or '',
+        "image_link": instance.image_link or '',
+        "genres": [genre.name for genre in instance.genres],
+    }
+
+
+def venue_form(venue, number):
+    form = profile_form(venue, number)
+    form.update(address=venue.address.name,
+                city=venue.address.city.name,
+                state=venue.address.city.state.name)
+    return form
+
+
+def artist_form(artist, number):
+    form = profile_form(artist, number)
+    form.update(city=artist.city.name, state=artist.city.state.name)
+    return form
+
+
+def find_scenarios():
+    """(name, method, path, form) for every controller; form is a function of the request number."""
+    venue = first_row(Venue)
+    artist = first_row(Artist)
+    # Shows may not overlap: each request books its own slot, on a day no
+    # previous run is likely to have used
+    show_day = datetime(2100, 1, 1) + timedelta(days=random.randrange(100000))
+    show_slots = itertools.count()
+    # Edits resubmit the current values, so they do not drift from one run to the next
+    venue_edit = venue_form(venue, 0)
+    venue_edit["name"] = venue.name
+    artist_edit = artist_form(artist, 0)
+    artist_edit["name"] = artist.name
+    db.session.remove()
+
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('search_venues', 'POST', '/venues/search', lambda n: {"search_term": 'lounge'}),
+        ('show_venue', 'GET', '/venues/{}'.format(venue.id), None),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('create_venue_submission', 'POST', '/venues/create', lambda n: venue_form(venue, n)),
+        ('edit_venue', 'GET', '/venues/{}/edit'.format(venue.id), None),
+        ('edit_venue_submission', 'POST', '/venues/{}/edit'.format(venue.id), lambda n: venue_edit),
+        ('artists', 'GET', '/artists', None),
+        ('search_artists', 'POST', '/artists/search', lambda n: {"search_term": 'band'}),
+        ('show_artist', 'GET', '/artists/{}'.format(artist.id), None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('create_artist_submission', 'POST', '/artists/create', lambda n: artist_form(artist, n)),
+        ('edit_artist', 'GET', '/artists/{}/edit'.format(artist.id), None),
+        ('edit_artist_submission', 'POST', '/artists/{}/edit'.format(artist.id), lambda n: artist_edit),
+        ('shows', 'GET', '/shows', None),
+        ('create_shows', 'GET', '/shows/create', None),
+        ('create_show_submission', 'POST', '/shows/create',
+         lambda n: {"venue_id": venue.id, "artist_id": artist.id,
+                    "start_time": (show_day + timedelta(hours=3 * next(show_slots))).isoformat()}),
+        ('search_shows', 'POST', '/shows/search', lambda n: {"search_term": 'jazz'}),
+        ('export', 'GET', '/export/shows.jsonl', None),
+        ('api_venues', 'GET', '/api/v1/venues', None),
+        ('api_venue', 'GET', '/api/v1/venues/{}'.format(venue.id), None),
+        ('api_artists', 'GET', '/api/v1/artists', None),
+        ('api_artist', 'GET', '/api/v1/artists/{}'.format(artist.id), None),
+        ('api_shows', 'GET', '/api/v1/shows', None),
+    ]
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def send(client, method, path, form, number):
+    # Requests do not push their own app context under `manage.py`, so the
+    # session is reset by hand to keep identity maps from carrying over.
+    db.session.remove()
+    if method == 'GET':
+        response = client.get(path)
+    else:
+        response = client.post(path, data=form(number))
+    response.get_data()
+    response.close()
+    return response.status_code
+
+
+def run_scenario(client, counter, scenario, requests):
+    name, method, path, form = scenario
+    latencies = []
+    queries = []
+    errors = 0
+    for number in range(requests):
+        counter.count = 0
+        started = time.perf_counter()
+        status = send(client, method, path, form, number)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+        errors += status >= 400
+
+    tracemalloc.start()
+    peaks = []
+    for number in range(requests, requests + MEMORY_SAMPLES):
+        tracemalloc.reset_peak()
+        send(client, method, path, form, number)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    result = {"method": method, "path": path, "requests": requests, "errors": errors}
+    for rank in PERCENTILES:
+        result["p{}_ms".format(rank)] = round(percentile(latencies, rank), 3)
+    result.update({
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+        "peak_memory_kb": round(max(peaks) / 1024, 1),
+    })
+    return result
+
+
+def run(requests=100, warmup=5, cache=False, only=None):
+    """Benchmark every controller, or those named in only. Returns the report as a dict."""
+    cache_enabled = app.config['RESPONSE_CACHE_ENABLED']
+    app.config['RESPONSE_CACHE_ENABLED'] = cache
+    client = app.test_client()
+    counter = QueryCounter()
+    event.listen(db.engine, 'before_cursor_execute', counter)
+    try:
+        scenarios = [scenario for scenario in find_scenarios() if not only or scenario[0] in only]
+        catalogue = {model.__tablename__: model.query.count() for model in (Venue, Artist, Show)}
+        results = {}
+        for scenario in scenarios:
+            run_scenario(client, counter, scenario, warmup)
+            results[scenario[0]] = run_scenario(client, counter, scenario, requests)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', counter)
+        app.config['RESPONSE_CACHE_ENABLED'] = cache_enabled
+        db.session.remove()
+
+    return {
+        "started_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "database": db.engine.dialect.name,
+        "response_cache": cache,
+        "catalogue": catalogue,
+        "results": results,
+    }
+
+
+def compare(report, baseline, metrics=('p95_ms', 'queries_max', 'peak_memory_kb')):
+    """Lines describing the change of each metric against a previous report."""
+    lines = []
+    for name, result in report["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        changes = []
+        for metric in metrics:
+            before, after = previous[metric], result[metric]
+            change = (after - before) / before * 100 if before else 0
+            changes.append('{} {} -> {} ({:+.0f}%)'.format(metric, before, after, change))
+        lines.append('{}: {}'.format(name, ', '.join(changes)))
+    return lines
+
+
+def write_report(report, path):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+
+def read_report(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,52 @@
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from formatting import DATETIME_FORMATS, DatetimeFormatter
+
+# ----------------------------------------------------------------------------#
+# Datetime filter micro-benchmark.
+# ----------------------------------------------------------------------------#
+
+# Formats the start times of a page of shows the way the `datetime` filter
+# used to (stringified, parsed back, pattern parsed on every call) and with
+# DatetimeFormatter, without and with its memo.
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[format])
+
+
+def show_times(count, distinct=200):
+    # Shows start on the hour, so a page repeats a limited set of dates
+    start = datetime(2030, 1, 1, 20)
+    return [start + timedelta(days=index % distinct) for index in range(count)]
+
+
+def run(count=5000, repeat=5):
+    times = show_times(count)
+    strings = [str(value) for value in times]
+    formatter = DatetimeFormatter()
+    memoized = DatetimeFormatter(cache_size=4096)
+    cases = {
+        "legacy (str + parse)": lambda: [legacy_format_datetime(value, 'full') for value in strings],
+        "compiled": lambda: [formatter(value, 'full') for value in times],
+        "compiled + memo": lambda: [memoized(value, 'full') for value in times],
+    }
+    assert len({tuple(case()) for case in cases.values()}) == 1
+
+    results = {}
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        results[name] = best / count * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    results = run()
+    baseline = results["legacy (str + parse)"]
+    for name, microseconds in results.items():
+        print('{:<22} {:8.2f}us per value  x{:.1f}'.format(name, microseconds, baseline / microseconds))
@@ -0,0 +1,148 @@
+import random
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from formatting import utcnow
+
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+# ----------------------------------------------------------------------------#
+
+# Rows in the importer format. The output only depends on the seed (and on
+# the anchor date of the shows), so two runs with the same arguments load the
+# same catalogue. Genres, cities, venues and artists are picked with Zipf
+# weights: a few genres and cities hold most of the catalogue, and a few
+# venues and artists hold most of the shows.
+
+GENRES = ['Rock n Roll', 'Pop', 'Jazz', 'Hip-Hop', 'Electronic', 'Country', 'Classical',
+          'R&B', 'Alternative', 'Folk', 'Blues', 'Soul', 'Punk', 'Heavy Metal', 'Reggae',
+          'Funk', 'Instrumental', 'Musical Theatre', 'Other']
+
+CITIES = [('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+          ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+          ('Dallas', 'TX'), ('San Jose', 'CA'), ('Austin', 'TX'), ('Jacksonville', 'FL'),
+          ('San Francisco', 'CA'), ('Columbus', 'OH'), ('Seattle', 'WA'), ('Denver', 'CO'),
+          ('Nashville', 'TN'), ('Boston', 'MA'), ('Portland', 'OR'), ('Las Vegas', 'NV'),
+          ('Detroit', 'MI'), ('Memphis', 'TN'), ('Atlanta', 'GA'), ('Miami', 'FL'),
+          ('New Orleans', 'LA'), ('Minneapolis', 'MN'), ('Pittsburgh', 'PA'), ('Baltimore', 'MD')]
+
+STATES = sorted({state for _, state in CITIES})
+
+# Small towns making the long tail of the city spread
+TOWNS = 500
+
+VENUE_WORDS = (['The Velvet', 'The Blue', 'The Rusty', 'Golden', 'Midnight', 'The Old', 'Electric',
+                'The Silver', 'Red Door', 'Union', 'Harbor', 'The Crooked'],
+               ['Lounge', 'Hall', 'Room', 'Club', 'Tavern', 'Theatre', 'Ballroom', 'Cellar',
+                'Social', 'Garage', 'Stage', 'Music & Coffee'])
+
+ARTIST_WORDS = (['The Wild', 'Neon', 'Guns N', 'Paper', 'Lonely', 'Broken', 'Electric', 'Quiet',
+                 'Crimson', 'Northern', 'Saint', 'Velvet'],
+                ['Petals', 'Sax Band', 'Lights', 'Wolves', 'Hearts', 'Orchestra', 'Trio',
+                 'Collective', 'Riders', 'Echoes', 'Machines', 'Quartet'])
+
+STREETS = ['Folsom Street', 'Delancey Street', 'Main Street', 'Broadway', 'Market Street',
+           'Mission Street', 'Elm Street', 'Oak Avenue', 'Sunset Boulevard', 'Canal Street']
+
+# Shows are spread over a year on each side of the anchor date
+SHOWS_WINDOW_DAYS = 365
+# Start hours of the shows, which last one hour
+SHOW_HOURS = [18, 19, 20, 21, 22]
+SHOW_LENGTH = timedelta(hours=1)
+
+ZIPF_EXPONENT = 1.1
+
+
+class ZipfSampler:
+    """Samples indexes in [0, n) with weights 1 / (rank + 1) ** exponent."""
+
+    def __init__(self, n, exponent=ZIPF_EXPONENT):
+        self.cum_weights = list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+    def sample(self, rng):
+        return bisect(self.cum_weights, rng.random() * self.cum_weights[-1])
+
+    def sample_distinct(self, rng, k):
+        indexes = set()
+        while len(indexes) < min(k, len(self.cum_weights)):
+            indexes.add(self.sample(rng))
+        return sorted(indexes)
+
+
+def entity_rng(seed, entity):
+    # One generator per entity, so the venues do not change when more artists are asked for
+    return random.Random('{}:{}'.format(seed, entity))
+
+
+def city_pool(rng):
+    towns = [('Town {}'.format(n), rng.choice(STATES)) for n in range(TOWNS)]
+    return CITIES + towns
+
+
+def generate_profile(rng, number, words, genres, cities, city_weights):
+    first, second = words
+    name = '{} {} {}'.format(rng.choice(first), rng.choice(second), number)
+    slug = name.lower().replace(' ', '').replace('&', '')
+    city, state = cities[city_weights.sample(rng)]
+    return {
+        "name": name,
+        "city": city,
+        "state": state,
+        "phone": '{:03d}-{:03d}-{:04d}'.format(rng.randrange(200, 1000), rng.randrange(1000), rng.randrange(10000)),
+        "image_link": 'https://images.example.com/{}.jpg'.format(slug),
+        "website": 'https://www.{}.com'.format(slug) if rng.random() < 0.6 else None,
+        "facebook_link": 'https://www.facebook.com/{}'.format(slug) if rng.random() < 0.8 else None,
+        "genres": ';'.join(GENRES[index] for index in genres.sample_distinct(rng, rng.randint(1, 4))),
+        "seeking_description": 'Looking for new music every week. Please call us.' if rng.random() < 0.2 else None
+    }
+
+
+def generate_venues(count, seed=0):
+    rng = entity_rng(seed, 'venues')
+    cities = city_pool(rng)
+    city_weights = ZipfSampler(len(cities))
+    genres = ZipfSampler(len(GENRES))
+    for number in range(1, count + 1):
+        row = generate_profile(rng, number, VENUE_WORDS, genres, cities, city_weights)
+        row["address"] = '{} {}'.format(rng.randrange(1, 3000), rng.choice(STREETS))
+        yield row
+
+
+def generate_artists(count, seed=0):
+    rng = entity_rng(seed, 'artists')
+    cities = city_pool(rng)
+    city_weights = ZipfSampler(len(cities))
+    genres = ZipfSampler(len(GENRES))
+    for number in range(1, count + 1):
+        yield generate_profile(rng, number, ARTIST_WORDS, genres, cities, city_weights)
+
+
+def generate_shows(count, venue_ids, artist_ids, seed=0, anchor=None):
+    # venue_ids and artist_ids are the ids to book, most popular first. Shows
+    # fill one hour slots, and a venue or an artist is never booked twice in
+    # the same slot: the draw is repeated until both are free.
+    if count > min(len(venue_ids), len(artist_ids)) * 2 * SHOWS_WINDOW_DAYS * len(SHOW_HOURS):
+        raise ValueError('Not enough venues and artists to book {} shows'.format(count))
+    rng = entity_rng(seed, 'shows')
+    anchor = anchor or utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    venues = ZipfSampler(len(venue_ids))
+    artists = ZipfSampler(len(artist_ids))
+    window = timedelta(days=SHOWS_WINDOW_DAYS)
+    booked = set()
+    for _ in range(count):
+        while True:
+            start_time = anchor - window + timedelta(days=rng.randrange(2 * SHOWS_WINDOW_DAYS),
+                                                     hours=rng.choice(SHOW_HOURS))
+            venue_id = venue_ids[venues.sample(rng)]
+            artist_id = artist_ids[artists.sample(rng)]
+            if ('venue', venue_id, start_time) not in booked and ('artist', artist_id, start_time) not in booked:
+                break
+        booked.add(('venue', venue_id, start_time))
+        booked.add(('artist', artist_id, start_time))
+        yield {
+            "venue_id": venue_id,
+            "artist_id": artist_id,
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + SHOW_LENGTH).isoformat()
+        }
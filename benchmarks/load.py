@@ -0,0 +1,21 @@
+from app import db, Venue, Artist
+from importer import CHUNK_SIZE, import_rows
+from benchmarks.generator import generate_venues, generate_artists, generate_shows
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic catalogue.
+# ----------------------------------------------------------------------------#
+
+def find_ids(model):
+    return [row[0] for row in db.session.query(model.id).order_by(model.id)]
+
+
+def populate(venues, artists, shows, seed=0, chunk_size=CHUNK_SIZE, report=print):
+    """Load a synthetic catalogue through the bulk importer."""
+    import_rows('venues', generate_venues(venues, seed), chunk_size, report)
+    import_rows('artists', generate_artists(artists, seed), chunk_size, report)
+    if shows:
+        venue_ids = find_ids(Venue)
+        artist_ids = find_ids(Artist)
+        import_rows('shows', generate_shows(shows, venue_ids, artist_ids, seed), chunk_size, report)
@@ -0,0 +1,93 @@
+import random
+import time
+
+from recommendations import BOOKING_WEIGHT, GENRE_WEIGHT, LOCATION_WEIGHT, SAME_STATE_SCORE, \
+    RecommendationModel
+
+# ----------------------------------------------------------------------------#
+# Recommendations benchmark.
+# ----------------------------------------------------------------------------#
+
+# Synthetic features, without the database: the time to compute the top k of
+# every venue and artist, against scoring the pairs one by one, and the time
+# to refresh the model after a few entities changed.
+
+GENRES = 19
+CITIES = 500
+STATES = 50
+
+
+def make_rows(count, rng, seeking=0.3):
+    rows = []
+    for item_id in range(1, count + 1):
+        city = rng.randrange(CITIES)
+        rows.append((item_id, city, city % STATES, rng.sample(range(GENRES), rng.randint(1, 3)),
+                     rng.random() < seeking))
+    return rows
+
+
+def make_model(venues, artists, bookings, seed=0, k=10):
+    rng = random.Random(seed)
+    model = RecommendationModel(k)
+    model.load_entities('venue', make_rows(venues, rng))
+    model.load_entities('artist', make_rows(artists, rng))
+    model.load_bookings([(rng.randint(1, venues), rng.randint(1, artists), rng.randint(1, 5))
+                         for _ in range(bookings)])
+    return model
+
+
+def score_pair(venue, artist, shows):
+    # Reference scoring of a single pair, in plain Python
+    _, venue_city, venue_state, venue_genres, _ = venue
+    _, artist_city, artist_state, artist_genres, _ = artist
+    union = len(set(venue_genres) | set(artist_genres))
+    score = GENRE_WEIGHT * len(set(venue_genres) & set(artist_genres)) / union if union else 0
+    if venue_city == artist_city:
+        score += LOCATION_WEIGHT
+    elif venue_state == artist_state:
+        score += LOCATION_WEIGHT * SAME_STATE_SCORE
+    return score + BOOKING_WEIGHT * shows / (shows + 1) if shows else score
+
+
+def time_pairs(venues, artists, sample=200, seed=0):
+    """Seconds to score every pair one by one, extrapolated from sample venues."""
+    rng = random.Random(seed)
+    venue_rows, artist_rows = make_rows(sample, rng), make_rows(artists, rng)
+    started = time.perf_counter()
+    for venue in venue_rows:
+        for artist in artist_rows:
+            score_pair(venue, artist, 0)
+    return (time.perf_counter() - started) * venues / sample
+
+
+def run(sizes=(1000, 5000, 20000), dirty=10, seed=0):
+    results = []
+    for size in sizes:
+        model = make_model(size, size, size * 5, seed)
+        started = time.perf_counter()
+        model.compute_all()
+        build = time.perf_counter() - started
+
+        rng = random.Random(seed)
+        rows = {side: set(rng.sample(range(size), dirty)) for side in ('venue', 'artist')}
+        for side, side_rows in rows.items():
+            entities = model.entities[side]
+            model.load_entities(side, [(int(entities.ids[row]), 0, 0, [0], True) for row in side_rows])
+        started = time.perf_counter()
+        model.refresh(rows)
+        refresh = time.perf_counter() - started
+
+        results.append({
+            "size": size,
+            "pairs": size * size,
+            "build_s": build,
+            "pairs_s": time_pairs(size, size, seed=seed),
+            "refresh_ms": refresh * 1000,
+        })
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{size:>6} x {size:<6} build {build_s:7.2f}s | one by one ~{pairs_s:8.1f}s | '
+              'refresh of 2x10 dirty {refresh_ms:7.1f}ms'.format(**result))
@@ -0,0 +1,100 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------------------------------------------------------------------#
+# Server benchmark.
+# ----------------------------------------------------------------------------#
+
+# Starts the app with the development server (`flask run`, as .flaskenv
+# configures it) and with gunicorn (gunicorn.conf.py, preloaded workers),
+# and measures for each the time until it answers, and the requests per
+# second it serves to concurrent clients. Both use the configured database.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = ('/', '/venues', '/artists', '/shows')
+
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def servers(port):
+    """(name, command, environment) of each server, listening on the port."""
+    return [
+        ('flask run', [sys.executable, '-m', 'flask', 'run', '--port', str(port)], {}),
+        ('gunicorn', [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+         {"BIND": '127.0.0.1:{}'.format(port)}),
+    ]
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        response.read()
+        return response.status
+
+
+def wait_until_up(url, process):
+    started = time.perf_counter()
+    while time.perf_counter() - started < STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            raise RuntimeError('The server exited with status {}'.format(process.returncode))
+        try:
+            fetch(url)
+            return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+    raise RuntimeError('The server did not answer within {}s'.format(STARTUP_TIMEOUT))
+
+
+def throughput(base_url, requests, concurrency):
+    urls = [base_url + PATHS[index % len(PATHS)] for index in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - started
+    if set(statuses) != {200}:
+        raise RuntimeError('Unexpected statuses: {}'.format(sorted(set(statuses))))
+    return requests / elapsed
+
+
+def run(requests=500, concurrency=16):
+    """Startup seconds and requests per second of each server."""
+    results = {}
+    port = free_port()
+    for name, command, environment in servers(port):
+        base_url = 'http://127.0.0.1:{}'.format(port)
+        process = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, **environment),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+        try:
+            startup = wait_until_up(base_url + '/', process)
+            # Warm up every page before measuring
+            for path in PATHS:
+                fetch(base_url + path)
+            results[name] = {
+                "startup_seconds": startup,
+                "requests_per_second": throughput(base_url, requests, concurrency),
+            }
+        finally:
+            # The reloader of the development server runs the app in a child process
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+    return results
+
+
+if __name__ == '__main__':
+    for name, result in run().items():
+        print('{:<10} startup {:6.2f}s  {:8.1f} req/s'.format(
+            name, result["startup_seconds"], result["requests_per_second"]))
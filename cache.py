@@ -0,0 +1,289 @@
+import functools
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, make_response, request, session
+
+from routing import served_by_replica
+
+try:
+    import redis
+except ImportError:  # only needed by the redis backend
+    redis = None
+
+
+# ----------------------------------------------------------------------------#
+# In-process caches.
+# ----------------------------------------------------------------------------#
+
+class LRUCache:
+    """Thread safe mapping bounded to maxsize entries, evicting the least recently used."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# ----------------------------------------------------------------------------#
+# Cache backends.
+# ----------------------------------------------------------------------------#
+
+class MemoryBackend:
+    """Per process backend, bounded by an LRU. Entries expire after timeout seconds, as in redis."""
+
+    def __init__(self, maxsize=512, timeout=None, counters_maxsize=None):
+        self.cache = LRUCache(maxsize)
+        self.timeout = timeout
+        # Counters are bounded by an LRU as well, several entries per counter by
+        # default. Forgetting a counter must not resurrect the entries it
+        # invalidated: the counters that are missing start from a floor above
+        # every evicted value, so that they never go back to one of their values.
+        self.counters = OrderedDict()
+        self.counters_maxsize = counters_maxsize or maxsize * 4
+        self.floor = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            self.cache.invalidate(key)
+            return None
+        return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout else None
+        self.cache.set(key, (value, expires))
+
+    def delete(self, key):
+        self.cache.invalidate(key)
+
+    def incr(self, key):
+        with self.lock:
+            value = self.counters[key] = self.counters.pop(key, self.floor) + 1
+            while len(self.counters) > self.counters_maxsize:
+                _, evicted = self.counters.popitem(last=False)
+                self.floor = max(self.floor, evicted + 1)
+            return value
+
+    def get_counter(self, key):
+        with self.lock:
+            if key not in self.counters:
+                return self.floor
+            self.counters.move_to_end(key)
+            return self.counters[key]
+
+    def get_counters(self, keys):
+        return [self.get_counter(key) for key in keys]
+
+
+class RedisBackend:
+    """Backend shared by all the workers, on top of a redis-py compatible client."""
+
+    def __init__(self, client, prefix='fyyur:', timeout=None):
+        self.client = client
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def get_many(self, keys):
+        # One round trip for all the keys
+        values = self.client.mget([self.prefix + key for key in keys]) if keys else []
+        return [pickle.loads(value) if value is not None else None for value in values]
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.timeout)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        # Counters are stored as plain integers, which redis increments atomically
+        return self.client.incr(self.prefix + key)
+
+    def get_counter(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def get_counters(self, keys):
+        values = self.client.mget([self.prefix + key for key in keys]) if keys else []
+        return [int(value) if value is not None else 0 for value in values]
+
+
+def create_backend(config, prefix, maxsize=None):
+    backend = config.get('CACHE_BACKEND', 'memory')
+    if backend == 'redis':
+        if redis is None:
+            raise RuntimeError('The redis cache backend requires the redis package')
+        client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        return RedisBackend(client, prefix='fyyur:{}:'.format(prefix), timeout=config.get('CACHE_TIMEOUT'))
+    return MemoryBackend(maxsize or config.get('CACHE_SIZE', 512), timeout=config.get('CACHE_TIMEOUT'))
+
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+# ----------------------------------------------------------------------------#
+
+# A request reading from a replica may not see a write that was just
+# invalidated: stored under the new generation, what it rendered would be
+# served for CACHE_TIMEOUT. Such reads are not stored while a replica may
+# still lag behind the last invalidation.
+
+INVALIDATED_AT_KEY = 'invalidated_at'
+
+
+def mark_invalidated(backend):
+    backend.set(INVALIDATED_AT_KEY, time.time())
+
+
+def may_store(backend):
+    """Whether what the current request read can be cached in backend."""
+    if not served_by_replica():
+        return True
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', 0)
+    if not max_lag:
+        # The lag of the replicas is not bounded
+        return False
+    # A replica may fall behind between two measures of its lag
+    window = max_lag + current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', 0)
+    invalidated_at = backend.get(INVALIDATED_AT_KEY)
+    return invalidated_at is None or time.time() - invalidated_at > window
+
+
+# ----------------------------------------------------------------------------#
+# Response cache.
+# ----------------------------------------------------------------------------#
+
+class ResponseCache:
+    """Cache of whole GET responses, keyed by endpoint, view arguments and query string.
+
+    Every entry belongs to the namespace of its endpoint and to the namespace of
+    its endpoint and view arguments. Each namespace has a generation counter that
+    is part of the entry keys: bumping it invalidates all the entries at once.
+    """
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.backend is None:
+            self.backend = create_backend(app.config, 'response')
+
+    @staticmethod
+    def namespace(endpoint, view_args):
+        args = ','.join('{}={}'.format(name, view_args[name]) for name in sorted(view_args))
+        return '{}({})'.format(endpoint, args)
+
+    def make_key(self, endpoint, view_args, query_string):
+        namespace = self.namespace(endpoint, view_args)
+        # Both generations in one round trip
+        endpoint_generation, namespace_generation = self.backend.get_counters(
+            ['generation:' + self.namespace(endpoint, {}), 'generation:' + namespace])
+        return 'response:{}:{}:{}:{}?{}'.format(
+            endpoint,
+            endpoint_generation,
+            namespace,
+            namespace_generation if view_args else 0,
+            query_string.decode('utf-8')
+        )
+
+    def invalidate(self, endpoint, **view_args):
+        """Drop the entries of an endpoint, or only those for the given view arguments."""
+        self.backend.incr('generation:' + self.namespace(endpoint, view_args))
+        mark_invalidated(self.backend)
+
+    def bypassed(self):
+        # Pages carrying flashed messages are specific to one visitor
+        return not current_app.config.get('RESPONSE_CACHE_ENABLED', True) \
+            or request.method != 'GET' or bool(session.get('_flashes'))
+
+    def lookup(self, view_args):
+        """(key, entry) of the current request, entry being None on a miss."""
+        key = self.make_key(request.endpoint, view_args, request.query_string)
+        return key, self.backend.get(key)
+
+    def store(self, key, response):
+        """Cache a rendered response, returning its entry (None for errors and stale reads)."""
+        if response.status_code != 200 or not may_store(self.backend):
+            return None
+        body = response.get_data()
+        entry = {
+            "body": body,
+            "mimetype": response.mimetype,
+            "etag": hashlib.md5(body).hexdigest()
+        }
+        self.backend.set(key, entry)
+        return entry
+
+    @staticmethod
+    def respond(entry):
+        response = Response(entry["body"], mimetype=entry["mimetype"])
+        response.set_etag(entry["etag"])
+        return response.make_conditional(request)
+
+    def cached(self, view):
+        @functools.wraps(view)
+        def wrapper(**view_args):
+            if self.bypassed():
+                return view(**view_args)
+
+            key, entry = self.lookup(view_args)
+            if entry is None:
+                response = make_response(view(**view_args))
+                entry = self.store(key, response)
+                if entry is None:
+                    return response
+            return self.respond(entry)
+
+        return wrapper
@@ -5,21 +5,116 @@ from dotenv import load_dotenv
 # Load env variables
 load_dotenv()
 
-SECRET_KEY = os.urandom(32)
+# Shared by the workers, so that the session cookie of a worker is valid on the others
+SECRET_KEY = environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode, unless the environment turns it off (as gunicorn.conf.py does)
+DEBUG = environ.get('DEBUG', 'true').lower() in ('1', 'true', 'yes')
 
 # Connect to the database
 
 SQL_USER = environ.get('SQL_USER')
 SQL_PASSWORD = environ.get('SQL_PASSWORD')
 SQL_DATABASE = environ.get('SQL_DATABASE')
+SQL_HOST = environ.get('SQL_HOST', 'localhost')
+SQL_PORT = environ.get('SQL_PORT', '5432')
 
 # COMPLETED IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://' \
+SQLALCHEMY_DATABASE_URI = environ.get('DATABASE_URL') or \
+                          'postgresql://' \
                           '{user}:{password}@' \
-                          'localhost:5432/' \
-                          '{database}'.format(user=SQL_USER, password=SQL_PASSWORD, database=SQL_DATABASE)
+                          '{host}:{port}/' \
+                          '{database}'.format(user=SQL_USER, password=SQL_PASSWORD,
+                                              host=SQL_HOST, port=SQL_PORT, database=SQL_DATABASE)
+
+# Connection pool, per process (PostgreSQL only)
+DB_POOL_SIZE = int(environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(environ.get('DB_MAX_OVERFLOW', 10))
+# Seconds to wait for a connection before giving up
+DB_POOL_TIMEOUT = int(environ.get('DB_POOL_TIMEOUT', 30))
+# Seconds after which a connection is replaced, below the server and proxies idle timeouts
+DB_POOL_RECYCLE = int(environ.get('DB_POOL_RECYCLE', 1800))
+# Test connections on checkout, to drop the ones closed by the server
+DB_POOL_PRE_PING = environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+# Milliseconds before the server cancels a statement, 0 for no limit
+DB_STATEMENT_TIMEOUT = int(environ.get('DB_STATEMENT_TIMEOUT', 30000))
+
+# Read replicas (comma separated URLs) serving the reads of GET requests
+SQLALCHEMY_REPLICA_URIS = [uri for uri in environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+# Seconds a client that wrote keeps reading from the primary, to see its own writes
+REPLICA_READ_AFTER_WRITE_SECONDS = int(environ.get('REPLICA_READ_AFTER_WRITE_SECONDS', 5))
+# Replicas lagging by more seconds are skipped, 0 to never check. For that long after
+# an invalidation, what is read from a replica is not cached (never with 0)
+REPLICA_MAX_LAG_SECONDS = int(environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+# /_ready fails once this share of the pool connections is in use
+READY_MAX_POOL_SATURATION = float(environ.get('READY_MAX_POOL_SATURATION', 0.9))
+
+
+# Listing pages
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Search pages
+SEARCH_RESULTS_LIMIT = 50
+
+# Length of the shows created without an end time
+SHOW_DURATION_MINUTES = 120
+# Longest show accepted, which also bounds the range scans of the availability queries
+SHOW_MAX_DURATION_HOURS = 24
+
+# Shows accepted by one POST /shows/batch
+SHOW_BATCH_MAX_SIZE = 1000
+
+# Range of the availability queries, by default and at most
+AVAILABILITY_DAYS = 30
+AVAILABILITY_MAX_DAYS = 366
+
+# Range of the show calendar, by default and at most
+CALENDAR_DAYS = 30
+CALENDAR_MAX_DAYS = 366
+# Cached counts of closed calendar buckets
+CALENDAR_CACHE_SIZE = 4096
+
+# Recommendations kept for each venue and artist
+RECOMMENDATIONS_K = 10
+# Changes replayed on the recommendations before building them again
+RECOMMENDATIONS_MAX_CHANGES = 1000
+RECOMMENDATIONS_LOG_SIZE = 2048
+
+# Rows fetched per round trip by the exports
+EXPORT_BATCH_SIZE = 1000
+
+# Formatted dates memoized by the datetime template filter, 0 to disable
+DATETIME_FORMAT_CACHE_SIZE = 4096
+
+# Entries of each Genre, State and City id cache
+REFERENCE_CACHE_SIZE = 1024
+
+# Caches shared by the workers: 'memory' (per process) or 'redis'. Invalidations
+# only reach every gunicorn worker with redis: the memory backend runs one worker.
+CACHE_BACKEND = environ.get('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_SIZE = 512
+CACHE_TIMEOUT = 3600
+RESPONSE_CACHE_ENABLED = True
+# Rendered list items of the listing pages
+FRAGMENT_CACHE_ENABLED = True
+FRAGMENT_CACHE_SIZE = 10000
+
+# Request profiling: Server-Timing headers and /_metrics
+PROFILING_ENABLED = True
+# The metrics show SQL text: /_metrics answers 404 unless a token is set, and
+# scrapers send it as 'Authorization: Bearer <token>'
+METRICS_TOKEN = environ.get('METRICS_TOKEN')
+PROFILING_SLOW_QUERIES = 5
+PROFILING_IGNORED_ENDPOINTS = ('metrics', 'ready', 'static')
+
+# N+1 detection: a request running the same SELECT NPLUSONE_THRESHOLD times
+# is logged, or fails when NPLUSONE_RAISE is set (as in the tests)
+NPLUSONE_ENABLED = DEBUG
+NPLUSONE_RAISE = False
+NPLUSONE_THRESHOLD = 3
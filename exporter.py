@@ -0,0 +1,63 @@
+import csv
+import json
+from datetime import datetime
+
+# ----------------------------------------------------------------------------#
+# Bulk export.
+# ----------------------------------------------------------------------------#
+
+# Rows are serialized one at a time by generators, so an export can be
+# written to a file or streamed as a response whatever the table size.
+# The columns are the ones read by the importer: an export can be loaded back.
+
+# Genres of a venue or an artist are joined in a single column
+GENRES_SEPARATOR = ';'
+
+FIELDS = {
+    'venues': ['id', 'name', 'address', 'city', 'state', 'phone', 'image_link',
+               'website', 'facebook_link', 'genres', 'seeking_description'],
+    'artists': ['id', 'name', 'city', 'state', 'phone', 'image_link',
+                'website', 'facebook_link', 'genres', 'seeking_description'],
+    'shows': ['id', 'venue_id', 'artist_id', 'start_time', 'end_time'],
+}
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def serialize_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class LineBuffer:
+    """File-like target for csv.writer that hands back the last written line."""
+
+    def write(self, line):
+        return line
+
+
+def to_csv(rows, fields):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([serialize_value(row[field]) for field in fields])
+
+
+def to_jsonl(rows, fields):
+    for row in rows:
+        yield json.dumps({field: serialize_value(row[field]) for field in fields}) + '\n'
+
+
+serializers = {
+    'jsonl': to_jsonl,
+    'csv': to_csv,
+}
+
+
+def serialize(rows, entity, fmt):
+    """Yield the lines of rows (mappings) in the given format."""
+    return serializers[fmt](rows, FIELDS[entity])
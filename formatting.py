@@ -0,0 +1,85 @@
+import functools
+from datetime import datetime, timezone
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import LC_TIME, format_datetime, parse_pattern
+
+from cache import LRUCache
+
+# ----------------------------------------------------------------------------#
+# Datetime parsing.
+# ----------------------------------------------------------------------------#
+
+def parse_datetime(value):
+    """Naive datetime of an ISO 8601 string.
+
+    The database stores naive datetimes, taken to be in UTC: a value with an
+    offset is converted to UTC, so that it compares with them.
+    """
+    value = dateutil.parser.isoparse(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def utcnow():
+    """Naive current time in UTC, to compare with the times of the database."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ----------------------------------------------------------------------------#
+# Datetime formatting.
+# ----------------------------------------------------------------------------#
+
+# Named formats of the `datetime` template filter
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern):
+    return parse_pattern(pattern)
+
+
+@functools.lru_cache(maxsize=None)
+def find_locale(identifier):
+    return Locale.parse(identifier)
+
+
+class DatetimeFormatter:
+    """babel.dates.format_datetime with compiled patterns and locales kept across calls.
+
+    Accepts datetimes as well as strings. With cache_size, the formatted strings
+    are also memoized in an LRU cache, as listing pages repeat the same dates.
+    """
+
+    def __init__(self, formats=DATETIME_FORMATS, locale=None, cache_size=0):
+        self.formats = formats
+        self.locale = find_locale(locale or LC_TIME)
+        self.cache = LRUCache(cache_size) if cache_size else None
+
+    def __call__(self, value, format='medium'):
+        if isinstance(value, str):
+            value = dateutil.parser.parse(value)
+        if self.cache is None:
+            return self.format(value, format)
+
+        key = (value, format)
+        formatted = self.cache.get(key)
+        if formatted is None:
+            formatted = self.format(value, format)
+            self.cache.set(key, formatted)
+        return formatted
+
+    def format(self, value, format):
+        if value.tzinfo is None:
+            # As babel does: naive datetimes are taken as they are, in UTC
+            value = value.replace(tzinfo=timezone.utc)
+        pattern = self.formats.get(format, format)
+        if pattern in ('full', 'long', 'medium', 'short'):
+            # Formats of the locale, left to babel
+            return format_datetime(value, pattern, locale=self.locale)
+        return compile_pattern(pattern).apply(value, self.locale)
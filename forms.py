@@ -1,8 +1,9 @@
-from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
 from wtforms.validators import DataRequired, AnyOf, URL
 
+from formatting import utcnow
+
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id'
@@ -13,7 +14,11 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        default=utcnow
+    )
+    # Optional: shows last SHOW_DURATION_MINUTES by default
+    end_time = DateTimeField(
+        'end_time'
     )
 
 class VenueForm(Form):
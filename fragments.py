@@ -0,0 +1,116 @@
+from flask import current_app, g, has_app_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import create_backend, mark_invalidated, may_store
+
+# ----------------------------------------------------------------------------#
+# Fragment cache.
+# ----------------------------------------------------------------------------#
+
+# {% cache 'venue', venue.id %}...{% endcache %} renders its body once per
+# version of the venue. The tag takes one or more (kind, id) pairs: a show
+# card depending on its artist and its venue is cached with
+# {% cache 'show', show.id, 'artist', show.artist_id, 'venue', show.venue_id %}.
+# Controllers bump the version of the entities they change, which retires
+# every fragment that depends on them. Listings announce the keys of their
+# page with prefetch(), so that its fragments are read in two round trips.
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            keys.append(parser.parse_expression())
+        if len(keys) % 2:
+            parser.fail('cache takes (kind, id) pairs', lineno)
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        # Fragments are told apart by their place in the templates
+        fragment = nodes.Const('{}:{}'.format(parser.name, lineno))
+        call = self.call_method('_render', [fragment, nodes.List(keys)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, fragment, keys, caller):
+        fragment_cache = self.environment.fragment_cache
+        if fragment_cache is None:
+            return caller()
+        return fragment_cache.render(fragment, keys, caller)
+
+
+class FragmentCache:
+    """Rendered template fragments, keyed by the versions of the entities they show."""
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.backend is None:
+            self.backend = create_backend(app.config, 'fragments', app.config.get('FRAGMENT_CACHE_SIZE'))
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+    @staticmethod
+    def version_key(kind, item_id):
+        return 'version:{}:{}'.format(kind, item_id)
+
+    def bump(self, kind, item_id):
+        """Retire the fragments showing the given entity."""
+        self.backend.incr(self.version_key(kind, item_id))
+        mark_invalidated(self.backend)
+        if has_app_context():
+            g.pop('fragments', None)
+
+    @staticmethod
+    def pairs(keys):
+        return list(zip(keys[::2], keys[1::2]))
+
+    def make_keys(self, fragment, keys_list):
+        # Entry keys stamped with the versions of the entities, read in one round trip
+        pairs = list({pair for keys in keys_list for pair in self.pairs(keys)})
+        versions = dict(zip(pairs, self.backend.get_counters([self.version_key(*pair) for pair in pairs])))
+        return ['fragment:{}:{}'.format(fragment, ';'.join(
+            '{}={}@{}'.format(kind, item_id, versions[(kind, item_id)]) for kind, item_id in self.pairs(keys)
+        )) for keys in keys_list]
+
+    def prefetch(self, keys_list):
+        """Announce the (kind, id, ...) keys of the fragments of the page about to be rendered.
+
+        The first cache tag of the page then fetches the versions and the
+        fragments of the whole page, in two round trips instead of two per fragment.
+        """
+        g.fragment_keys = [tuple(keys) for keys in keys_list]
+        g.pop('fragments', None)
+
+    def load(self, fragment, keys):
+        # (key, html or None) of a fragment. The fragments of an announced page
+        # are kept in g until they are rendered.
+        prefetched = g.setdefault('fragments', {})
+        entry = prefetched.pop((fragment, tuple(keys)), None)
+        if entry is not None:
+            return entry
+        keys_list = [tuple(keys)] + [other for other in g.pop('fragment_keys', []) if other != tuple(keys)]
+        entry_keys = self.make_keys(fragment, keys_list)
+        entries = list(zip(entry_keys, self.backend.get_many(entry_keys)))
+        prefetched.update(((fragment, other), entry) for other, entry in zip(keys_list[1:], entries[1:]))
+        return entries[0]
+
+    def render(self, fragment, keys, caller):
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+        key, html = self.load(fragment, keys)
+        if html is None:
+            html = str(caller())
+            if may_store(self.backend):
+                self.backend.set(key, html)
+        return Markup(html)
@@ -0,0 +1,46 @@
+import multiprocessing
+from os import environ
+
+# ----------------------------------------------------------------------------#
+# Gunicorn settings: `gunicorn -c gunicorn.conf.py wsgi:application`.
+# ----------------------------------------------------------------------------#
+
+# Production mode unless DEBUG is set, before config.py is imported by preload
+environ.setdefault('DEBUG', 'false')
+
+bind = environ.get('BIND') or '0.0.0.0:{}'.format(environ.get('PORT') or 8000)
+
+# Each worker has its own connection pool: workers * (DB_POOL_SIZE +
+# DB_MAX_OVERFLOW) has to stay below the server max_connections, and threads
+# above DB_POOL_SIZE + DB_MAX_OVERFLOW would only wait for a connection.
+# The caches (pages, fragments, calendar, recommendation changes) are only
+# invalidated in the worker handling a write unless they live in redis: the
+# memory backend runs a single worker.
+cache_backend = environ.get('CACHE_BACKEND', 'memory')
+workers = int(environ.get('WEB_CONCURRENCY') or
+              (1 if cache_backend == 'memory' else multiprocessing.cpu_count() * 2 + 1))
+if workers > 1 and cache_backend == 'memory':
+    raise RuntimeError('{} workers would each keep their own caches: '
+                       'set CACHE_BACKEND=redis or WEB_CONCURRENCY=1'.format(workers))
+threads = int(environ.get('WEB_THREADS') or 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(environ.get('WEB_TIMEOUT') or 30)
+keepalive = 5
+
+# Import the app once in the master, so that the workers share its memory
+# and start without importing anything
+preload_app = True
+
+# Restart workers after a number of requests, 0 to never restart them
+max_requests = int(environ.get('WEB_MAX_REQUESTS') or 0)
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    # The pools were copied from the master: sharing their sockets between
+    # processes would mix up the conversations with the database
+    from wsgi import dispose_engines, warm_up
+    dispose_engines()
+    warm_up()
@@ -0,0 +1,290 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from sqlalchemy import func, text
+
+from exporter import GENRES_SEPARATOR
+from app import db, response_cache, calendar_cache, insert_ignoring_conflicts, refresh_show_counters, \
+    parse_show_row, find_show_conflicts, venue_search, artist_search, recommender, \
+    Venue, Artist, Show, Genre, State, City, Address, Talent_Seeking, Venue_Seeking, \
+    venue_genres, artist_genres
+
+# ----------------------------------------------------------------------------#
+# Bulk import.
+# ----------------------------------------------------------------------------#
+
+# Rows are streamed from the file and loaded chunk by chunk: the reference
+# data of a whole chunk is resolved with one query per table, and the rows
+# are inserted with executemany (batched into multi-row VALUES by psycopg2).
+
+CHUNK_SIZE = 5000
+
+
+def read_rows(path):
+    """Yield the rows of a CSV or JSON lines file as dicts."""
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(file):
+                yield row
+        elif path.endswith('.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError('Unsupported file type: {}'.format(path))
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_genres(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(GENRES_SEPARATOR)
+    return [genre.strip() for genre in value if genre.strip()]
+
+
+def parse_id(value):
+    return int(value) if value not in (None, '') else None
+
+
+# ----------------------------------------------------------------------------#
+# Reference data.
+# ----------------------------------------------------------------------------#
+
+def resolve_names(model, names, **columns):
+    """Map each name to the id of its row, inserting the missing rows in one statement."""
+    names = set(names)
+    if not names:
+        return {}
+    table = model.__table__
+
+    def select_ids():
+        query = db.session.query(table.c.id, table.c.name).filter(table.c.name.in_(names))
+        for column, value in columns.items():
+            query = query.filter(table.c[column] == value)
+        return {row.name: row.id for row in query}
+
+    ids = select_ids()
+    missing = names - set(ids)
+    if missing:
+        index_elements = ['name'] + sorted(columns)
+        db.session.execute(insert_ignoring_conflicts(table, index_elements),
+                           [dict(columns, name=name) for name in missing])
+        ids = select_ids()
+    return ids
+
+
+def resolve_grouped_names(model, parent_column, names_by_parent):
+    """resolve_names for names scoped by a parent id, e.g. cities by state id."""
+    ids = {}
+    for parent_id, names in names_by_parent.items():
+        for name, row_id in resolve_names(model, names, **{parent_column: parent_id}).items():
+            ids[(name, parent_id)] = row_id
+    return ids
+
+
+def resolve_cities(rows):
+    state_ids = resolve_names(State, {row['state'] for row in rows})
+    cities_by_state = {}
+    for row in rows:
+        cities_by_state.setdefault(state_ids[row['state']], set()).add(row['city'])
+    city_ids = resolve_grouped_names(City, 'state_id', cities_by_state)
+    return {(row['city'], row['state']): city_ids[(row['city'], state_ids[row['state']])]
+            for row in rows}
+
+
+def resolve_addresses(rows, city_ids):
+    addresses_by_city = {}
+    for row in rows:
+        addresses_by_city.setdefault(city_ids[(row['city'], row['state'])], set()).add(row['address'])
+    return resolve_grouped_names(Address, 'city_id', addresses_by_city)
+
+
+def allocate_ids(table, count, reserved_ids=()):
+    # Ids for rows inserted without one, reserved up front so that the
+    # association rows can be inserted with executemany as well. Files are
+    # expected to give ids to all their rows or to none of them.
+    if db.engine.dialect.name == 'postgresql':
+        rows = db.session.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+            {"table": '"{}"'.format(table.name), "count": count}
+        )
+        return [row[0] for row in rows]
+    start = max(db.session.query(func.coalesce(func.max(table.c.id), 0)).scalar(),
+                max(reserved_ids, default=0)) + 1
+    return list(range(start, start + count))
+
+
+def assign_ids(table, rows):
+    missing = [row for row in rows if row['id'] is None]
+    if missing:
+        reserved_ids = [row['id'] for row in rows if row['id'] is not None]
+        for row, row_id in zip(missing, allocate_ids(table, len(missing), reserved_ids)):
+            row['id'] = row_id
+
+
+def sync_id_sequence(table):
+    # Rows imported with their own ids do not advance the PostgreSQL sequence
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, 'id'), max(id)) FROM \"{}\"".format(table.name)),
+            {"table": '"{}"'.format(table.name)}
+        )
+
+
+# ----------------------------------------------------------------------------#
+# Entities.
+# ----------------------------------------------------------------------------#
+
+def insert_genres(association, owner_column, owner_ids, rows):
+    genres = [set(parse_genres(row.get('genres'))) for row in rows]
+    genre_ids = resolve_names(Genre, set().union(*genres))
+    values = [{owner_column: owner_id, "genre_id": genre_ids[genre]}
+              for owner_id, owner_genres in zip(owner_ids, genres) for genre in owner_genres]
+    if values:
+        db.session.execute(association.insert(), values)
+
+
+def insert_seeking(model, owner_column, owner_ids, rows):
+    values = [{owner_column: owner_id, "description": row['seeking_description']}
+              for owner_id, row in zip(owner_ids, rows) if row.get('seeking_description')]
+    if values:
+        db.session.execute(model.__table__.insert(), values)
+
+
+def entity_values(row):
+    return {
+        "id": parse_id(row.get('id')),
+        "name": row['name'] or '',
+        "phone": row.get('phone') or None,
+        "image_link": row.get('image_link') or None,
+        "website": row.get('website') or None,
+        "facebook_link": row.get('facebook_link') or None
+    }
+
+
+def import_venues(rows, first_row):
+    city_ids = resolve_cities(rows)
+    address_ids = resolve_addresses(rows, city_ids)
+    values = []
+    for row in rows:
+        value = entity_values(row)
+        city_id = city_ids[(row['city'], row['state'])]
+        value["address_id"] = address_ids[(row['address'], city_id)]
+        values.append(value)
+    assign_ids(Venue.__table__, values)
+    db.session.execute(Venue.__table__.insert(), values)
+
+    venue_ids = [value['id'] for value in values]
+    insert_genres(venue_genres, 'venue_id', venue_ids, rows)
+    insert_seeking(Talent_Seeking, 'venue_id', venue_ids, rows)
+    return []
+
+
+def import_artists(rows, first_row):
+    city_ids = resolve_cities(rows)
+    values = []
+    for row in rows:
+        value = entity_values(row)
+        value["city_id"] = city_ids[(row['city'], row['state'])]
+        values.append(value)
+    assign_ids(Artist.__table__, values)
+    db.session.execute(Artist.__table__.insert(), values)
+
+    artist_ids = [value['id'] for value in values]
+    insert_genres(artist_genres, 'artist_id', artist_ids, rows)
+    insert_seeking(Venue_Seeking, 'artist_id', artist_ids, rows)
+    return []
+
+
+def import_shows(rows, first_row):
+    # Checked as the shows created by the controllers: the overlap checks
+    # rely on their bounded length. Exports carry the end time; other files
+    # get the default length. Shows booking a venue or an artist already
+    # booked, in the database or earlier in the file, are skipped.
+    shows = {}
+    rejected = []
+    for number, row in enumerate(rows, first_row):
+        try:
+            show = parse_show_row(row)
+        except ValueError as error:
+            rejected.append((number, str(error)))
+            continue
+        show["id"] = parse_id(row.get('id'))
+        shows[number] = show
+    if shows:
+        for number, errors in find_show_conflicts(shows).items():
+            rejected.append((number, ' '.join(errors)))
+            del shows[number]
+    if not shows:
+        return sorted(rejected)
+    values = list(shows.values())
+
+    assign_ids(Show.__table__, values)
+    db.session.execute(Show.__table__.insert(), values)
+
+    refresh_show_counters(Venue, {value['venue_id'] for value in values})
+    refresh_show_counters(Artist, {value['artist_id'] for value in values})
+    return sorted(rejected)
+
+
+importers = {
+    'venues': (Venue, import_venues),
+    'artists': (Artist, import_artists),
+    'shows': (Show, import_shows),
+}
+
+# In-process name indexes missing the imported rows
+stale_searches = {
+    'venues': [venue_search],
+    'artists': [artist_search],
+    'shows': [],
+}
+
+# Cached pages listing the imported rows
+invalidated_endpoints = {
+    'venues': ['venues'],
+    'artists': ['artists'],
+    'shows': ['shows', 'show_venue', 'show_artist'],
+}
+
+
+def import_rows(entity, rows, chunk_size=CHUNK_SIZE, report=print):
+    """Load an iterable of row dicts, committing every chunk. Returns the number of rows loaded.
+
+    Invalid rows are skipped and reported: the importers take a chunk and the
+    number of its first row, and return the (number, error) of the rows skipped.
+    """
+    model, import_chunk = importers[entity]
+    started = time.time()
+    count = 0
+    for offset, chunk in enumerate(chunks(rows, chunk_size)):
+        rejected = import_chunk(chunk, offset * chunk_size + 1)
+        db.session.commit()
+        for number, error in rejected:
+            report('Skipped row {}: {}'.format(number, error))
+        count += len(chunk) - len(rejected)
+        elapsed = time.time() - started
+        report('{} {}: {:.0f} rows/s'.format(count, entity, count / elapsed if elapsed else 0))
+
+    sync_id_sequence(model.__table__)
+    db.session.commit()
+    for endpoint in invalidated_endpoints[entity]:
+        response_cache.invalidate(endpoint)
+    for search in stale_searches[entity]:
+        search.clear()
+    if entity == 'shows':
+        # Imported shows may fall in closed calendar buckets
+        calendar_cache.invalidate()
+    recommender.clear()
+    return count
@@ -1,14 +1,104 @@
-from flask_script import Manager
+from datetime import timedelta
+
+from flask_script import Manager, Command, Option
 
 from app import *
+from exporter import FORMATS, FIELDS, serialize
+from importer import CHUNK_SIZE, import_rows, read_rows
 
 manager = Manager(app)
 
 
+class ImportCommand(Command):
+    """Bulk load venues, artists or shows from a CSV or JSON lines file"""
+
+    option_list = (
+        Option('entity', choices=['venues', 'artists', 'shows']),
+        Option('path'),
+        Option('-c', '--chunk-size', dest='chunk_size', type=int, default=CHUNK_SIZE),
+    )
+
+    def run(self, entity, path, chunk_size):
+        started = datetime.now()
+        count = import_rows(entity, read_rows(path), chunk_size)
+        elapsed = (datetime.now() - started).total_seconds()
+        print('Imported {} {} in {:.1f}s'.format(count, entity, elapsed))
+
+
+manager.add_command('import', ImportCommand())
+
+
+class ExportCommand(Command):
+    """Stream venues, artists or shows to a CSV or JSON lines file"""
+
+    option_list = (
+        Option('entity', choices=sorted(FIELDS)),
+        Option('path'),
+        Option('-f', '--format', dest='fmt', choices=sorted(FORMATS), default=None),
+    )
+
+    def run(self, entity, path, fmt):
+        fmt = fmt or path.rsplit('.', 1)[-1]
+        if fmt not in FORMATS:
+            raise ValueError('Unsupported file type: {}'.format(path))
+        with open(path, 'w', newline='') as file:
+            file.writelines(serialize(iter_export_rows(entity), entity, fmt))
+
+
+manager.add_command('export', ExportCommand())
+
+
 @manager.command
 def seed():
     add_venues_seed()
+    db.session.flush()
+    refresh_show_counters(Venue)
+    refresh_show_counters(Artist)
+    db.session.commit()
+
+
+@manager.command
+def rollover_shows(window_hours=24):
+    """Move shows started in the last window_hours from upcoming to past counters"""
+    since = utcnow() - timedelta(hours=int(window_hours))
+    venues_count, artists_count = rollover_show_counters(since)
     db.session.commit()
+    print('Refreshed show counters of {} venues and {} artists'.format(venues_count, artists_count))
+
+
+@manager.command
+def refresh_shows():
+    """Recount the upcoming and past shows of every venue and artist"""
+    refresh_show_counters(Venue)
+    refresh_show_counters(Artist)
+    db.session.commit()
+
+
+@manager.option('--venues', dest='venues', type=int, default=10000)
+@manager.option('--artists', dest='artists', type=int, default=10000)
+@manager.option('--shows', dest='shows', type=int, default=100000)
+@manager.option('--seed', dest='seed', type=int, default=0)
+def generate(venues, artists, shows, seed):
+    """Load a deterministic synthetic catalogue through the bulk importer"""
+    from benchmarks.load import populate
+    populate(venues, artists, shows, seed)
+
+
+@manager.option('-n', '--requests', dest='requests', type=int, default=100)
+@manager.option('-o', '--output', dest='output', default='benchmark.json')
+@manager.option('-b', '--baseline', dest='baseline', default=None)
+@manager.option('--cache', dest='cache', action='store_true', default=False)
+def benchmark(requests, output, baseline, cache):
+    """Time every controller and write p50/p95/p99, queries and peak memory to a JSON file"""
+    from benchmarks import controllers
+    report = controllers.run(requests, cache=cache)
+    controllers.write_report(report, output)
+    for name, result in report["results"].items():
+        print('{:<26} p50 {p50_ms:>8.2f}ms  p95 {p95_ms:>8.2f}ms  p99 {p99_ms:>8.2f}ms  '
+              'queries {queries_max:>3}  memory {peak_memory_kb:>8.1f}KB'.format(name, **result))
+    if baseline:
+        for line in controllers.compare(report, controllers.read_report(baseline)):
+            print(line)
 
 
 def add_venues_seed():
@@ -41,19 +131,19 @@ def add_venues_seed():
     genres_list3 = [genre8, genre1, genre4, genre5]
 
     show1 = Show(
-        start_time=dateutil.parser.isoparse("2019-05-21T21:30:00.000Z")
+        start_time=parse_datetime("2019-05-21T21:30:00.000Z")
     )
     show2 = Show(
-        start_time=dateutil.parser.isoparse("2019-06-15T23:00:00.000Z")
+        start_time=parse_datetime("2019-06-15T23:00:00.000Z")
     )
     show3 = Show(
-        start_time=dateutil.parser.isoparse("2035-04-01T20:00:00.000Z")
+        start_time=parse_datetime("2035-04-01T20:00:00.000Z")
     )
     show4 = Show(
-        start_time=dateutil.parser.isoparse("2035-04-01T20:00:00.000Z")
+        start_time=parse_datetime("2035-04-01T20:00:00.000Z")
     )
     show5 = Show(
-        start_time=dateutil.parser.isoparse("2035-04-15T20:00:00.000Z")
+        start_time=parse_datetime("2035-04-15T20:00:00.000Z")
     )
 
     seeking_talent1 = Talent_Seeking(
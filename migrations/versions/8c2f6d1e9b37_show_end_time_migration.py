@@ -0,0 +1,56 @@
+"""show end time migration.
+
+Revision ID: 8c2f6d1e9b37
+Revises: 5b7e3d19f0a4
+Create Date: 2026-10-18 16:22:40.531982
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2f6d1e9b37'
+down_revision = '5b7e3d19f0a4'
+branch_labels = None
+depends_on = None
+
+# Existing shows last the default two hours (SHOW_DURATION_MINUTES), cut
+# short by the next show of their venue or of their artist, so that the
+# constraints hold. Shows double booked at the very same time end as they
+# start: empty ranges overlap nothing.
+BACKFILL_END_TIMES = '''
+UPDATE "Show" SET end_time = LEAST(bounds.start_time + interval '120 minutes',
+                                   bounds.next_venue_start, bounds.next_artist_start)
+FROM (SELECT id, start_time,
+             lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_venue_start,
+             lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS next_artist_start
+      FROM "Show") AS bounds
+WHERE "Show".id = bounds.id
+'''
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute(BACKFILL_END_TIMES)
+    op.alter_column('Show', 'end_time', existing_type=sa.DateTime(), nullable=False)
+    op.create_check_constraint('ck_Show_end_time', 'Show', 'end_time >= start_time')
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+
+    # No two shows of a venue, or of an artist, overlap. The GiST indexes of
+    # the constraints also serve the availability queries (tsrange && tsrange).
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_venue_id_period" '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_artist_id_period" '
+               'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_id_period', 'Show')
+    op.drop_constraint('ex_Show_venue_id_period', 'Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_constraint('ck_Show_end_time', 'Show', type_='check')
+    op.drop_column('Show', 'end_time')
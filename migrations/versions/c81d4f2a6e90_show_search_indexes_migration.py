@@ -0,0 +1,31 @@
+"""show search indexes migration.
+
+Revision ID: c81d4f2a6e90
+Revises: a52e07d9c3b1
+Create Date: 2026-10-18 12:31:44.912370
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81d4f2a6e90'
+down_revision = 'a52e07d9c3b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_start_time_venue_id_artist_id', 'Show',
+                    ['start_time', 'venue_id', 'artist_id'], unique=False)
+    op.create_index('ix_City_name_trgm', 'City', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Genre_name_trgm', 'Genre', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Genre_name_trgm', table_name='Genre')
+    op.drop_index('ix_City_name_trgm', table_name='City')
+    op.drop_index('ix_Show_start_time_venue_id_artist_id', table_name='Show')
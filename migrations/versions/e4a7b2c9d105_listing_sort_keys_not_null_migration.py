@@ -0,0 +1,35 @@
+"""listing sort keys not null migration.
+
+Revision ID: e4a7b2c9d105
+Revises: 8c2f6d1e9b37
+Create Date: 2026-10-18 18:47:12.305716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7b2c9d105'
+down_revision = '8c2f6d1e9b37'
+branch_labels = None
+depends_on = None
+
+# The listings are paged by (name, id) and (start_time, id): rows with a NULL
+# sort key would be skipped by every cursor. Nameless venues and artists get
+# an empty name, listed first; shows without a start time start as they end.
+
+
+def upgrade():
+    op.execute('UPDATE "Venue" SET name = \'\' WHERE name IS NULL')
+    op.execute('UPDATE "Artist" SET name = \'\' WHERE name IS NULL')
+    op.execute('UPDATE "Show" SET start_time = end_time WHERE start_time IS NULL')
+    op.alter_column('Venue', 'name', existing_type=sa.String(), nullable=False)
+    op.alter_column('Artist', 'name', existing_type=sa.String(), nullable=False)
+    op.alter_column('Show', 'start_time', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    op.alter_column('Show', 'start_time', existing_type=sa.DateTime(), nullable=True)
+    op.alter_column('Artist', 'name', existing_type=sa.String(), nullable=True)
+    op.alter_column('Venue', 'name', existing_type=sa.String(), nullable=True)
@@ -0,0 +1,72 @@
+import re
+from collections import Counter
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ----------------------------------------------------------------------------#
+# N+1 detection.
+# ----------------------------------------------------------------------------#
+
+# A request running the same SELECT again and again, with only the parameters
+# changing, is loading a relationship row by row: a lazy load in a loop.
+# Statements are compared on their SQL text, with the bound parameters,
+# literal numbers and IN lists collapsed, so lazy loads and hand written
+# queries in loops are both caught.
+
+PARAMETER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+|\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+|\d+))*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def normalize_statement(statement):
+    statement = SPACES.sub(' ', statement).strip()
+    statement = PARAMETER_LIST.sub('(?)', statement)
+    return NUMBER.sub('?', statement)
+
+
+def find_repeated_statements(statements, threshold):
+    """(statement, count) of the statements repeated at least threshold times, most repeated first."""
+    return [(statement, count) for statement, count in statements.most_common() if count >= threshold]
+
+
+class NPlusOneDetector:
+    """Flags requests repeating a structurally identical SELECT, by logging or raising NPlusOneError."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def before_request(self):
+        if current_app.config.get('NPLUSONE_ENABLED', False):
+            g.nplusone_statements = Counter()
+
+    def after_request(self, response):
+        statements = g.pop('nplusone_statements', None)
+        if statements is None:
+            return response
+        repeated = find_repeated_statements(statements, current_app.config.get('NPLUSONE_THRESHOLD', 3))
+        if repeated:
+            message = 'N+1 queries detected:\n' + '\n'.join(
+                '{} times: {}'.format(count, statement) for statement, count in repeated)
+            if current_app.config.get('NPLUSONE_RAISE', False):
+                raise NPlusOneError(message)
+            current_app.logger.warning(message)
+        return response
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        statements = g.get('nplusone_statements')
+        if statements is not None and statement.lstrip()[:6].upper() == 'SELECT':
+            statements[normalize_statement(statement)] += 1
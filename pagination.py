@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+
+import dateutil.parser
+from sqlalchemy import DateTime, tuple_
+
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+# A page is selected with a row-value comparison on the sort key, e.g.
+# (name, id) > (:name, :id), so it is served by the matching composite index
+# whatever its position in the listing, instead of an OFFSET scan. The sort
+# columns are NOT NULL: a NULL compares neither lower nor greater than a
+# cursor, so its row would never be listed.
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor: {}'.format(cursor))
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor: {}'.format(cursor))
+    try:
+        return [decode_value(value, column) for value, column in zip(values, columns)]
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor: {}'.format(cursor))
+
+
+def decode_value(value, column):
+    # Any JSON may come back from a client: only scalars are bound
+    if isinstance(value, (list, dict)):
+        raise TypeError('Not a scalar: {!r}'.format(value))
+    return dateutil.parser.isoparse(value) if isinstance(column.type, DateTime) else value
+
+
+def paginate(query, columns, after=None, before=None, limit=20, key=None, fetch=None):
+    """Return one page of query ordered by columns, with cursors to its neighbours.
+
+    key extracts the sort values from a result row; by default the columns
+    are read as attributes of the row. fetch runs the final query, which may
+    also be a Core select(); by default query.all().
+    """
+    key = key or (lambda item: [getattr(item, column.key) for column in columns])
+    fetch = fetch or (lambda statement: statement.all())
+    sort_key = tuple_(*columns)
+
+    if before:
+        values = decode_cursor(before, columns)
+        items = fetch(query
+                      .filter(sort_key < tuple_(*values))
+                      .order_by(*[column.desc() for column in columns])
+                      .limit(limit + 1))
+        has_prev = len(items) > limit
+        items = list(reversed(items[:limit]))
+        has_next = True
+    else:
+        if after:
+            values = decode_cursor(after, columns)
+            query = query.filter(sort_key > tuple_(*values))
+        items = fetch(query.order_by(*columns).limit(limit + 1))
+        has_next = len(items) > limit
+        items = items[:limit]
+        has_prev = bool(after)
+
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(key(items[-1])) if items and has_next else None,
+        "prev_cursor": encode_cursor(key(items[0])) if items and has_prev else None
+    }
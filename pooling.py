@@ -0,0 +1,135 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+# ----------------------------------------------------------------------------#
+# Connection pool.
+# ----------------------------------------------------------------------------#
+
+# Pool sizing, recycling, pre-ping and the statement timeout come from the
+# DB_* settings. They only apply to PostgreSQL: SQLite (development and
+# tests) keeps the pool Flask-SQLAlchemy picks for it.
+
+# Checkout wait histogram buckets, in seconds
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database."""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'postgresql':
+        return options
+
+    options.setdefault('poolclass', MeteredQueuePool)
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    if config.get('DB_STATEMENT_TIMEOUT'):
+        # Server side limit for every statement of the connection, in milliseconds
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('options', '-c statement_timeout={:d}'.format(config['DB_STATEMENT_TIMEOUT']))
+    return options
+
+
+class CheckoutMetrics:
+    """Time spent waiting for a connection, as a histogram."""
+
+    def __init__(self):
+        self.buckets = [0] * len(WAIT_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+    def observe(self, wait):
+        with self.lock:
+            self.count += 1
+            self.total += wait
+            bucket = bisect.bisect_left(WAIT_BUCKETS, wait)
+            if bucket < len(WAIT_BUCKETS):
+                self.buckets[bucket] += 1
+
+    def timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool timing every checkout, including the connections it has to open."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_metrics = CheckoutMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_metrics.timeout()
+            raise
+        finally:
+            self.checkout_metrics.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        # Keep the numbers when the engine is disposed
+        pool = super().recreate()
+        pool.checkout_metrics = self.checkout_metrics
+        return pool
+
+
+def pool_status(pool):
+    """Size and usage of a QueuePool; empty for pools without a fixed size."""
+    if not isinstance(pool, QueuePool):
+        return {}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "saturation": checked_out / capacity if capacity else 0.0,
+    }
+
+
+def render_pool_metrics(pool, prefix='fyyur'):
+    """Pool metrics in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name, kind, help_text, value):
+        lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+        lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+        lines.append('{}_{} {}'.format(prefix, name, value))
+
+    status = pool_status(pool)
+    if status:
+        metric('db_pool_size', 'gauge', 'Connections kept open by the pool.', status["size"])
+        metric('db_pool_checked_out', 'gauge', 'Connections in use.', status["checked_out"])
+        metric('db_pool_overflow', 'gauge', 'Connections opened beyond the pool size.', status["overflow"])
+        metric('db_pool_saturation', 'gauge', 'Connections in use over the pool capacity.', status["saturation"])
+
+    metrics = getattr(pool, 'checkout_metrics', None)
+    if metrics is not None:
+        name = '{}_db_pool_checkout_wait_seconds'.format(prefix)
+        lines.append('# HELP {} Time spent waiting for a connection.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        with metrics.lock:
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS, metrics.buckets):
+                cumulative += count
+                lines.append('{}_bucket{{le="{}"}} {}'.format(name, bound, cumulative))
+            lines.append('{}_bucket{{le="+Inf"}} {}'.format(name, metrics.count))
+            lines.append('{}_sum {}'.format(name, metrics.total))
+            lines.append('{}_count {}'.format(name, metrics.count))
+            timeouts = metrics.timeouts
+        metric('db_pool_checkout_timeouts_total', 'counter', 'Checkouts that gave up after the pool timeout.', timeouts)
+
+    return '\n'.join(lines) + '\n' if lines else ''
@@ -0,0 +1,215 @@
+import bisect
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered, signals_available
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ----------------------------------------------------------------------------#
+# Request profiling.
+# ----------------------------------------------------------------------------#
+
+# Statements are timed by engine events and templates by the Flask render
+# signals (which need blinker). Each request reports its own numbers in a
+# Server-Timing header, and the numbers are aggregated per endpoint for the
+# /_metrics endpoint. Metrics are per process: every worker is scraped on its own.
+
+# Request duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Longest statement text kept for the slow queries
+STATEMENT_LENGTH = 200
+
+
+def normalize_statement(statement):
+    return re.sub(r'\s+', ' ', statement).strip()[:STATEMENT_LENGTH]
+
+
+class RequestProfile:
+    """Numbers collected while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = []
+        self.statements = []
+
+    def add_query(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        self.statements.append((elapsed, statement))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class EndpointMetrics:
+
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        # (seconds, statement) of the slowest statements, slowest first
+        self.slow_queries = []
+
+
+class Metrics:
+    """Thread safe aggregation of the request profiles, per endpoint."""
+
+    def __init__(self, slow_queries=5):
+        self.slow_queries = slow_queries
+        self.endpoints = defaultdict(EndpointMetrics)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, profile, duration):
+        slowest = sorted(profile.statements, reverse=True)[:self.slow_queries]
+        with self.lock:
+            metrics = self.endpoints[endpoint]
+            metrics.requests += 1
+            metrics.duration += duration
+            bucket = bisect.bisect_left(DURATION_BUCKETS, duration)
+            if bucket < len(DURATION_BUCKETS):
+                metrics.buckets[bucket] += 1
+            metrics.queries += profile.queries
+            metrics.db_time += profile.db_time
+            metrics.render_time += profile.render_time
+            for elapsed, statement in slowest:
+                self.add_slow_query(metrics, elapsed, normalize_statement(statement))
+
+    def add_slow_query(self, metrics, elapsed, statement):
+        for index, (_, known) in enumerate(metrics.slow_queries):
+            if known == statement:
+                if elapsed <= metrics.slow_queries[index][0]:
+                    return
+                del metrics.slow_queries[index]
+                break
+        metrics.slow_queries.append((elapsed, statement))
+        metrics.slow_queries.sort(reverse=True)
+        del metrics.slow_queries[self.slow_queries:]
+
+    def clear(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def render(self, prefix='fyyur'):
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+
+        def sample(name, labels, value):
+            label_text = ','.join('{}="{}"'.format(key, escape_label(value)) for key, value in labels)
+            lines.append('{}_{}{{{}}} {}'.format(prefix, name, label_text, value))
+
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+
+            family('request_duration_seconds', 'histogram', 'Time spent serving requests.')
+            for endpoint, metrics in endpoints:
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    sample('request_duration_seconds_bucket', [('endpoint', endpoint), ('le', bound)], cumulative)
+                sample('request_duration_seconds_bucket', [('endpoint', endpoint), ('le', '+Inf')], metrics.requests)
+                sample('request_duration_seconds_sum', [('endpoint', endpoint)], metrics.duration)
+                sample('request_duration_seconds_count', [('endpoint', endpoint)], metrics.requests)
+
+            family('db_queries_total', 'counter', 'SQL statements executed by requests.')
+            for endpoint, metrics in endpoints:
+                sample('db_queries_total', [('endpoint', endpoint)], metrics.queries)
+
+            family('db_duration_seconds_total', 'counter', 'Time spent executing SQL statements.')
+            for endpoint, metrics in endpoints:
+                sample('db_duration_seconds_total', [('endpoint', endpoint)], metrics.db_time)
+
+            family('template_render_seconds_total', 'counter', 'Time spent rendering templates.')
+            for endpoint, metrics in endpoints:
+                sample('template_render_seconds_total', [('endpoint', endpoint)], metrics.render_time)
+
+            family('slow_query_duration_seconds', 'gauge', 'Slowest SQL statements seen per endpoint.')
+            for endpoint, metrics in endpoints:
+                for rank, (elapsed, statement) in enumerate(metrics.slow_queries, 1):
+                    sample('slow_query_duration_seconds',
+                           [('endpoint', endpoint), ('rank', rank), ('statement', statement)], elapsed)
+
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class RequestProfiler:
+    """Per request query count, database and render time, as Server-Timing headers and metrics."""
+
+    def __init__(self, app=None):
+        self.metrics = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.metrics = Metrics(app.config.get('PROFILING_SLOW_QUERIES', 5))
+        # Listening on the Engine class covers every engine of the app
+        event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+        # Without blinker, the render time is not measured
+        if signals_available:
+            before_render_template.connect(self.before_render_template, app)
+            template_rendered.connect(self.template_rendered, app)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    @staticmethod
+    def current_profile():
+        if has_request_context():
+            return g.get('profile')
+        return None
+
+    def before_request(self):
+        if current_app.config.get('PROFILING_ENABLED', True):
+            g.profile = RequestProfile()
+
+    def after_request(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        duration = profile.elapsed()
+        if request.endpoint not in current_app.config.get('PROFILING_IGNORED_ENDPOINTS', ()):
+            self.metrics.record(request.endpoint or 'unknown', profile, duration)
+        response.headers['Server-Timing'] = ', '.join([
+            'db;dur={:.2f};desc="{} queries"'.format(profile.db_time * 1000, profile.queries),
+            'render;dur={:.2f}'.format(profile.render_time * 1000),
+            'total;dur={:.2f}'.format(duration * 1000),
+        ])
+        return response
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profiling_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = self.current_profile()
+        started = getattr(context, '_profiling_started', None)
+        if profile is not None and started is not None:
+            profile.add_query(statement, time.perf_counter() - started)
+
+    def before_render_template(self, sender, template, context, **extra):
+        profile = self.current_profile()
+        if profile is not None:
+            profile.render_started.append(time.perf_counter())
+
+    def template_rendered(self, sender, template, context, **extra):
+        profile = self.current_profile()
+        if profile is not None and profile.render_started:
+            profile.render_time += time.perf_counter() - profile.render_started.pop()
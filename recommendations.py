@@ -0,0 +1,400 @@
+import threading
+
+import numpy as np
+
+from cache import create_backend
+
+# ----------------------------------------------------------------------------#
+# Recommendations.
+# ----------------------------------------------------------------------------#
+
+# Artists seeking venues are recommended to venues, and venues seeking talent
+# to artists. A pair scores by the overlap of its genres (Jaccard index), by
+# location (same city, or same state) and by the shows it already booked.
+# Genres are 0/1 vectors, one column per genre, so the genre overlaps of a
+# block of venues with every artist are one matrix product.
+#
+# The top k of every venue and every artist is computed once, in blocks, and
+# kept up to date: a venue or an artist whose genres, location, seeking
+# status or shows change is marked dirty. Its own top k is computed again,
+# and its new scores are patched into the top k of the other side. Dirty
+# marks go through a change log on the cache backend: with the redis
+# backend every worker replays them, the memory backend runs one worker.
+
+GENRE_WEIGHT = 0.6
+LOCATION_WEIGHT = 0.25
+BOOKING_WEIGHT = 0.15
+
+# Location score of a pair in the same state but not in the same city
+SAME_STATE_SCORE = 0.5
+
+# Rows scored at once when computing the top k in bulk
+BLOCK_SIZE = 512
+
+SIDES = ('venue', 'artist')
+
+
+class Entities:
+    """Features of the venues or of the artists, one row per id.
+
+    Rows are never moved: removed entities stay, inactive, until the next
+    rebuild. Arrays grow by doubling.
+    """
+
+    def __init__(self, genre_count=0):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.rows = {}
+        self.genres = np.zeros((0, genre_count), dtype=np.float32)
+        self.genre_counts = np.zeros(0, dtype=np.float32)
+        self.cities = np.zeros(0, dtype=np.int64)
+        self.states = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.seeking = np.zeros(0, dtype=bool)
+        # Score of the k-th recommendation of each row, 0 until it has k of them
+        self.cutoffs = np.zeros(0, dtype=np.float32)
+        self.size = 0
+
+    def grow(self, capacity):
+        def resize(array):
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        for name in ('ids', 'genres', 'genre_counts', 'cities', 'states', 'active', 'seeking', 'cutoffs'):
+            setattr(self, name, resize(getattr(self, name)))
+
+    def add_genre_columns(self, count):
+        self.genres = np.hstack([self.genres, np.zeros((len(self.genres), count), dtype=np.float32)])
+
+    def set(self, item_id, city_id, state_id, genre_columns, seeking):
+        row = self.rows.get(item_id)
+        if row is None:
+            if self.size == len(self.ids):
+                self.grow(max(16, 2 * self.size))
+            row = self.rows[item_id] = self.size
+            self.ids[row] = item_id
+            self.size += 1
+        self.genres[row] = 0
+        self.genres[row, genre_columns] = 1
+        self.genre_counts[row] = len(set(genre_columns))
+        self.cities[row] = city_id
+        self.states[row] = state_id
+        self.active[row] = True
+        self.seeking[row] = seeking
+        return row
+
+    def remove(self, item_id):
+        row = self.rows.get(item_id)
+        if row is not None:
+            self.active[row] = False
+            self.seeking[row] = False
+
+    def candidates(self):
+        """Rows that may be recommended to the other side."""
+        return self.active[:self.size] & self.seeking[:self.size]
+
+
+def score_pairs(side, rows, other, columns, bookings):
+    """Scores of the rows of side against the columns (rows of other), as a (rows, columns) array."""
+    overlap = side.genres[rows] @ other.genres[columns].T
+    union = side.genre_counts[rows][:, None] + other.genre_counts[columns][None, :] - overlap
+    scores = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+    scores *= GENRE_WEIGHT
+
+    # A city is in a single state: pairs in the same city get both parts
+    same_state = side.states[rows][:, None] == other.states[columns][None, :]
+    scores += np.float32(LOCATION_WEIGHT * SAME_STATE_SCORE) * same_state
+    same_city = side.cities[rows][:, None] == other.cities[columns][None, :]
+    scores += np.float32(LOCATION_WEIGHT * (1 - SAME_STATE_SCORE)) * same_city
+
+    positions = np.full(other.size, -1, dtype=np.int64)
+    positions[columns] = np.arange(len(columns))
+    for index, row in enumerate(rows):
+        for other_id, count in bookings.get(int(side.ids[row]), {}).items():
+            other_row = other.rows.get(other_id)
+            if other_row is not None and positions[other_row] >= 0:
+                scores[index, positions[other_row]] += BOOKING_WEIGHT * count / (count + 1)
+    return scores
+
+
+def top_k(scores, k):
+    """(columns, scores) of the k best positive scores of each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return [([], []) for _ in range(len(scores))]
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-best, axis=1, kind='stable')
+    columns = np.take_along_axis(columns, order, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    return [(row_columns[row_best > 0].tolist(), row_best[row_best > 0].tolist())
+            for row_columns, row_best in zip(columns, best)]
+
+
+class RecommendationModel:
+    """Features and top k recommendations of both sides."""
+
+    def __init__(self, k):
+        self.k = k
+        self.genre_columns = {}
+        self.entities = {side: Entities() for side in SIDES}
+        # {venue_id: {artist_id: shows}} and the other way round
+        self.bookings = {side: {} for side in SIDES}
+        # {id: [(other_id, score), ...]}, and the ids whose top k holds each id
+        self.top = {side: {} for side in SIDES}
+        self.listed_in = {side: {} for side in SIDES}
+
+    @staticmethod
+    def other(side):
+        return 'artist' if side == 'venue' else 'venue'
+
+    def columns_of(self, genre_ids):
+        new = [genre_id for genre_id in genre_ids if genre_id not in self.genre_columns]
+        for genre_id in dict.fromkeys(new):
+            self.genre_columns[genre_id] = len(self.genre_columns)
+        if new:
+            width = len(self.genre_columns)
+            for entities in self.entities.values():
+                entities.add_genre_columns(width - entities.genres.shape[1])
+        return [self.genre_columns[genre_id] for genre_id in genre_ids]
+
+    def load_entities(self, side, rows, ids=()):
+        """Set the features of the (id, city_id, state_id, genre_ids, seeking) rows.
+
+        ids missing from the rows no longer exist.
+        """
+        entities = self.entities[side]
+        found = set()
+        for item_id, city_id, state_id, genre_ids, seeking in rows:
+            entities.set(item_id, city_id, state_id, self.columns_of(genre_ids), seeking)
+            found.add(item_id)
+        for item_id in set(ids) - found:
+            entities.remove(item_id)
+
+    def load_bookings(self, rows, venue_ids=(), artist_ids=()):
+        """Set the (venue_id, artist_id, count) show counts of the given venues and artists."""
+        for venue_id in venue_ids:
+            for artist_id in self.bookings['venue'].pop(venue_id, {}):
+                self.bookings['artist'].get(artist_id, {}).pop(venue_id, None)
+        for artist_id in artist_ids:
+            for venue_id in self.bookings['artist'].pop(artist_id, {}):
+                self.bookings['venue'].get(venue_id, {}).pop(artist_id, None)
+        for venue_id, artist_id, count in rows:
+            self.bookings['venue'].setdefault(venue_id, {})[artist_id] = count
+            self.bookings['artist'].setdefault(artist_id, {})[venue_id] = count
+
+    def set_top(self, side, item_id, recommendations):
+        listed_in = self.listed_in[self.other(side)]
+        for other_id, _ in self.top[side].get(item_id, ()):
+            listed_in.get(other_id, set()).discard(item_id)
+        for other_id, _ in recommendations:
+            listed_in.setdefault(other_id, set()).add(item_id)
+        self.top[side][item_id] = recommendations
+
+        entities = self.entities[side]
+        full = len(recommendations) == self.k
+        entities.cutoffs[entities.rows[item_id]] = recommendations[-1][1] if full else 0
+
+    def compute(self, side, rows):
+        """Compute the top k of the rows of side, in blocks."""
+        entities, other = self.entities[side], self.entities[self.other(side)]
+        bookings = self.bookings[side]
+        # Only the candidates of the other side are scored
+        candidates = np.flatnonzero(other.candidates())
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+            best = top_k(score_pairs(entities, block, other, candidates, bookings), self.k)
+            for row, (positions, scores) in zip(block, best):
+                item_id = int(entities.ids[row])
+                if entities.active[row]:
+                    self.set_top(side, item_id, [(int(other.ids[candidates[position]]), score)
+                                                 for position, score in zip(positions, scores)])
+                else:
+                    self.set_top(side, item_id, [])
+
+    def compute_all(self):
+        for side in SIDES:
+            self.compute(side, np.arange(self.entities[side].size))
+
+    def patch(self, side, rows, skipped):
+        """Patch the new scores of the rows of side into the top k of the other side.
+
+        Returns the rows of the other side whose top k must be computed again:
+        those that held a row whose score dropped below their cutoff.
+        """
+        entities, other_side = self.entities[side], self.other(side)
+        other = self.entities[other_side]
+        if not other.size or not len(rows):
+            return set()
+        # The scores are symmetric: those of the rows against the other side
+        scores = score_pairs(entities, rows, other, np.arange(other.size), self.bookings[side])
+        scores[~entities.candidates()[rows]] = -np.inf
+        recompute = set()
+        for row, column in zip(rows, scores):
+            item_id = int(entities.ids[row])
+            affected = set(np.flatnonzero(column > other.cutoffs[:other.size]).tolist())
+            affected.update(other.rows[other_id] for other_id in self.listed_in[side].get(item_id, ()))
+            for other_row in affected - skipped - recompute:
+                other_id = int(other.ids[other_row])
+                if not other.active[other_row]:
+                    continue
+                score = float(column[other_row])
+                current = self.top[other_side].get(other_id, [])
+                kept = [entry for entry in current if entry[0] != item_id]
+                if len(kept) < len(current) and len(current) == self.k and score < other.cutoffs[other_row]:
+                    # Another candidate may now be better than this one
+                    recompute.add(other_row)
+                    continue
+                if score > 0:
+                    kept.append((item_id, score))
+                    kept.sort(key=lambda entry: (-entry[1], entry[0]))
+                self.set_top(other_side, other_id, kept[:self.k])
+        return recompute
+
+    def refresh(self, dirty_rows):
+        """Update the top k after the features of the {side: rows} changed."""
+        for side in SIDES:
+            self.compute(side, np.array(sorted(dirty_rows[side]), dtype=np.int64))
+        for side in SIDES:
+            other_side = self.other(side)
+            rows = np.array(sorted(dirty_rows[side]), dtype=np.int64)
+            recompute = self.patch(side, rows, set(dirty_rows[other_side]))
+            if recompute:
+                self.compute(other_side, np.array(sorted(recompute), dtype=np.int64))
+
+    def recommend(self, side, item_id, limit=None):
+        entities = self.entities[side]
+        row = entities.rows.get(item_id)
+        if row is None or not entities.active[row]:
+            return None
+        return self.top[side][item_id][:limit]
+
+
+class RecommendationsUnavailable(Exception):
+    """The recommendations are being computed for the first time."""
+
+
+class Recommender:
+    """Top k recommendations of the venues and artists, kept up to date from dirty marks.
+
+    The loaders fetch the features from the database:
+
+    load_entities(side, ids=None) -> (id, city_id, state_id, genre_ids, seeking) rows
+    load_bookings(venue_ids=None, artist_ids=None) -> (venue_id, artist_id, count) rows
+
+    ids of None stands for all of them. Changes are replayed on the request
+    thread; whole models are built by a background thread, while the previous
+    model, if any, keeps being served.
+    """
+
+    def __init__(self, app=None, load_entities=None, load_bookings=None, backend=None):
+        self.load_entities = load_entities
+        self.load_bookings = load_bookings
+        self.backend = backend
+        self.model = None
+        self.seen = 0
+        self.builder = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.k = app.config.get('RECOMMENDATIONS_K', 10)
+        self.max_changes = app.config.get('RECOMMENDATIONS_MAX_CHANGES', 1000)
+        if self.backend is None:
+            self.backend = create_backend(app.config, 'recommendations', app.config.get('RECOMMENDATIONS_LOG_SIZE'))
+
+    def mark_dirty(self, side, item_id):
+        """Record that the genres, location, seeking status or shows of an entity changed."""
+        change = self.backend.incr('changes')
+        self.backend.set('change:{}'.format(change), (side, int(item_id)))
+
+    def clear(self):
+        # Built again, e.g. after a bulk load
+        self.mark_dirty('all', 0)
+
+    def build(self):
+        model = RecommendationModel(self.k)
+        for side in SIDES:
+            model.load_entities(side, self.load_entities(side))
+        model.load_bookings(self.load_bookings())
+        model.compute_all()
+        return model
+
+    def start_build(self, latest):
+        # Called with the lock held. Changes after latest are replayed on the new model.
+        def run():
+            model = None
+            try:
+                with self.app.app_context():
+                    model = self.build()
+            except Exception:
+                self.app.logger.exception('The recommendations could not be built')
+            with self.lock:
+                if model is not None:
+                    self.model, self.seen = model, latest
+                self.builder = None
+
+        self.builder = threading.Thread(target=run, name='recommendations', daemon=True)
+        self.builder.start()
+
+    def read_changes(self, latest):
+        """{side: ids} changed since the last sync, None when the model must be built again."""
+        if latest - self.seen > self.max_changes:
+            return None
+        changes = {side: set() for side in SIDES}
+        for change in range(self.seen + 1, latest + 1):
+            entry = self.backend.get('change:{}'.format(change))
+            if entry is None or entry[0] == 'all':
+                # Evicted from the log, or a bulk change
+                return None
+            changes[entry[0]].add(entry[1])
+        return changes
+
+    def sync(self):
+        # Called with the lock held
+        latest = self.backend.get_counter('changes')
+        if self.builder is not None or (self.model is not None and latest == self.seen):
+            return
+        changes = self.read_changes(latest) if self.model is not None else None
+        if changes is None:
+            self.start_build(latest)
+            return
+
+        model = self.model
+        for side in SIDES:
+            if changes[side]:
+                model.load_entities(side, self.load_entities(side, changes[side]), changes[side])
+        if changes['venue'] or changes['artist']:
+            model.load_bookings(self.load_bookings(changes['venue'], changes['artist']),
+                                changes['venue'], changes['artist'])
+        model.refresh({side: {model.entities[side].rows[item_id] for item_id in changes[side]
+                              if item_id in model.entities[side].rows}
+                       for side in SIDES})
+        self.seen = latest
+
+    def start(self):
+        """Bring the model up to date, building it in the background when needed.
+
+        Returns the thread building it, if any.
+        """
+        with self.lock:
+            self.sync()
+            return self.builder
+
+    def wait(self, timeout=None):
+        builder = self.builder
+        if builder is not None:
+            builder.join(timeout)
+
+    def recommend(self, side, item_id, limit=None):
+        """[(other_id, score), ...] best first, None when the entity does not exist.
+
+        Raises RecommendationsUnavailable until the first model is built.
+        """
+        with self.lock:
+            self.sync()
+            if self.model is None:
+                raise RecommendationsUnavailable()
+            return self.model.recommend(side, item_id, limit)
@@ -0,0 +1,144 @@
+import random
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm, text
+
+from pooling import engine_options
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+# ----------------------------------------------------------------------------#
+
+# Reads of GET requests go to a replica from SQLALCHEMY_REPLICA_URIS; writes,
+# and every statement of the other requests, go to the primary. A client
+# that just wrote is pinned to the primary for REPLICA_READ_AFTER_WRITE_SECONDS
+# (through its session cookie) so that it reads its own writes, and replicas
+# lagging by more than REPLICA_MAX_LAG_SECONDS are skipped.
+
+# Session cookie key holding the end of the read-after-write window
+PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+# Replay delay of a PostgreSQL standby, 0 when it has replayed everything it received
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lag = 0.0
+        self.checked_at = None
+
+
+class ReplicaSet:
+    """Replica engines, with their last measured lag."""
+
+    def __init__(self, uris, config):
+        self.replicas = [Replica(create_engine(uri, **engine_options(
+            dict(config, SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_ENGINE_OPTIONS=None)
+        ))) for uri in uris]
+        self.max_lag = config.get('REPLICA_MAX_LAG_SECONDS', 0)
+        self.check_interval = config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+        self.lock = threading.Lock()
+
+    def measure_lag(self, replica):
+        if replica.engine.dialect.name != 'postgresql':
+            return 0.0
+        try:
+            with replica.engine.connect() as connection:
+                return float(connection.execute(REPLICA_LAG_QUERY).scalar())
+        except Exception:
+            # An unreachable replica is as good as an infinitely late one
+            return float('inf')
+
+    def refresh_lag(self, replica):
+        now = time.monotonic()
+        with self.lock:
+            if replica.checked_at is not None and now - replica.checked_at < self.check_interval:
+                return
+            replica.checked_at = now
+        replica.lag = self.measure_lag(replica)
+
+    def choose(self):
+        """Engine of a random replica within the lag limit, or None to use the primary."""
+        candidates = self.replicas
+        if self.max_lag:
+            for replica in candidates:
+                self.refresh_lag(replica)
+            candidates = [replica for replica in candidates if replica.lag <= self.max_lag]
+        if not candidates:
+            return None
+        return random.choice(candidates).engine
+
+    def dispose(self, close=True):
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+
+def served_by_replica():
+    """Whether the reads of the current request go to a replica."""
+    return has_request_context() and g.get('db_replica') is not None
+
+
+class RoutingSession(SignallingSession):
+    """Session reading from the replica picked for the request, and writing to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if has_request_context():
+            replica = g.get('db_replica')
+            if replica is not None and not self._flushing and getattr(clause, 'is_select', False):
+                return replica
+            if self._flushing or not getattr(clause, 'is_select', True):
+                g.db_wrote = True
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy extension routing the reads of GET requests to read replicas."""
+
+    def init_app(self, app):
+        super().init_app(app)
+        self.replica_sets = {}
+        app.before_request(self.route_request)
+        app.after_request(self.pin_writer)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def get_replica_set(self, app):
+        uris = app.config.get('SQLALCHEMY_REPLICA_URIS')
+        if not uris:
+            return None
+        with self._engine_lock:
+            if app not in self.replica_sets:
+                self.replica_sets[app] = ReplicaSet(uris, app.config)
+            return self.replica_sets[app]
+
+    def route_request(self):
+        g.db_replica = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        if time.time() < session.get(PRIMARY_UNTIL_KEY, 0):
+            return
+        replicas = self.get_replica_set(current_app._get_current_object())
+        if replicas is not None:
+            g.db_replica = replicas.choose()
+
+    def pin_writer(self, response):
+        if g.pop('db_wrote', False):
+            window = current_app.config.get('REPLICA_READ_AFTER_WRITE_SECONDS', 0)
+            if window and current_app.config.get('SQLALCHEMY_REPLICA_URIS'):
+                session[PRIMARY_UNTIL_KEY] = time.time() + window
+        return response
+
+    def dispose_replicas(self, close=True):
+        for replicas in self.replica_sets.values():
+            replicas.dispose(close=close)
@@ -0,0 +1,164 @@
+import threading
+from collections import defaultdict
+
+from sqlalchemy import or_, func
+
+from cache import create_backend
+
+# ----------------------------------------------------------------------------#
+# Name search.
+# ----------------------------------------------------------------------------#
+
+# On PostgreSQL names are matched with the pg_trgm operators, served by the
+# GIN trigram indexes. Other databases (SQLite in development and tests) get
+# the same behaviour from an in-process trigram index kept in NgramIndex.
+# Writes bump a generation counter in the cache backend: a process whose
+# index predates the writes of another one (a worker, or `manage.py import`)
+# builds it again. With the memory backend, only the writes of the serving
+# process itself are seen.
+
+SIMILARITY_THRESHOLD = 0.3  # pg_trgm default for the % operator
+
+
+def ngrams(text, n=3):
+    text = (text or '').lower()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def similarity(grams, other_grams):
+    if not grams or not other_grams:
+        return 0.0
+    return len(grams & other_grams) / len(grams | other_grams)
+
+
+class NgramIndex:
+    """Inverted index from trigrams to the ids of the names containing them."""
+
+    def __init__(self, n=3):
+        self.n = n
+        self.names = {}
+        self.grams = {}
+        self.postings = defaultdict(set)
+
+    def add(self, item_id, name):
+        self.remove(item_id)
+        grams = ngrams(name, self.n)
+        self.names[item_id] = (name or '').lower()
+        self.grams[item_id] = grams
+        for gram in grams:
+            self.postings[gram].add(item_id)
+
+    def remove(self, item_id):
+        for gram in self.grams.pop(item_id, ()):
+            self.postings[gram].discard(item_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+        self.names.pop(item_id, None)
+
+    def search(self, term, limit):
+        """Return up to limit ids whose name contains term or is similar to it, best first."""
+        term = term.lower()
+        grams = ngrams(term, self.n)
+
+        if not grams:
+            # Too short to have trigrams: substring scan over the names
+            scores = {item_id: 1.0 for item_id, name in self.names.items() if term in name}
+        else:
+            candidates = set()
+            for gram in grams:
+                candidates |= self.postings.get(gram, set())
+            scores = {}
+            for item_id in candidates:
+                score = similarity(grams, self.grams[item_id])
+                if score >= SIMILARITY_THRESHOLD or term in self.names[item_id]:
+                    scores[item_id] = score
+
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], self.names[item_id], item_id))
+        return ranked[:limit]
+
+
+class NameSearch:
+    """Ranked, capped search on the name column of a model."""
+
+    def __init__(self, db, model, app=None, backend=None):
+        self.db = db
+        self.model = model
+        self.backend = backend
+        self.index = None
+        self.generation = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.backend is None:
+            self.backend = create_backend(app.config, 'search')
+
+    def generation_key(self):
+        return 'generation:' + self.model.__tablename__
+
+    def uses_trigram_indexes(self):
+        return self.db.engine.dialect.name == 'postgresql'
+
+    def search(self, query, term, limit):
+        """Filter query to the best matches of term, most similar first."""
+        if self.uses_trigram_indexes():
+            return self.search_trigram_indexes(query, term, limit)
+        return self.search_ngram_index(query, term, limit)
+
+    def search_trigram_indexes(self, query, term, limit):
+        name = self.model.name
+        return query \
+            .filter(or_(name.ilike('%{}%'.format(term)), name.op('%')(term))) \
+            .order_by(func.similarity(name, term).desc(), name, self.model.id) \
+            .limit(limit) \
+            .all()
+
+    def search_ngram_index(self, query, term, limit):
+        ids = self.get_index().search(term, limit)
+        if not ids:
+            return []
+        items = {item.id: item for item in query.filter(self.model.id.in_(ids))}
+        return [items[item_id] for item_id in ids if item_id in items]
+
+    def get_index(self):
+        # Read before the table, so that the writes committed meanwhile are seen next time
+        generation = self.backend.get_counter(self.generation_key())
+        with self.lock:
+            if self.index is None or self.generation != generation:
+                index = NgramIndex()
+                for item_id, name in self.db.session.query(self.model.id, self.model.name):
+                    index.add(item_id, name)
+                self.index, self.generation = index, generation
+            return self.index
+
+    def changed(self):
+        # Called with the lock held, after a committed write: True when the
+        # index only misses that write, False when it must be built again
+        generation = self.backend.incr(self.generation_key())
+        current = self.index is not None and generation == self.generation + 1
+        self.generation = generation
+        if not current:
+            self.index = None
+        return current
+
+    def update(self, item_id, name):
+        # The trigram indexes are maintained by PostgreSQL itself
+        if self.uses_trigram_indexes():
+            return
+        with self.lock:
+            if self.changed():
+                self.index.add(item_id, name)
+
+    def remove(self, item_id):
+        if self.uses_trigram_indexes():
+            return
+        with self.lock:
+            if self.changed():
+                self.index.remove(item_id)
+
+    def clear(self):
+        # Built again from the table on the next search, in every process, e.g. after a bulk load
+        with self.lock:
+            self.backend.incr(self.generation_key())
+            self.index = None
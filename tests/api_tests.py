@@ -0,0 +1,92 @@
+import json
+import unittest
+from datetime import datetime
+from testing import *
+from api import dumps, parse_fields
+from pagination import encode_cursor
+
+
+class ApiHelpersTests(unittest.TestCase):
+
+    def test_dumps(self):
+        data = {"start_time": datetime(2030, 1, 2, 20, 30), "genres": ['Jazz']}
+        self.assertEqual(json.loads(dumps(data)), {"start_time": '2030-01-02T20:30:00', "genres": ['Jazz']})
+
+    def test_parse_fields(self):
+        available = {"id": None, "name": None, "city": None}
+        self.assertEqual(parse_fields(None, available), ['id', 'name', 'city'])
+        self.assertEqual(parse_fields('name, id,name', available), ['name', 'id'])
+        with self.assertRaises(ValueError):
+            parse_fields('name,password', available)
+        with self.assertRaises(ValueError):
+            parse_fields(',', available)
+
+
+class ApiTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def get(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, response.data)
+        self.assertEqual(response.mimetype, 'application/json')
+        return response.get_json()
+
+    def first_id(self, model):
+        instance = model.query.order_by(model.id).first()
+        if not instance:
+            self.skipTest('No {} rows in the database'.format(model.__tablename__))
+        return instance.id
+
+    # The expected values are read before the request, whose teardown detaches the instances
+
+    def test_venue(self):
+        venue = Venue.query.get(self.first_id(Venue))
+        name, city, genres = venue.name, venue.address.city.name, sorted(genre.name for genre in venue.genres)
+        data = self.get('/api/v1/venues/{}'.format(venue.id))["data"]
+        self.assertEqual(data["name"], name)
+        self.assertEqual(data["city"], city)
+        self.assertEqual(sorted(data["genres"]), genres)
+
+    def test_artist_fields(self):
+        artist = Artist.query.get(self.first_id(Artist))
+        expected = {"name": artist.name, "state": artist.city.state.name}
+        data = self.get('/api/v1/artists/{}?fields=name,state'.format(artist.id))["data"]
+        self.assertEqual(data, expected)
+
+    def test_show(self):
+        show = Show.query.get(self.first_id(Show))
+        artist_name, venue_name, start_time = show.artist.name, show.venue.name, show.start_time.isoformat()
+        data = self.get('/api/v1/shows/{}'.format(show.id))["data"]
+        self.assertEqual(data["artist_name"], artist_name)
+        self.assertEqual(data["venue_name"], venue_name)
+        self.assertEqual(data["start_time"], start_time)
+
+    def test_not_found(self):
+        self.assertEqual(self.get('/api/v1/venues/0', 404), {"error": 'Not found'})
+
+    def test_bad_requests(self):
+        self.get('/api/v1/venues?fields=name,password', 400)
+        self.get('/api/v1/shows?after=invalid', 400)
+        for values in ([[1, 2], 1], ['2030-01-01T00:00:00', {"id": 1}], ['soon', 1]):
+            self.get('/api/v1/shows?after={}'.format(encode_cursor(values)), 400)
+
+    def test_keyset_paging(self):
+        # Walking the pages forth then back visits every show once, in order
+        expected = [show_id for show_id, in db.session.query(Show.id).order_by(Show.start_time, Show.id)]
+        ids = []
+        page = self.get('/api/v1/shows?fields=id&limit=2')
+        ids += [show["id"] for show in page["data"]]
+        while page["next_cursor"]:
+            page = self.get('/api/v1/shows?fields=id&limit=2&after={}'.format(page["next_cursor"]))
+            ids += [show["id"] for show in page["data"]]
+        self.assertEqual(ids, expected)
+
+        if len(expected) > 2:
+            previous = self.get('/api/v1/shows?fields=id&limit=2&before={}'.format(page["prev_cursor"]))
+            self.assertEqual([show["id"] for show in previous["data"]], expected[-len(page["data"]) - 2:-len(page["data"])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from asgiref.testing import ApplicationCommunicator
+from testing import *
+
+
+def database_is_shared():
+    # The async engine opens its own connections: an in-memory SQLite
+    # database would be a different, empty one
+    url = db.engine.url
+    return not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'))
+
+
+@unittest.skipUnless(database_is_shared(), 'The async engine cannot share an in-memory database')
+class AsgiTests(unittest.TestCase):
+
+    def setUp(self):
+        import asgi
+        self.asgi = asgi
+        app.config['RESPONSE_CACHE_ENABLED'] = False
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['RESPONSE_CACHE_ENABLED'] = True
+
+    def get(self, *paths):
+        async def request(path):
+            scope = {
+                "type": 'http',
+                "method": 'GET',
+                "path": path,
+                "query_string": b'',
+                "headers": [],
+                "server": ('localhost', 80),
+                "scheme": 'http',
+                "http_version": '1.1',
+                "root_path": '',
+            }
+            communicator = ApplicationCommunicator(self.asgi.application, scope)
+            await communicator.send_input({"type": 'http.request', "body": b''})
+            start = await communicator.receive_output(10)
+            body = b''
+            while True:
+                message = await communicator.receive_output(10)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    break
+            return start['status'], dict(start['headers']), body
+
+        async def requests():
+            try:
+                return await asyncio.gather(*[request(path) for path in paths])
+            finally:
+                # Connections belong to the event loop of this run
+                await self.asgi.engine.dispose()
+
+        return asyncio.run(requests())
+
+    def first_id(self, model):
+        instance = model.query.first()
+        if not instance:
+            self.skipTest('No {} rows in the database'.format(model.__tablename__))
+        return instance.id
+
+    def assertSameAsWsgi(self, path):
+        [(status, headers, body)] = self.get(path)
+        # Start from an empty identity map so that the page loads its own graph
+        db.session.remove()
+        response = self.client.get(path)
+        self.assertEqual(status, response.status_code)
+        # The WSGI pages do not order the genres and the shows they load
+        self.assertEqual(sorted(body.splitlines()), sorted(response.data.splitlines()))
+
+    def test_show_venue(self):
+        self.assertSameAsWsgi('/venues/{}'.format(self.first_id(Venue)))
+
+    def test_show_artist(self):
+        self.assertSameAsWsgi('/artists/{}'.format(self.first_id(Artist)))
+
+    def test_not_found(self):
+        self.assertSameAsWsgi('/venues/0')
+
+    def test_wsgi_fallback(self):
+        self.assertSameAsWsgi('/venues')
+
+    def test_concurrent_requests(self):
+        path = '/artists/{}'.format(self.first_id(Artist))
+        responses = self.get(*[path] * 10)
+        self.assertEqual({status for status, headers, body in responses}, {200})
+        self.assertEqual(len({body for status, headers, body in responses}), 1)
+
+    def test_request_hooks(self):
+        # The profiler's after request hook sees the profile of its before request hook
+        [(status, headers, body)] = self.get('/venues/{}'.format(self.first_id(Venue)))
+        self.assertEqual(status, 200)
+        self.assertIn(b'server-timing', headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from testing import *
+from availability import Schedule, free_windows
+
+
+def at(hour, minute=0):
+    return datetime(2030, 1, 1) + timedelta(hours=hour, minutes=minute)
+
+
+class ScheduleTests(unittest.TestCase):
+
+    def test_conflict(self):
+        schedule = Schedule(timedelta(hours=24))
+        schedule.add(at(20), at(22), 'row 0')
+        schedule.add(at(10), at(12))
+        self.assertEqual(schedule.conflict(at(21), at(23)), 'row 0')
+        self.assertEqual(schedule.conflict(at(11, 30), at(13)), 'an existing show')
+        self.assertIsNone(schedule.conflict(at(22), at(23)))
+        self.assertIsNone(schedule.conflict(at(18), at(20)))
+
+    def test_long_booking(self):
+        schedule = Schedule(timedelta(hours=24))
+        schedule.add(at(0), at(23))
+        self.assertIsNotNone(schedule.conflict(at(22), at(24)))
+
+    def test_free_windows(self):
+        bookings = [(at(9), at(11)), (at(10), at(12)), (at(14), at(15))]
+        self.assertEqual(free_windows(bookings, at(8), at(16)),
+                         [(at(8), at(9)), (at(12), at(14)), (at(15), at(16))])
+        self.assertEqual(free_windows(bookings, at(8), at(16), timedelta(hours=2)), [(at(12), at(14))])
+        self.assertEqual(free_windows(bookings, at(10), at(11)), [])
+        self.assertEqual(free_windows([], at(8), at(9)), [(at(8), at(9))])
+
+
+class AvailabilityTests(unittest.TestCase):
+
+    def setUp(self):
+        venue = Venue.query.order_by(Venue.id).first()
+        artist = Artist.query.order_by(Artist.id).first()
+        if not venue or not artist:
+            self.skipTest('No venues or artists in the database')
+        self.venue_id, self.artist_id = venue.id, artist.id
+        self.client = app.test_client()
+        # A day far enough in the future not to collide with other shows
+        self.day = datetime(2100, 1, 1) + timedelta(days=random.randrange(100000))
+
+    def tearDown(self):
+        db.session.remove()
+        Show.query \
+            .filter(Show.start_time >= self.day, Show.start_time < self.day + timedelta(days=2)) \
+            .delete(synchronize_session=False)
+        refresh_show_counters(Venue, [self.venue_id])
+        refresh_show_counters(Artist, [self.artist_id])
+        db.session.commit()
+
+    def show(self, start_hour, end_hour=None):
+        show = {
+            "artist_id": self.artist_id,
+            "venue_id": self.venue_id,
+            "start_time": (self.day + timedelta(hours=start_hour)).isoformat()
+        }
+        if end_hour is not None:
+            show["end_time"] = (self.day + timedelta(hours=end_hour)).isoformat()
+        return show
+
+    def post(self, shows):
+        db.session.remove()
+        response = self.client.post('/shows/batch', json=shows)
+        return response.status_code, response.get_json()
+
+    def availability(self, entity, item_id, **args):
+        response = self.client.get('/api/v1/{}/{}/availability'.format(entity, item_id), query_string=args)
+        return response.status_code, response.get_json()
+
+    def test_default_length(self):
+        self.assertEqual(self.post([self.show(18)])[0], 201)
+        show = Show.query.filter(Show.start_time == self.day + timedelta(hours=18)).one()
+        self.assertEqual(show.end_time - show.start_time, timedelta(minutes=app.config['SHOW_DURATION_MINUTES']))
+
+    def test_overlap_conflicts(self):
+        self.assertEqual(self.post([self.show(18, 20)])[0], 201)
+        status, data = self.post([self.show(19, 21), self.show(20, 22), self.show(21, 23)])
+        self.assertEqual(status, 400)
+        self.assertEqual([error["index"] for error in data["errors"]], [0, 2])
+        self.assertIn('row 1', ' '.join(data["errors"][1]["errors"]))
+
+    def test_invalid_end_time(self):
+        status, data = self.post([self.show(18, 17)])
+        self.assertEqual(status, 400)
+        self.assertEqual(data["errors"][0]["index"], 0)
+
+    def test_free_windows(self):
+        self.assertEqual(self.post([self.show(12, 14), self.show(18, 20)])[0], 201)
+        for entity, item_id in (('venues', self.venue_id), ('artists', self.artist_id)):
+            status, data = self.availability(entity, item_id,
+                                             **{"from": (self.day + timedelta(hours=10)).isoformat(),
+                                                "to": (self.day + timedelta(hours=22)).isoformat(),
+                                                "min_minutes": 150})
+            self.assertEqual(status, 200)
+            self.assertEqual(data["data"], [
+                {"start_time": (self.day + timedelta(hours=14)).isoformat(),
+                 "end_time": (self.day + timedelta(hours=18)).isoformat()}
+            ])
+
+    def test_offset_times(self):
+        self.assertEqual(self.post([self.show(18, 20)])[0], 201)
+        # Converted to UTC, like the naive times of the database
+        status, data = self.post([
+            dict(self.show(19), start_time=(self.day + timedelta(hours=21)).isoformat() + '+02:00'),
+            dict(self.show(21), start_time=(self.day + timedelta(hours=22)).isoformat() + 'Z'),
+        ])
+        self.assertEqual(status, 400)
+        self.assertEqual([error["index"] for error in data["errors"]], [0])
+        status, data = self.availability('venues', self.venue_id,
+                                         **{"from": (self.day + timedelta(hours=17)).isoformat() + 'Z',
+                                            "to": (self.day + timedelta(hours=21)).isoformat() + 'Z'})
+        self.assertEqual(status, 200)
+        self.assertEqual(data["data"], [
+            {"start_time": (self.day + timedelta(hours=17)).isoformat(),
+             "end_time": (self.day + timedelta(hours=18)).isoformat()},
+            {"start_time": (self.day + timedelta(hours=20)).isoformat(),
+             "end_time": (self.day + timedelta(hours=21)).isoformat()},
+        ])
+
+    def test_invalid_range(self):
+        self.assertEqual(self.availability('venues', self.venue_id, **{"from": 'soon'})[0], 400)
+        self.assertEqual(self.availability('venues', self.venue_id,
+                                           **{"from": '2100-01-02', "to": '2100-01-01'})[0], 400)
+        self.assertEqual(self.availability('venues', 0)[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
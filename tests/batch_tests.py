@@ -0,0 +1,94 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from testing import *
+
+
+class ShowBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        venue = Venue.query.order_by(Venue.id).first()
+        artist = Artist.query.order_by(Artist.id).first()
+        if not venue or not artist:
+            self.skipTest('No venues or artists in the database')
+        self.venue_id, self.artist_id = venue.id, artist.id
+        self.client = app.test_client()
+        # Far enough in the future not to collide with other shows
+        self.start = datetime(2100, 1, 1) + timedelta(hours=random.randrange(100000) * 24)
+        self.statements = []
+
+    def tearDown(self):
+        db.session.remove()
+        Show.query \
+            .filter(Show.start_time >= self.start, Show.start_time < self.start + timedelta(days=30)) \
+            .delete(synchronize_session=False)
+        refresh_show_counters(Venue, [self.venue_id])
+        refresh_show_counters(Artist, [self.artist_id])
+        db.session.commit()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def show(self, hours, artist_id=None, venue_id=None):
+        return {
+            "artist_id": self.artist_id if artist_id is None else artist_id,
+            "venue_id": self.venue_id if venue_id is None else venue_id,
+            "start_time": (self.start + timedelta(hours=hours)).isoformat()
+        }
+
+    def post(self, shows):
+        db.session.remove()
+        response = self.client.post('/shows/batch', json=shows)
+        return response.status_code, response.get_json()
+
+    def test_create(self):
+        upcoming = Venue.query.get(self.venue_id).upcoming_shows_count
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+        try:
+            status, data = self.post([self.show(hours) for hours in range(0, 100, 5)])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        self.assertEqual((status, data), (201, {"created": 20}))
+
+        inserts = [statement for statement in self.statements if statement.lstrip().upper().startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        # Validation, insert and counters: the same queries whatever the batch size
+        self.assertLessEqual(len(self.statements), 8, '\n\n'.join(self.statements))
+
+        db.session.remove()
+        self.assertEqual(Venue.query.get(self.venue_id).upcoming_shows_count, upcoming + 20)
+
+    def test_triples(self):
+        show = self.show(0)
+        status, data = self.post([[show["artist_id"], show["venue_id"], show["start_time"]]])
+        self.assertEqual(status, 201)
+
+    def test_row_errors(self):
+        status, data = self.post([
+            self.show(0),
+            self.show(1, artist_id=0),
+            dict(self.show(2), start_time='tomorrow'),
+            self.show(0),
+            'show',
+        ])
+        self.assertEqual(status, 400)
+        self.assertEqual(data["created"], 0)
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2, 3, 4])
+        self.assertIn('Unknown artist 0', data["errors"][0]["errors"])
+        self.assertIn('row 0', ' '.join(data["errors"][2]["errors"]))
+        self.assertEqual(Show.query.filter(Show.start_time == self.start).count(), 0)
+
+    def test_existing_show_conflict(self):
+        self.assertEqual(self.post([self.show(0)])[0], 201)
+        status, data = self.post([self.show(0)])
+        self.assertEqual(status, 400)
+        self.assertEqual(len(data["errors"][0]["errors"]), 2)
+
+    def test_invalid_body(self):
+        self.assertEqual(self.post({"shows": []})[0], 400)
+        self.assertEqual(self.post([])[0], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+from unittest import mock
+from flask import Flask
+from cache import LRUCache, MemoryBackend, RedisBackend, ResponseCache
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.invalidate('a')
+        cache.invalidate('missing')
+        self.assertIsNone(cache.get('a'))
+
+
+class MemoryBackendTests(unittest.TestCase):
+
+    def test_timeout(self):
+        backend = MemoryBackend(timeout=60)
+        with mock.patch('cache.time.monotonic', return_value=1000):
+            backend.set('a', b'1')
+            backend.incr('counter')
+        with mock.patch('cache.time.monotonic', return_value=1059):
+            self.assertEqual(backend.get('a'), b'1')
+        with mock.patch('cache.time.monotonic', return_value=1060):
+            self.assertIsNone(backend.get('a'))
+            # Counters never expire, or the entries they invalidated would come back
+            self.assertEqual(backend.get_counter('counter'), 1)
+
+    def test_counters_bounded(self):
+        backend = MemoryBackend(counters_maxsize=2)
+        backend.incr('a')
+        backend.incr('b')
+        backend.incr('b')
+        seen = {key: backend.get_counter(key) for key in ('a', 'b', 'c')}
+        backend.incr('c')
+        self.assertEqual(len(backend.counters), 2)
+        # 'a' was evicted: it and the counters never set move past every value they had
+        self.assertGreater(backend.get_counter('a'), seen['a'])
+        self.assertGreater(backend.get_counter('d'), seen['c'])
+        self.assertEqual(backend.get_counter('b'), seen['b'])
+
+    def test_no_timeout(self):
+        backend = MemoryBackend()
+        backend.set('a', b'1')
+        with mock.patch('cache.time.monotonic', return_value=float('inf')):
+            self.assertEqual(backend.get('a'), b'1')
+
+
+class FakeRedis:
+    """Stand-in for the subset of the redis-py client used by RedisBackend."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def make_backend(self):
+        return MemoryBackend()
+
+    def setUp(self):
+        self.calls = 0
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        self.cache = ResponseCache(self.app, backend=self.make_backend())
+
+        @self.app.route('/items')
+        @self.cache.cached
+        def items():
+            self.calls += 1
+            return 'items {}'.format(self.calls)
+
+        @self.app.route('/items/<int:item_id>')
+        @self.cache.cached
+        def show_item(item_id):
+            self.calls += 1
+            return 'item {} {}'.format(item_id, self.calls)
+
+        self.client = self.app.test_client()
+
+    def test_cached(self):
+        self.assertEqual(self.client.get('/items').data, b'items 1')
+        self.assertEqual(self.client.get('/items').data, b'items 1')
+        self.assertEqual(self.client.get('/items?page=2').data, b'items 2')
+
+    def test_invalidate_endpoint(self):
+        self.client.get('/items')
+        self.client.get('/items/1')
+        with self.app.app_context():
+            self.cache.invalidate('items')
+        self.assertEqual(self.client.get('/items').data, b'items 3')
+        self.assertEqual(self.client.get('/items/1').data, b'item 1 2')
+
+    def test_invalidate_view_args(self):
+        self.client.get('/items/1')
+        self.client.get('/items/2')
+        self.cache.invalidate('show_item', item_id=1)
+        self.assertEqual(self.client.get('/items/1').data, b'item 1 3')
+        self.assertEqual(self.client.get('/items/2').data, b'item 2 2')
+
+    def test_invalidate_all_view_args(self):
+        self.client.get('/items/1')
+        self.cache.invalidate('show_item')
+        self.assertEqual(self.client.get('/items/1').data, b'item 1 2')
+
+    def test_etag_not_modified(self):
+        response = self.client.get('/items')
+        etag = response.headers['ETag']
+        response = self.client.get('/items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+
+class RedisResponseCacheTests(ResponseCacheTests):
+
+    def make_backend(self):
+        return RedisBackend(FakeRedis())
@@ -0,0 +1,123 @@
+import random
+import unittest
+from datetime import date, datetime, timedelta
+from testing import *
+from aggregation import bucket_start, bucket_starts, parse_period
+
+
+class BucketTests(unittest.TestCase):
+
+    def test_bucket_start(self):
+        # 2030-01-02 is a Wednesday
+        self.assertEqual(bucket_start(datetime(2030, 1, 2, 20), 'day'), date(2030, 1, 2))
+        self.assertEqual(bucket_start(datetime(2030, 1, 2, 20), 'week'), date(2029, 12, 31))
+        self.assertEqual(bucket_start(date(2029, 12, 31), 'week'), date(2029, 12, 31))
+
+    def test_bucket_starts(self):
+        self.assertEqual(bucket_starts(datetime(2030, 1, 1, 12), datetime(2030, 1, 3), 'day'),
+                         [date(2030, 1, 1), date(2030, 1, 2)])
+        self.assertEqual(bucket_starts(datetime(2030, 1, 2), datetime(2030, 1, 8, 1), 'week'),
+                         [date(2029, 12, 31), date(2030, 1, 7)])
+
+    def test_parse_period(self):
+        self.assertEqual(parse_period('2030-01-02'), date(2030, 1, 2))
+        self.assertEqual(parse_period(datetime(2030, 1, 2)), date(2030, 1, 2))
+
+
+class CalendarTests(unittest.TestCase):
+
+    def setUp(self):
+        venue = Venue.query.order_by(Venue.id).first()
+        artist = Artist.query.order_by(Artist.id).first()
+        if not venue or not artist:
+            self.skipTest('No venues or artists in the database')
+        self.venue_id, self.artist_id = venue.id, artist.id
+        self.city, self.state = venue.address.city.name, venue.address.city.state.name
+        self.genres = [genre.name for genre in artist.genres]
+        self.client = app.test_client()
+        # A Monday long gone, free of other shows: its buckets are closed
+        self.day = datetime(1900, 1, 1) + timedelta(weeks=random.randrange(5000))
+
+    def tearDown(self):
+        db.session.remove()
+        Show.query \
+            .filter(Show.start_time >= self.day, Show.start_time < self.day + timedelta(days=7)) \
+            .delete(synchronize_session=False)
+        refresh_show_counters(Venue, [self.venue_id])
+        refresh_show_counters(Artist, [self.artist_id])
+        db.session.commit()
+        calendar_cache.invalidate()
+
+    def post(self, *hours):
+        db.session.remove()
+        shows = [{
+            "artist_id": self.artist_id,
+            "venue_id": self.venue_id,
+            "start_time": (self.day + timedelta(hours=hour)).isoformat()
+        } for hour in hours]
+        self.assertEqual(self.client.post('/shows/batch', json=shows).status_code, 201)
+
+    def calendar(self, **args):
+        db.session.remove()
+        args.setdefault("from", self.day.isoformat())
+        args.setdefault("to", (self.day + timedelta(days=7)).isoformat())
+        response = self.client.get('/api/v1/shows/calendar', query_string=args)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def counts(self, data, key):
+        return {bucket["start"]: {counts[key]: counts["count"] for counts in bucket["counts"]}
+                for bucket in data["data"] if bucket["counts"]}
+
+    def test_day_counts(self):
+        self.post(10, 20, 30)
+        data = self.calendar(by='venue')
+        self.assertEqual(len(data["data"]), 7)
+        self.assertEqual(self.counts(data, 'venue_id'), {
+            self.day.date().isoformat(): {self.venue_id: 2},
+            (self.day + timedelta(days=1)).date().isoformat(): {self.venue_id: 1},
+        })
+
+    def test_week_counts(self):
+        self.post(10, 30)
+        data = self.calendar(bucket='week', by='city')
+        self.assertEqual(data["data"], [{
+            "start": self.day.date().isoformat(),
+            "counts": [{"city": self.city, "state": self.state, "count": 2}]
+        }])
+        genres = self.counts(self.calendar(bucket='week', by='genre'), 'genre')
+        self.assertEqual(genres.get(self.day.date().isoformat(), {}),
+                         {genre: 2 for genre in self.genres})
+
+    def test_closed_buckets_cached(self):
+        self.post(10)
+        self.calendar(by='venue')
+        # Not seen by the cached buckets until the cache is invalidated
+        db.session.add(Show(artist_id=self.artist_id, venue_id=self.venue_id,
+                            start_time=self.day + timedelta(hours=12)))
+        db.session.commit()
+        self.assertEqual(self.counts(self.calendar(by='venue'), 'venue_id'),
+                         {self.day.date().isoformat(): {self.venue_id: 1}})
+        # Past shows created through the controllers invalidate it
+        self.post(14)
+        self.assertEqual(self.counts(self.calendar(by='venue'), 'venue_id'),
+                         {self.day.date().isoformat(): {self.venue_id: 3}})
+
+    def test_offset_range(self):
+        self.post(10, 30)
+        # Converted to UTC, like the naive times of the database
+        data = self.calendar(by='venue', **{"from": self.day.isoformat() + '+02:00',
+                                            "to": (self.day + timedelta(days=1)).isoformat() + 'Z'})
+        self.assertEqual(self.counts(data, 'venue_id'), {self.day.date().isoformat(): {self.venue_id: 1}})
+        response = self.client.get('/api/v1/shows/calendar', query_string={"to": '2030-01-01T00:00Z'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_arguments(self):
+        for args in ({"bucket": 'year'}, {"by": 'artist'}, {"from": 'soon'},
+                     {"from": '2030-01-02', "to": '2030-01-01'}, {"from": '2000-01-01', "to": '2030-01-01'}):
+            response = self.client.get('/api/v1/shows/calendar', query_string=args)
+            self.assertEqual(response.status_code, 400, args)
+
+
+if __name__ == '__main__':
+    unittest.main()
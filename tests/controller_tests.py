@@ -0,0 +1,121 @@
+import unittest
+from sqlalchemy import event
+from testing import *
+from nplusone import NPlusOneError, normalize_statement
+from query_tests import random_string
+
+
+class ControllerQueryCountTests(unittest.TestCase):
+
+    def setUp(self):
+        app.config['RESPONSE_CACHE_ENABLED'] = False
+        app.testing = True
+        self.client = app.test_client()
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def tearDown(self):
+        app.config['RESPONSE_CACHE_ENABLED'] = True
+        app.testing = False
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def assertMaxQueries(self, url, max_queries):
+        # Start from an empty identity map so that every page loads its own graph
+        db.session.remove()
+        self.statements = []
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(self.statements), max_queries, '\n\n'.join(self.statements))
+
+    def first_id(self, model):
+        instance = model.query.first()
+        if not instance:
+            self.skipTest('No {} rows in the database'.format(model.__tablename__))
+        return instance.id
+
+    def test_venues_queries(self):
+        self.assertMaxQueries('/venues', 1)
+
+    def test_artists_queries(self):
+        self.assertMaxQueries('/artists', 1)
+
+    def test_shows_queries(self):
+        self.assertMaxQueries('/shows', 1)
+
+    def test_show_venue_queries(self):
+        venue_id = self.first_id(Venue)
+        self.assertMaxQueries('/venues/{}'.format(venue_id), 3)
+
+    def test_show_artist_queries(self):
+        artist_id = self.first_id(Artist)
+        self.assertMaxQueries('/artists/{}'.format(artist_id), 3)
+
+    def test_edit_venue_queries(self):
+        venue_id = self.first_id(Venue)
+        self.assertMaxQueries('/venues/{}/edit'.format(venue_id), 2)
+
+    def test_edit_artist_queries(self):
+        artist_id = self.first_id(Artist)
+        self.assertMaxQueries('/artists/{}/edit'.format(artist_id), 2)
+
+    def test_search_queries(self):
+        db.session.remove()
+        response = self.client.post('/shows/search', data={"search_term": 'a'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_date_range(self):
+        db.session.remove()
+        # Converted to UTC, like the naive times of the database
+        response = self.client.post('/shows/search', data={"start_date": '2030-01-01T00:00:00+02:00',
+                                                           "end_date": '2030-01-02T00:00:00Z'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/shows/search', data={"start_date": 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_venue_new_genres(self):
+        db.session.remove()
+        response = self.client.post('/venues/create', data={
+            "name": random_string(),
+            "address": random_string(),
+            "city": 'San Francisco',
+            "state": 'CA',
+            "genres": [random_string() for _ in range(4)]
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_missing(self):
+        db.session.remove()
+        self.assertEqual(self.client.post('/venues/0').status_code, 404)
+        self.assertEqual(self.client.post('/artists/0').status_code, 404)
+
+
+class NPlusOneTests(unittest.TestCase):
+
+    def test_normalize_statement(self):
+        self.assertEqual(normalize_statement('SELECT * FROM "Venue"\nWHERE id IN (?, ?, ?) LIMIT 20'),
+                         normalize_statement('SELECT * FROM "Venue" WHERE id IN (?) LIMIT 5'))
+
+    def test_lazy_loads_raise(self):
+        db.session.remove()
+        venues = Venue.query.limit(3).all()
+        if len({venue.address_id for venue in venues}) < 3:
+            self.skipTest('Needs 3 venues with distinct addresses')
+        db.session.expire_all()
+        with app.test_request_context():
+            nplusone.before_request()
+            venues = Venue.query.limit(3).all()
+            for venue in venues:
+                venue.address.name
+            with self.assertRaises(NPlusOneError):
+                nplusone.after_request(Response())
+
+    def test_eager_loads_pass(self):
+        db.session.remove()
+        with app.test_request_context():
+            nplusone.before_request()
+            for venue in load_profile(Venue.query, 'venue_detail').limit(3):
+                venue.address.city.state.name
+            nplusone.after_request(Response())
@@ -0,0 +1,32 @@
+import json
+import unittest
+from datetime import datetime
+from testing import *
+from exporter import serialize
+
+
+class ExportTests(unittest.TestCase):
+
+    def test_serialize_csv(self):
+        rows = [{"id": 1, "venue_id": 2, "artist_id": 3,
+                 "start_time": datetime(2035, 4, 1, 20), "end_time": datetime(2035, 4, 1, 22)}]
+        self.assertEqual(list(serialize(rows, 'shows', 'csv')),
+                         ['id,venue_id,artist_id,start_time,end_time\r\n',
+                          '1,2,3,2035-04-01T20:00:00,2035-04-01T22:00:00\r\n'])
+
+    def test_serialize_jsonl(self):
+        rows = [{"id": 1, "venue_id": 2, "artist_id": 3,
+                 "start_time": datetime(2035, 4, 1, 20), "end_time": datetime(2035, 4, 1, 22)}]
+        line, = serialize(rows, 'shows', 'jsonl')
+        self.assertEqual(json.loads(line)["start_time"], '2035-04-01T20:00:00')
+
+    def test_export_endpoint(self):
+        response = app.test_client().get('/export/artists.jsonl')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), Artist.query.count())
+        self.assertIn('genres', json.loads(lines[0]))
+
+    def test_export_unknown_entity(self):
+        self.assertEqual(app.test_client().get('/export/genres.csv').status_code, 404)
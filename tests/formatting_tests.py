@@ -0,0 +1,57 @@
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+import babel.dates
+from formatting import DATETIME_FORMATS, DatetimeFormatter, parse_datetime, utcnow
+
+
+class DatetimeFormatterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.value = datetime(2035, 4, 1, 20, 0)
+
+    def test_same_as_babel(self):
+        formatter = DatetimeFormatter()
+        for name, pattern in DATETIME_FORMATS.items():
+            self.assertEqual(formatter(self.value, name), babel.dates.format_datetime(self.value, pattern))
+
+    def test_string_value(self):
+        formatter = DatetimeFormatter()
+        self.assertEqual(formatter('2035-04-01 20:00:00', 'full'), formatter(self.value, 'full'))
+        self.assertEqual(formatter(self.value, 'full'), 'Sunday April, 1, 2035 at 8:00PM')
+
+    def test_locale_formats(self):
+        formatter = DatetimeFormatter()
+        self.assertEqual(formatter(self.value, 'short'), babel.dates.format_datetime(self.value, 'short'))
+
+    def test_memo(self):
+        formatter = DatetimeFormatter(cache_size=2)
+        first = formatter(self.value, 'full')
+        self.assertEqual(formatter(self.value, 'full'), first)
+        self.assertEqual(formatter.cache.stats()["hits"], 1)
+
+
+class DatetimeParsingTests(unittest.TestCase):
+
+    def test_parse_datetime(self):
+        self.assertEqual(parse_datetime('2030-01-01T20:00:00'), datetime(2030, 1, 1, 20))
+        self.assertEqual(parse_datetime('2030-01-01T20:00:00+02:00'), datetime(2030, 1, 1, 18))
+        with self.assertRaises(ValueError):
+            parse_datetime('soon')
+
+    @unittest.skipUnless(hasattr(time, 'tzset'), 'Needs time.tzset')
+    def test_utcnow_ignores_local_time(self):
+        previous = os.environ.get('TZ')
+        os.environ['TZ'] = 'Etc/GMT-5'
+        time.tzset()
+        try:
+            now = utcnow()
+            self.assertIsNone(now.tzinfo)
+            self.assertLess(abs(datetime.now() - timedelta(hours=5) - now), timedelta(seconds=5))
+        finally:
+            if previous is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
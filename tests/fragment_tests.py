@@ -0,0 +1,105 @@
+import unittest
+from flask import render_template_string
+from jinja2 import TemplateSyntaxError
+from testing import *
+from cache import MemoryBackend
+
+
+class FragmentCacheTests(unittest.TestCase):
+
+    template = "{% for item in items %}{% cache 'venue', item.id %}{{ render(item) }}{% endcache %}{% endfor %}"
+
+    def setUp(self):
+        self.rendered = []
+
+    def render(self, item):
+        self.rendered.append(item["id"])
+        return '<li>{}</li>'.format(item["name"])
+
+    def render_items(self, items, prefetch=False):
+        with app.test_request_context():
+            if prefetch:
+                fragment_cache.prefetch([('venue', item["id"]) for item in items])
+            return render_template_string(self.template, items=items, render=self.render)
+
+    def test_cached_until_bumped(self):
+        venue_id = random_id()
+        items = [{"id": venue_id, "name": 'Hop'}, {"id": venue_id + 1, "name": 'Bar'}]
+        self.assertEqual(self.render_items(items), '&lt;li&gt;Hop&lt;/li&gt;&lt;li&gt;Bar&lt;/li&gt;')
+        self.render_items(items)
+        self.assertEqual(self.rendered, [venue_id, venue_id + 1])
+
+        fragment_cache.bump('venue', venue_id)
+        items[0]["name"] = 'Musical Hop'
+        self.assertIn('Musical Hop', self.render_items(items))
+        self.assertEqual(self.rendered, [venue_id, venue_id + 1, venue_id])
+
+    def test_disabled(self):
+        app.config['FRAGMENT_CACHE_ENABLED'] = False
+        try:
+            items = [{"id": random_id(), "name": 'Hop'}]
+            self.render_items(items)
+            self.render_items(items)
+            self.assertEqual(len(self.rendered), 2)
+        finally:
+            app.config['FRAGMENT_CACHE_ENABLED'] = True
+
+    def test_prefetch(self):
+        backend = fragment_cache.backend
+        fragment_cache.backend = CountingBackend()
+        try:
+            venue_id = random_id()
+            items = [{"id": venue_id + index, "name": 'Hop {}'.format(index)} for index in range(20)]
+            self.render_items(items, prefetch=True)
+            fragment_cache.backend.reads = 0
+            self.assertIn('Hop 19', self.render_items(items, prefetch=True))
+            self.assertEqual(len(self.rendered), 20)
+            # The versions, then the fragments, of the whole page
+            self.assertEqual(fragment_cache.backend.reads, 2)
+            fragment_cache.bump('venue', items[0]["id"])
+            self.render_items(items, prefetch=True)
+            self.assertEqual(len(self.rendered), 21)
+        finally:
+            fragment_cache.backend = backend
+
+    def test_pairs_required(self):
+        with self.assertRaises(TemplateSyntaxError):
+            app.jinja_env.from_string("{% cache 'venue' %}{% endcache %}")
+
+    def test_edit_refreshes_listing(self):
+        app.config['RESPONSE_CACHE_ENABLED'] = False
+        try:
+            client = app.test_client()
+            artist = Artist.query.first()
+            if not artist:
+                self.skipTest('No artists in the database')
+            # Read before the requests, whose teardown detaches the artist
+            artist_id, name = artist.id, artist.name
+            data = {"name": name + ' Renamed', "city": artist.city.name, "state": artist.city.state.name,
+                    "genres": [genre.name for genre in artist.genres]}
+            client.get('/artists?limit=100')
+            client.post('/artists/{}/edit'.format(artist_id), data=data)
+            db.session.remove()
+            self.assertIn(name + ' Renamed', client.get('/artists?limit=100').get_data(as_text=True))
+            client.post('/artists/{}/edit'.format(artist_id), data=dict(data, name=name))
+        finally:
+            app.config['RESPONSE_CACHE_ENABLED'] = True
+
+
+class CountingBackend(MemoryBackend):
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_many(self, keys):
+        self.reads += 1
+        return super().get_many(keys)
+
+    def get_counters(self, keys):
+        self.reads += 1
+        return super().get_counters(keys)
+
+
+def random_id():
+    return id(object())
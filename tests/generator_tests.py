@@ -0,0 +1,29 @@
+import unittest
+from collections import Counter
+from benchmarks.generator import generate_venues, generate_artists, generate_shows
+
+
+class GeneratorTests(unittest.TestCase):
+
+    def test_deterministic(self):
+        self.assertEqual(list(generate_venues(50, seed=1)), list(generate_venues(50, seed=1)))
+        self.assertNotEqual(list(generate_venues(50, seed=1)), list(generate_venues(50, seed=2)))
+
+    def test_prefix_stable(self):
+        self.assertEqual(list(generate_artists(10)), list(generate_artists(100))[:10])
+
+    def test_skewed_spread(self):
+        cities = Counter(row["city"] for row in generate_venues(2000))
+        (top_city, top_count), = cities.most_common(1)
+        self.assertEqual(top_city, 'New York')
+        self.assertGreater(top_count, 2000 / len(cities) * 10)
+
+    def test_shows_reference_given_ids(self):
+        shows = list(generate_shows(100, [10, 20, 30], [7, 8]))
+        self.assertTrue(all(row["venue_id"] in (10, 20, 30) for row in shows))
+        self.assertTrue(all(row["artist_id"] in (7, 8) for row in shows))
+
+    def test_shows_not_double_booked(self):
+        shows = list(generate_shows(2000, [10, 20, 30], [7, 8]))
+        self.assertEqual(len({(row["venue_id"], row["start_time"]) for row in shows}), len(shows))
+        self.assertEqual(len({(row["artist_id"], row["start_time"]) for row in shows}), len(shows))
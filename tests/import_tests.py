@@ -0,0 +1,69 @@
+import random
+import unittest
+from testing import *
+from importer import chunks, import_rows, parse_genres
+from query_tests import random_string
+
+
+class ImportTests(unittest.TestCase):
+
+    def test_chunks(self):
+        self.assertEqual(list(chunks(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_parse_genres(self):
+        self.assertEqual(parse_genres('Jazz; Blues;'), ['Jazz', 'Blues'])
+        self.assertEqual(parse_genres(['Jazz']), ['Jazz'])
+        self.assertEqual(parse_genres(None), [])
+
+    def test_import_artists_and_shows(self):
+        name = random_string()
+        rows = [{"name": name, "city": "San Francisco", "state": "CA", "genres": "Jazz;" + name}]
+        self.assertEqual(import_rows('artists', rows, report=lambda message: None), 1)
+        artist = Artist.query.filter_by(name=name).one()
+        self.assertEqual(artist.city.name, 'San Francisco')
+        self.assertEqual(sorted(genre.name for genre in artist.genres), sorted(['Jazz', name]))
+
+        venue = Venue.query.first()
+        shows = [{"venue_id": venue.id, "artist_id": artist.id, "start_time": "2100-01-01T20:00:00"}]
+        import_rows('shows', shows, report=lambda message: None)
+        db.session.refresh(artist)
+        self.assertEqual(artist.upcoming_shows_count, 1)
+
+    def test_invalid_shows_skipped(self):
+        venue, artist = Venue.query.first(), Artist.query.first()
+        show = {"venue_id": venue.id, "artist_id": artist.id}
+        rows = [dict(show, start_time="2100-01-02T20:00:00", end_time="2100-01-05T20:00:00"),
+                dict(show, start_time="2100-01-02T20:00:00", end_time="2100-01-02T19:00:00"),
+                dict(show, start_time="tomorrow")]
+        messages = []
+        self.assertEqual(import_rows('shows', rows, chunk_size=2, report=messages.append), 0)
+        self.assertEqual([message.split(':')[0] for message in messages if message.startswith('Skipped')],
+                         ['Skipped row 1', 'Skipped row 2', 'Skipped row 3'])
+        self.assertEqual(Show.query.filter(Show.start_time == datetime(2100, 1, 2, 20)).count(), 0)
+
+    def test_conflicting_shows_skipped(self):
+        venue, artist = Venue.query.first(), Artist.query.first()
+        other_artist = Artist.query.filter(Artist.id != artist.id).first()
+        if not venue or not other_artist:
+            self.skipTest('No venues or artists in the database')
+        # A day far enough in the future not to collide with other shows
+        day = datetime(2100, 1, 1) + timedelta(days=random.randrange(100000))
+        show = {"venue_id": venue.id, "artist_id": artist.id}
+        rows = [dict(show, start_time=(day + timedelta(hours=20)).isoformat()),
+                dict(show, artist_id=other_artist.id, start_time=(day + timedelta(hours=20, minutes=30)).isoformat()),
+                dict(show, start_time=(day + timedelta(hours=22)).isoformat()),
+                dict(show, start_time=(day + timedelta(hours=22, minutes=30)).isoformat())]
+        messages = []
+        try:
+            # The last row overlaps the third one, committed with the previous chunk
+            self.assertEqual(import_rows('shows', rows, chunk_size=3, report=messages.append), 2)
+            self.assertEqual([message.split(':')[0] for message in messages if message.startswith('Skipped')],
+                             ['Skipped row 2', 'Skipped row 4'])
+            self.assertEqual(Show.query.filter(Show.start_time >= day, Show.start_time < day + timedelta(days=1))
+                             .count(), 2)
+        finally:
+            Show.query.filter(Show.start_time >= day, Show.start_time < day + timedelta(days=1)) \
+                .delete(synchronize_session=False)
+            refresh_show_counters(Venue, [venue.id])
+            refresh_show_counters(Artist, [artist.id, other_artist.id])
+            db.session.commit()
@@ -0,0 +1,72 @@
+import json
+import tempfile
+import unittest
+from sqlalchemy import create_engine, exc
+from testing import *
+from pooling import MeteredQueuePool, engine_options, pool_status, render_pool_metrics
+
+
+class EngineOptionsTests(unittest.TestCase):
+
+    def config(self, uri):
+        return {
+            "SQLALCHEMY_DATABASE_URI": uri,
+            "DB_POOL_SIZE": 5,
+            "DB_MAX_OVERFLOW": 10,
+            "DB_POOL_TIMEOUT": 30,
+            "DB_POOL_RECYCLE": 1800,
+            "DB_POOL_PRE_PING": True,
+            "DB_STATEMENT_TIMEOUT": 30000
+        }
+
+    def test_postgresql(self):
+        options = engine_options(self.config('postgresql://user:password@db:5432/fyyur'))
+        self.assertIs(options["poolclass"], MeteredQueuePool)
+        self.assertEqual(options["pool_size"], 5)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["connect_args"], {"options": '-c statement_timeout=30000'})
+
+    def test_sqlite(self):
+        self.assertEqual(engine_options(self.config('sqlite://')), {})
+
+
+class MeteredQueuePoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.file = tempfile.NamedTemporaryFile(suffix='.db')
+        self.engine = create_engine('sqlite:///' + self.file.name, poolclass=MeteredQueuePool,
+                                    pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.file.close()
+
+    def test_checkout_metrics(self):
+        with self.engine.connect() as connection:
+            self.assertEqual(pool_status(self.engine.pool)["saturation"], 1.0)
+            with self.assertRaises(exc.TimeoutError):
+                self.engine.connect()
+        metrics = self.engine.pool.checkout_metrics
+        self.assertEqual(metrics.count, 2)
+        self.assertEqual(metrics.timeouts, 1)
+        self.assertEqual(pool_status(self.engine.pool)["checked_out"], 0)
+
+    def test_render(self):
+        with self.engine.connect():
+            text = render_pool_metrics(self.engine.pool)
+        self.assertIn('fyyur_db_pool_checked_out 1', text)
+        self.assertIn('fyyur_db_pool_checkout_wait_seconds_count 1', text)
+
+    def test_metrics_kept_on_dispose(self):
+        with self.engine.connect():
+            pass
+        self.engine.dispose()
+        self.assertEqual(self.engine.pool.checkout_metrics.count, 1)
+
+
+class ReadyTests(unittest.TestCase):
+
+    def test_ready(self):
+        response = app.test_client().get('/_ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data())["database"], 'ok')
@@ -0,0 +1,64 @@
+import unittest
+from testing import *
+from profiling import Metrics, RequestProfile
+
+
+class MetricsTests(unittest.TestCase):
+
+    def test_slow_queries(self):
+        metrics = Metrics(slow_queries=2)
+        profile = RequestProfile()
+        profile.add_query('SELECT 1', 0.3)
+        profile.add_query('SELECT\n  2', 0.1)
+        profile.add_query('SELECT 3', 0.2)
+        metrics.record('venues', profile, 0.5)
+        profile = RequestProfile()
+        profile.add_query('SELECT 1', 0.4)
+        metrics.record('venues', profile, 0.5)
+
+        self.assertEqual(metrics.endpoints['venues'].slow_queries, [(0.4, 'SELECT 1'), (0.2, 'SELECT 3')])
+        self.assertEqual(metrics.endpoints['venues'].queries, 4)
+
+    def test_render(self):
+        metrics = Metrics()
+        profile = RequestProfile()
+        profile.add_query('SELECT "name"', 0.01)
+        metrics.record('venues', profile, 0.02)
+        text = metrics.render()
+        self.assertIn('fyyur_request_duration_seconds_bucket{endpoint="venues",le="0.025"} 1', text)
+        self.assertIn('fyyur_db_queries_total{endpoint="venues"} 1', text)
+        self.assertIn('statement="SELECT \\"name\\""', text)
+
+
+class RequestProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        app.config['RESPONSE_CACHE_ENABLED'] = False
+        app.config['METRICS_TOKEN'] = 'secret'
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['RESPONSE_CACHE_ENABLED'] = True
+        app.config['METRICS_TOKEN'] = None
+
+    def test_server_timing(self):
+        response = self.client.get('/artists')
+        timing = response.headers['Server-Timing']
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('render;dur=', timing)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/artists')
+        response = self.client.get('/_metrics', headers={"Authorization": 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        self.assertIn('fyyur_db_queries_total{endpoint="artists"}', text)
+        self.assertNotIn('endpoint="metrics"', text)
+
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get('/_metrics').status_code, 401)
+        response = self.client.get('/_metrics', headers={"Authorization": 'Bearer guess'})
+        self.assertEqual(response.status_code, 401)
+        app.config['METRICS_TOKEN'] = None
+        response = self.client.get('/_metrics', headers={"Authorization": 'Bearer None'})
+        self.assertEqual(response.status_code, 404)
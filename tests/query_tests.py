@@ -1,7 +1,7 @@
 import unittest
 import random
 import string
-from app import *
+from testing import *
 
 
 class QueryUnitTests(unittest.TestCase):
@@ -41,6 +41,91 @@ class QueryUnitTests(unittest.TestCase):
         self.assertTrue(genres)
         self.assertEqual(len(genres), 2)
 
+    def test_find_genres_or_create_cached(self):
+        find_genres_or_create(["Jazz", "Folk"])
+        misses = genre_ids.misses
+        genres = find_genres_or_create(["Jazz", "Folk"])
+        self.assertEqual(genre_ids.misses, misses)
+        self.assertEqual(sorted(genre.name for genre in genres), ["Folk", "Jazz"])
+
+    def test_find_city_cached(self):
+        address = find_address_or_create('1015 Folsom Street', 'San Francisco', 'CA')
+        city = find_city('San Francisco', 'CA')
+        self.assertEqual(city.id, address.city_id)
+        self.assertEqual(city.state.name, 'CA')
+
+    def test_find_venues_by_area(self):
+        rows = find_venues_by_area().all()
+        self.assertTrue(rows)
+        self.assertEqual(len(rows), Venue.query.count())
+
+    def test_reduce_venues_by_area(self):
+        areas = reduce_venues_by_area(find_venues_by_area().all())
+        self.assertTrue(areas)
+        city_names = [area['city'] for area in areas]
+        self.assertEqual(len(city_names), len(set(city_names)))
+
+    def test_refresh_show_counters(self):
+        venue = Venue.query.first()
+        refresh_show_counters(Venue, [venue.id])
+        db.session.commit()
+        db.session.refresh(venue)
+        upcoming_shows = [show for show in venue.shows if show.start_time > utcnow()]
+        self.assertEqual(venue.upcoming_shows_count, len(upcoming_shows))
+        self.assertEqual(venue.past_shows_count, len(venue.shows) - len(upcoming_shows))
+
+    def test_paginate_artists(self):
+        first_page = paginate(Artist.query, [Artist.name, Artist.id], limit=1)
+        self.assertEqual(len(first_page['items']), 1)
+        self.assertIsNone(first_page['prev_cursor'])
+        if not first_page['next_cursor']:
+            self.skipTest('Not enough artists to paginate')
+        second_page = paginate(Artist.query, [Artist.name, Artist.id],
+                               after=first_page['next_cursor'], limit=1)
+        self.assertNotEqual(second_page['items'][0].id, first_page['items'][0].id)
+        previous_page = paginate(Artist.query, [Artist.name, Artist.id],
+                                 before=second_page['prev_cursor'], limit=1)
+        self.assertEqual(previous_page['items'][0].id, first_page['items'][0].id)
+
+    def test_paginate_venues_by_area(self):
+        venue_ids = []
+        cursor = None
+        while True:
+            page = paginate(find_venues_by_area(), [Venue.name, Venue.id], after=cursor, limit=7,
+                            key=lambda row: [row.venue_name, row.venue_id])
+            for area in reduce_venues_by_area(page['items']):
+                venue_ids.extend(venue['id'] for venue in area['venues'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(sorted(venue_ids), sorted(venue_id for venue_id, in db.session.query(Venue.id)))
+
+    def test_sort_keys_not_null(self):
+        for column in (Venue.name, Artist.name, Show.start_time):
+            self.assertFalse(column.nullable, column)
+
+    def test_paginate_shows_datetime_cursor(self):
+        page = paginate(Show.query, [Show.start_time, Show.id], limit=1)
+        if not page['next_cursor']:
+            self.skipTest('Not enough shows to paginate')
+        next_page = paginate(Show.query, [Show.start_time, Show.id], after=page['next_cursor'], limit=1)
+        self.assertGreaterEqual(next_page['items'][0].start_time, page['items'][0].start_time)
+
+    def test_find_shows_by_artist_name(self):
+        show = Show.query.first()
+        if not show:
+            self.skipTest('No shows in the database')
+        shows = find_shows(show.artist.name)
+        self.assertIn(show.id, [found.id for found in shows])
+
+    def test_find_shows_by_date_range(self):
+        start_time = utcnow()
+        shows = find_shows('', start_time=start_time)
+        self.assertTrue(all(show.start_time >= start_time for show in shows))
+
+    def test_find_shows_no_match(self):
+        self.assertEqual(find_shows(random_string()), [])
+
 
 def random_string(string_length=10):
     """Generate a random string of fixed length """
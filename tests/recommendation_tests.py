@@ -0,0 +1,184 @@
+import random
+import threading
+import unittest
+from datetime import datetime, timedelta
+from testing import *
+from cache import MemoryBackend
+from recommendations import GENRE_WEIGHT, LOCATION_WEIGHT, BOOKING_WEIGHT, SAME_STATE_SCORE, \
+    RecommendationModel, Recommender, RecommendationsUnavailable
+
+
+def features(item_id, city_id, state_id, genre_ids, seeking=True):
+    return item_id, city_id, state_id, genre_ids, seeking
+
+
+class RecommendationModelTests(unittest.TestCase):
+
+    def setUp(self):
+        self.model = RecommendationModel(2)
+        self.model.load_entities('venue', [features(1, 10, 1, [1, 2]), features(2, 20, 2, [3])])
+        self.model.load_entities('artist', [
+            features(1, 10, 1, [1, 2]),
+            features(2, 11, 1, [2]),
+            features(3, 30, 3, [1]),
+            features(4, 10, 1, [1, 2], seeking=False),
+        ])
+        self.model.compute_all()
+
+    def assertTop(self, side, item_id, expected):
+        recommendations = self.model.recommend(side, item_id)
+        self.assertEqual([other_id for other_id, _ in recommendations], [other_id for other_id, _ in expected])
+        for (_, score), (_, expected_score) in zip(recommendations, expected):
+            self.assertAlmostEqual(score, expected_score, places=5)
+
+    def test_scores(self):
+        self.assertTop('venue', 1, [
+            (1, GENRE_WEIGHT + LOCATION_WEIGHT),
+            (2, GENRE_WEIGHT / 2 + LOCATION_WEIGHT * SAME_STATE_SCORE),
+        ])
+        # Nothing in common with any artist
+        self.assertTop('venue', 2, [])
+        self.assertTop('artist', 4, [(1, GENRE_WEIGHT + LOCATION_WEIGHT)])
+        self.assertIsNone(self.model.recommend('venue', 3))
+
+    def test_incremental_refresh(self):
+        self.model.load_entities('venue', [features(2, 30, 3, [1])], [2])
+        self.model.load_entities('artist', [], [1])
+        self.model.load_bookings([(1, 3, 1)], [1], [3])
+        self.model.refresh({"venue": {self.model.entities['venue'].rows[item_id] for item_id in (1, 2)},
+                            "artist": {self.model.entities['artist'].rows[item_id] for item_id in (1, 3)}})
+        self.assertTop('venue', 1, [
+            (2, GENRE_WEIGHT / 2 + LOCATION_WEIGHT * SAME_STATE_SCORE),
+            (3, GENRE_WEIGHT / 2 + BOOKING_WEIGHT / 2),
+        ])
+        self.assertTop('venue', 2, [(3, GENRE_WEIGHT + LOCATION_WEIGHT)])
+        self.assertTop('artist', 2, [(1, GENRE_WEIGHT / 2 + LOCATION_WEIGHT * SAME_STATE_SCORE)])
+        self.assertIsNone(self.model.recommend('artist', 1))
+
+    def test_refresh_matches_rebuild(self):
+        rng = random.Random(0)
+
+        def random_features(item_id):
+            city = rng.randrange(6)
+            return features(item_id, city, city % 3, rng.sample(range(5), rng.randint(0, 3)), rng.random() < 0.5)
+
+        model = RecommendationModel(3)
+        rows = {side: [random_features(item_id) for item_id in range(1, 31)] for side in ('venue', 'artist')}
+        for side, side_rows in rows.items():
+            model.load_entities(side, side_rows)
+        model.compute_all()
+        for _ in range(20):
+            side = rng.choice(['venue', 'artist'])
+            item_id = rng.randrange(1, 31)
+            rows[side][item_id - 1] = random_features(item_id)
+            model.load_entities(side, [rows[side][item_id - 1]])
+            model.refresh({"venue": set(), "artist": set(), side: {model.entities[side].rows[item_id]}})
+
+            rebuilt = RecommendationModel(3)
+            for rebuilt_side, side_rows in rows.items():
+                rebuilt.load_entities(rebuilt_side, side_rows)
+            rebuilt.compute_all()
+            for rebuilt_side in rows:
+                for other_id in range(1, 31):
+                    self.assertEqual([round(score, 5) for _, score in model.recommend(rebuilt_side, other_id)],
+                                     [round(score, 5) for _, score in rebuilt.recommend(rebuilt_side, other_id)])
+
+
+class RecommenderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.genres = [1]
+        self.release = threading.Event()
+        self.release.set()
+        self.recommender = Recommender(app, self.load_entities, self.load_bookings, backend=MemoryBackend())
+
+    def load_entities(self, side, ids=None):
+        self.release.wait(5)
+        return [features(1, 10, 1, self.genres)]
+
+    def load_bookings(self, venue_ids=None, artist_ids=None):
+        return []
+
+    def test_built_in_background(self):
+        self.release.clear()
+        with self.assertRaises(RecommendationsUnavailable):
+            self.recommender.recommend('venue', 1)
+        self.release.set()
+        self.recommender.wait(5)
+        self.assertEqual([other_id for other_id, _ in self.recommender.recommend('venue', 1)], [1])
+
+    def test_previous_model_served_while_rebuilding(self):
+        self.recommender.start()
+        self.recommender.wait(5)
+        score = self.recommender.recommend('venue', 1)[0][1]
+
+        self.genres = [2]
+        self.release.clear()
+        self.recommender.clear()
+        self.assertEqual(self.recommender.recommend('venue', 1)[0][1], score)
+        self.release.set()
+        self.recommender.wait(5)
+        self.recommender.recommend('venue', 1)
+        self.assertEqual(self.recommender.model.genre_columns, {2: 0})
+
+
+@unittest.skipIf(db.engine.url.database in (None, '', ':memory:'),
+                 'The recommendations are built by another thread, on another in-memory database')
+class RecommendationEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        recommender.start()
+        recommender.wait()
+        # A venue and the best artist recommended to it
+        for venue_id, in db.session.query(Venue.id).order_by(Venue.id):
+            recommendations = recommender.recommend('venue', venue_id)
+            if recommendations:
+                self.venue_id, self.artist_id = venue_id, recommendations[0][0]
+                break
+        else:
+            self.skipTest('No artists to recommend in the database')
+        self.client = app.test_client()
+        # Far enough in the future not to collide with other shows
+        self.start = datetime(2100, 1, 1) + timedelta(hours=random.randrange(100000) * 24)
+
+    def tearDown(self):
+        db.session.remove()
+        Show.query \
+            .filter(Show.start_time >= self.start, Show.start_time < self.start + timedelta(days=1)) \
+            .delete(synchronize_session=False)
+        refresh_show_counters(Venue, [self.venue_id])
+        refresh_show_counters(Artist, [self.artist_id])
+        db.session.commit()
+        recommender.mark_dirty('venue', self.venue_id)
+        recommender.mark_dirty('artist', self.artist_id)
+
+    def recommendations(self, entity, item_id, **args):
+        db.session.remove()
+        response = self.client.get('/api/v1/{}/{}/recommendations'.format(entity, item_id), query_string=args)
+        return response.status_code, response.get_json()
+
+    def score(self, entity, item_id, other_id):
+        status, data = self.recommendations(entity, item_id, limit=1000)
+        self.assertEqual(status, 200)
+        return {item["id"]: item["score"] for item in data["data"]}.get(other_id, 0)
+
+    def test_shows_raise_the_score(self):
+        before = self.score('venues', self.venue_id, self.artist_id)
+        db.session.remove()
+        response = self.client.post('/shows/batch', json=[{
+            "artist_id": self.artist_id,
+            "venue_id": self.venue_id,
+            "start_time": self.start.isoformat()
+        }])
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(self.score('venues', self.venue_id, self.artist_id), before)
+
+    def test_limit_and_not_found(self):
+        status, data = self.recommendations('venues', self.venue_id, limit=1)
+        self.assertEqual(status, 200)
+        self.assertLessEqual(len(data["data"]), 1)
+        self.assertEqual(self.recommendations('artists', 0)[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask, request
+from cache import MemoryBackend, ResponseCache
+from routing import PRIMARY_UNTIL_KEY, RoutingSQLAlchemy
+
+
+class RoutingTests(unittest.TestCase):
+    # A primary and a replica in two SQLite files, holding different rows
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        primary = os.path.join(self.directory.name, 'primary.db')
+        replica = os.path.join(self.directory.name, 'replica.db')
+
+        app = Flask(__name__)
+        app.config.update(
+            SECRET_KEY='test',
+            SQLALCHEMY_DATABASE_URI='sqlite:///' + primary,
+            SQLALCHEMY_REPLICA_URIS=['sqlite:///' + replica],
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+            REPLICA_READ_AFTER_WRITE_SECONDS=60,
+            REPLICA_MAX_LAG_SECONDS=0,
+            REPLICA_LAG_CHECK_INTERVAL=5,
+        )
+        db = RoutingSQLAlchemy(app)
+        response_cache = ResponseCache(app, backend=MemoryBackend())
+
+        class Item(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            name = db.Column(db.String)
+
+        @app.route('/items', methods=['GET', 'POST'])
+        def items():
+            if request.method == 'POST':
+                db.session.add(Item(name='new'))
+                db.session.commit()
+            return ','.join(item.name for item in Item.query.order_by(Item.id))
+
+        @app.route('/cached')
+        @response_cache.cached
+        def cached():
+            self.renders += 1
+            return ','.join(item.name for item in Item.query.order_by(Item.id))
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Item(name='primary'))
+            db.session.commit()
+            replica_engine = db.get_replica_set(app).replicas[0].engine
+            db.Model.metadata.create_all(replica_engine)
+            with replica_engine.begin() as connection:
+                connection.execute(Item.__table__.insert(), {"name": 'replica'})
+
+        self.renders = 0
+        self.db = db
+        self.app = app
+        self.response_cache = response_cache
+        self.client = app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            self.db.dispose_replicas()
+            self.db.get_engine().dispose()
+        self.directory.cleanup()
+
+    def test_get_reads_replica(self):
+        self.assertEqual(self.client.get('/items').get_data(as_text=True), 'replica')
+
+    def test_post_uses_primary(self):
+        self.assertEqual(self.client.post('/items').get_data(as_text=True), 'primary,new')
+
+    def test_read_after_write(self):
+        self.client.post('/items')
+        self.assertEqual(self.client.get('/items').get_data(as_text=True), 'primary,new')
+        with self.client.session_transaction() as session:
+            session[PRIMARY_UNTIL_KEY] = 0
+        self.assertEqual(self.client.get('/items').get_data(as_text=True), 'replica')
+
+    def test_other_clients_read_replica(self):
+        self.client.post('/items')
+        self.assertEqual(self.app.test_client().get('/items').get_data(as_text=True), 'replica')
+
+    def test_lagging_replica_skipped(self):
+        with self.app.app_context():
+            replica_set = self.db.get_replica_set(self.app)
+        replica_set.max_lag = 10
+        replica_set.measure_lag = lambda replica: 60.0
+        self.assertEqual(self.client.get('/items').get_data(as_text=True), 'primary')
+
+    def test_replica_reads_not_cached_after_invalidation(self):
+        with self.app.app_context():
+            replica_set = self.db.get_replica_set(self.app)
+        replica_set.max_lag = self.app.config['REPLICA_MAX_LAG_SECONDS'] = 10
+        replica_set.measure_lag = lambda replica: 0.0
+        self.client.get('/cached')
+        self.client.get('/cached')
+        self.assertEqual(self.renders, 1)
+
+        # The replica may not have replayed the write behind the invalidation yet
+        with mock.patch('cache.time.time', return_value=1000):
+            self.response_cache.invalidate('cached')
+        with mock.patch('cache.time.time', return_value=1014):
+            self.client.get('/cached')
+            self.client.get('/cached')
+        self.assertEqual(self.renders, 3)
+        # Past the lag bound and the interval between two measures
+        with mock.patch('cache.time.time', return_value=1016):
+            self.client.get('/cached')
+            self.client.get('/cached')
+        self.assertEqual(self.renders, 4)
+
+    def test_replica_reads_not_cached_without_lag_bound(self):
+        self.client.get('/cached')
+        self.client.get('/cached')
+        self.assertEqual(self.renders, 2)
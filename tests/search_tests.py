@@ -0,0 +1,77 @@
+import unittest
+from testing import *
+from cache import MemoryBackend
+from query_tests import random_string
+from search import NameSearch, NgramIndex
+
+
+class NgramIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NgramIndex()
+        self.index.add(1, 'The Musical Hop')
+        self.index.add(2, 'The Dueling Pianos Bar')
+        self.index.add(3, 'Park Square Live Music & Coffee')
+
+    def test_search_substring(self):
+        self.assertEqual(self.index.search('Hop', 10), [1])
+        self.assertEqual(sorted(self.index.search('music', 10)), [1, 3])
+
+    def test_search_case_insensitive(self):
+        self.assertEqual(self.index.search('PIANOS', 10), [2])
+
+    def test_search_fuzzy(self):
+        self.assertEqual(self.index.search('The Musicl Hop', 10), [1])
+
+    def test_search_short_term(self):
+        self.assertEqual(sorted(self.index.search('a', 10)), [1, 2, 3])
+
+    def test_search_limit(self):
+        self.assertEqual(len(self.index.search('a', 2)), 2)
+
+    def test_remove(self):
+        self.index.remove(1)
+        self.assertEqual(self.index.search('Hop', 10), [])
+
+    def test_update(self):
+        self.index.add(1, 'The Jazz Cellar')
+        self.assertEqual(self.index.search('Hop', 10), [])
+        self.assertEqual(self.index.search('jazz', 10), [1])
+
+
+class NameSearchTests(unittest.TestCase):
+
+    def setUp(self):
+        venue = Venue.query.order_by(Venue.id).first()
+        if not venue:
+            self.skipTest('No venues in the database')
+        self.venue_id, self.name = venue.id, venue.name
+        # Two processes sharing a backend
+        backend = MemoryBackend()
+        self.search = NameSearch(db, Venue, backend=backend)
+        self.other = NameSearch(db, Venue, backend=backend)
+
+    def tearDown(self):
+        self.rename(self.name)
+
+    def rename(self, name):
+        db.session.query(Venue).filter(Venue.id == self.venue_id).update({"name": name})
+        db.session.commit()
+
+    def found(self, search, term):
+        return [venue.id for venue in search.search(Venue.query, term, 10)]
+
+    def test_writes_of_other_processes(self):
+        name = random_string()
+        self.assertNotIn(self.venue_id, self.found(self.search, name))
+        self.rename(name)
+        self.other.update(self.venue_id, name)
+        self.assertIn(self.venue_id, self.found(self.search, name))
+
+    def test_own_writes_update_the_index(self):
+        name = random_string()
+        index = self.search.get_index()
+        self.rename(name)
+        self.search.update(self.venue_id, name)
+        self.assertIs(self.search.get_index(), index)
+        self.assertIn(self.venue_id, self.found(self.search, name))
@@ -0,0 +1,9 @@
+from app import *
+
+# ----------------------------------------------------------------------------#
+# Test configuration.
+# ----------------------------------------------------------------------------#
+
+# Every suite imports the app through this module, so that N+1 queries fail
+# whichever test runs them instead of being logged.
+app.config.update(NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True)
@@ -0,0 +1,76 @@
+import os
+import runpy
+import unittest
+from unittest import mock
+from testing import *
+from wsgi import application, create_app, dispose_engines
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WsgiTests(unittest.TestCase):
+
+    def test_application(self):
+        self.assertIs(application, app)
+        self.assertIs(create_app(), app)
+
+    def test_templates_compiled(self):
+        app.jinja_env.cache.clear()
+        create_app()
+        self.assertIn('pages/show_venue.html', {name for loader, name in app.jinja_env.cache.keys()})
+
+    @unittest.skipIf(db.engine.url.database in (None, '', ':memory:'),
+                     'A new pool would open a new in-memory database')
+    def test_dispose_engines(self):
+        db.session.remove()
+        pool = db.engine.pool
+        dispose_engines()
+        self.assertIsNot(db.engine.pool, pool)
+        # The new pool opens its own connections
+        self.assertGreaterEqual(Venue.query.count(), 0)
+
+
+class GunicornConfigTests(unittest.TestCase):
+
+    def load(self, **environment):
+        with mock.patch.dict(os.environ, environment):
+            for name in ('DEBUG', 'BIND', 'PORT', 'WEB_CONCURRENCY', 'WEB_THREADS', 'CACHE_BACKEND'):
+                if name not in environment:
+                    os.environ.pop(name, None)
+            settings = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+            settings["DEBUG"] = os.environ.get('DEBUG')
+        return settings
+
+    def test_defaults(self):
+        settings = self.load()
+        self.assertTrue(settings["preload_app"])
+        self.assertEqual(settings["bind"], '0.0.0.0:8000')
+        self.assertEqual(settings["threads"], 4)
+        self.assertEqual(settings["worker_class"], 'gthread')
+        self.assertEqual(settings["DEBUG"], 'false')
+        # The memory cache backend is per process
+        self.assertEqual(settings["workers"], 1)
+
+    def test_environment(self):
+        settings = self.load(PORT='5000', WEB_CONCURRENCY='3', WEB_THREADS='1', DEBUG='true',
+                             CACHE_BACKEND='redis')
+        self.assertEqual(settings["bind"], '0.0.0.0:5000')
+        self.assertEqual(settings["workers"], 3)
+        self.assertEqual(settings["worker_class"], 'sync')
+        self.assertEqual(settings["DEBUG"], 'true')
+
+    def test_memory_backend_workers(self):
+        with self.assertRaises(RuntimeError):
+            self.load(WEB_CONCURRENCY='3')
+        self.assertGreater(self.load(CACHE_BACKEND='redis')["workers"], 1)
+
+    def test_post_fork(self):
+        settings = self.load()
+        with mock.patch('wsgi.dispose_engines') as dispose, mock.patch('wsgi.warm_up') as warm_up:
+            settings["post_fork"](None, None)
+        dispose.assert_called_once_with()
+        warm_up.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
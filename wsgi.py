@@ -0,0 +1,45 @@
+import sys
+
+from app import app, db, recommender
+
+# ----------------------------------------------------------------------------#
+# WSGI entry point.
+# ----------------------------------------------------------------------------#
+
+# `gunicorn -c gunicorn.conf.py wsgi:application` serves the app with
+# preloaded workers: the master imports the app (models, mappers, compiled
+# templates) once and forks the workers, which then share that memory.
+# Each worker drops the database connections it inherits (see post_fork
+# in gunicorn.conf.py).
+
+
+def create_app():
+    """The Flask app, ready to be forked by the server.
+
+    app.py builds the app when it is imported, as the models are declared on
+    its db; this compiles everything the first requests would otherwise
+    compile in each worker.
+    """
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    # Configure the mappers now rather than on the first query
+    db.configure_mappers()
+    return app
+
+
+def dispose_engines():
+    """Forget the connections inherited from the parent process, without closing them."""
+    with app.app_context():
+        db.engine.dispose(close=False)
+        db.dispose_replicas(close=False)
+    asgi = sys.modules.get('asgi')
+    if asgi is not None:
+        asgi.engine.sync_engine.dispose(close=False)
+
+
+def warm_up():
+    """Start building, in the background, what the first requests of a worker would wait for."""
+    recommender.start()
+
+
+application = create_app()